@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from generate_corpus import generate_corpus
+
+# ----------------------
+#  bench_pipeline.py
+# ----------------------
+# Times and memory-profiles every pipeline stage on a real or synthetic corpus
+# and reports the results as JSON, so runs can be compared across releases and
+# used to size machines. Each stage runs in its own Python process, in stage
+# order, so its peak RSS is measured in isolation.
+
+STAGES = ['extract_match_features', 'process_player_stats', 'calculate_team_stats', 'process_pipeline', 'train_model']
+
+def _run_stage(name, workers):
+    """Run one stage in the current process (the working directory is the benchmark corpus)"""
+    if name == 'extract_match_features':
+        from fetch_matches import extract_match_features
+        extract_match_features(workers=workers)
+    elif name == 'process_player_stats':
+        from fetch_players import process_player_stats
+        process_player_stats(workers=workers)
+    elif name == 'calculate_team_stats':
+        from fetch_teams import calculate_team_stats
+        calculate_team_stats(workers=workers)
+    elif name == 'process_pipeline':
+        from process_pipeline import process_all
+        process_all()
+    elif name == 'train_model':
+        # Run as a script, without this process's --run-stage arguments
+        script = os.path.join(REPO_DIR, 'notebooks', 'prediction_model.py')
+        sys.argv = [script]
+        runpy.run_path(script, run_name='__main__')
+    else:
+        raise ValueError(f"Unknown stage: {name}")
+
+def _peak_rss_mb(who):
+    """Peak resident set size in MB; ru_maxrss is in KB on Linux and bytes on macOS"""
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def measure_stage(name, workers, trace):
+    """Child process entry point: run a stage and print its measurements as a JSON line"""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    _run_stage(name, workers)
+    result = {'seconds': round(time.perf_counter() - start, 3), 'peak_rss_mb': _peak_rss_mb(resource.RUSAGE_SELF)}
+    if workers > 1:
+        result['peak_worker_rss_mb'] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    if trace:
+        result['python_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+    print(json.dumps(result))
+
+def benchmark_stage(name, workdir, workers, trace):
+    """Run one stage in a fresh interpreter and collect its measurements"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--run-stage', name, '--workers', str(workers)]
+    if trace:
+        cmd.append('--tracemalloc')
+    proc = subprocess.run(cmd, cwd=workdir, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'stage': name, 'status': 'failed', 'error': proc.stderr.strip().splitlines()[-1:]}
+    return {'stage': name, 'status': 'ok', **json.loads(proc.stdout.strip().splitlines()[-1])}
+
+def prepare_workdir(workdir, data_dir, matches, weather_path, seed):
+    """Lay out ipl_data/ and the weather CSV in workdir, generating a synthetic corpus if requested"""
+    weather_target = os.path.join(workdir, 'data', 'raw', 'weather', 'weather_by_match.csv')
+    if matches:
+        generate_corpus(os.path.join(workdir, 'ipl_data'), matches, seed=seed, workers=os.cpu_count() or 1,
+                        weather_path=weather_target)
+    else:
+        os.symlink(os.path.abspath(data_dir), os.path.join(workdir, 'ipl_data'))
+        os.makedirs(os.path.dirname(weather_target), exist_ok=True)
+        shutil.copyfile(weather_path, weather_target)
+
+def run_benchmark(workdir, stages, workers, trace):
+    """Run the requested stages in order and build the JSON report"""
+    match_files = len([f for f in os.listdir(os.path.join(workdir, 'ipl_data')) if f.endswith('.json')])
+    results = []
+    for name in stages:
+        result = benchmark_stage(name, workdir, workers, trace)
+        if result['status'] == 'ok' and name in STAGES[:3]:
+            result['matches_per_second'] = round(match_files / result['seconds'], 1) if result['seconds'] else None
+        results.append(result)
+        print(f"{name}: {result}", file=sys.stderr)
+    return {
+        'benchmark': 'pipeline_stages',
+        'match_files': match_files,
+        'workers': workers,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'stages': results
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile each pipeline stage")
+    parser.add_argument('--matches', type=int, help="generate a synthetic corpus of this many matches")
+    parser.add_argument('--data-dir', default='ipl_data', help="existing match files to use when --matches is not given")
+    parser.add_argument('--weather', default=os.path.join('data', 'raw', 'weather', 'weather_by_match.csv'),
+                        help="weather CSV to use with --data-dir (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=42, help="seed for the synthetic corpus")
+    parser.add_argument('--stages', default=','.join(STAGES), help="comma-separated stages to run (default: all)")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes for the fetch stages")
+    parser.add_argument('--tracemalloc', action='store_true', help="also report peak Python heap per stage (slower)")
+    parser.add_argument('--workdir', help="keep the corpus and outputs in this directory instead of a temporary one")
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    parser.add_argument('--run-stage', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        measure_stage(args.run_stage, args.workers, args.tracemalloc)
+        sys.exit(0)
+
+    stages = args.stages.split(',')
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        workdir = args.workdir
+        if not os.path.exists(os.path.join(workdir, 'ipl_data')):
+            prepare_workdir(workdir, args.data_dir, args.matches, args.weather, args.seed)
+        report = run_benchmark(workdir, stages, args.workers, args.tracemalloc)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            prepare_workdir(workdir, args.data_dir, args.matches, args.weather, args.seed)
+            report = run_benchmark(workdir, stages, args.workers, args.tracemalloc)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
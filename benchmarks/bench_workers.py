@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from fetch_all import extract_all
+from generate_corpus import generate_corpus
+from match_loader import list_match_files, map_matches
+
+# ----------------------
+#  bench_workers.py
+# ----------------------
+# Measures how per-match extraction (the work done by fetch_all.py --workers N)
+# scales with the number of worker processes. The corpus is either synthetic
+# (--matches) or an existing one enlarged by copying every match file
+# `--copies` times under fresh match IDs. Every run is checked against the
+# serial result to confirm the merge is deterministic.
+
+def enlarge_corpus(source_dir, target_dir, copies):
+    """Copy each match file `copies` times into target_dir, giving each copy a new numeric ID"""
+    source_files = list_match_files(source_dir)
+    for copy in range(copies):
+        for file_path in source_files:
+            match_id = os.path.basename(file_path).split('.')[0]
+            new_id = f"{copy + 1}{int(match_id):09d}" if match_id.isdigit() else f"{copy + 1}_{match_id}"
+            shutil.copyfile(file_path, os.path.join(target_dir, f"{new_id}.json"))
+    return list_match_files(target_dir)
+
+def time_extraction(match_files, workers):
+    """Return (seconds, results) for one full extraction pass"""
+    start = time.perf_counter()
+    results = list(map_matches(extract_all, match_files, workers=workers))
+    return time.perf_counter() - start, results
+
+def run_benchmark(match_files, worker_counts, repeats):
+    """Time every worker count and report speedup relative to one worker"""
+    serial_time, serial_results = time_extraction(match_files, 1)
+    runs = []
+    for workers in worker_counts:
+        times = []
+        for _ in range(repeats):
+            elapsed, results = time_extraction(match_files, workers)
+            if results != serial_results:
+                raise RuntimeError(f"Results with {workers} workers differ from the serial run")
+            times.append(elapsed)
+        best = min(times)
+        runs.append({
+            'workers': workers,
+            'seconds': round(best, 3),
+            'matches_per_second': round(len(match_files) / best, 1),
+            'speedup': round(serial_time / best, 2)
+        })
+    return {
+        'benchmark': 'parallel_extraction',
+        'match_files': len(match_files),
+        'cpu_count': os.cpu_count(),
+        'serial_seconds': round(serial_time, 3),
+        'runs': runs
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark process-pool match extraction across worker counts")
+    parser.add_argument('--matches', type=int, help="benchmark on a synthetic corpus of this many matches")
+    parser.add_argument('--data-dir', default='ipl_data', help="source match files when --matches is not given (default: %(default)s)")
+    parser.add_argument('--copies', type=int, default=10, help="times to replicate the source corpus (default: %(default)s)")
+    parser.add_argument('--workers', default='1,2,4,8,16', help="comma-separated worker counts (default: %(default)s)")
+    parser.add_argument('--repeats', type=int, default=1, help="runs per worker count; the best is reported")
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        if args.matches:
+            generate_corpus(corpus_dir, args.matches, workers=os.cpu_count() or 1)
+            match_files = list_match_files(corpus_dir)
+        else:
+            match_files = enlarge_corpus(args.data_dir, corpus_dir, args.copies)
+        if not match_files:
+            sys.exit(f"No match JSON files found in {args.data_dir}")
+        report = run_benchmark(match_files, [int(w) for w in args.workers.split(',')], args.repeats)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,338 @@
+import argparse
+import csv
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+# ----------------------
+#  generate_corpus.py
+# ----------------------
+# Generates a synthetic corpus of Cricsheet-format T20 match JSON files for
+# benchmarking, from a few hundred to a million matches. Each player has a
+# batting and bowling skill that shapes ball-by-ball outcomes, squads are
+# redrawn from a shared player pool every season, and matches are spread over
+# seasons of double-header days like the real IPL schedule. The same arguments
+# and seed always produce the same files.
+
+IPL_TEAMS = [
+    ('Chennai Super Kings', 'MA Chidambaram Stadium, Chepauk', 'Chennai'),
+    ('Mumbai Indians', 'Wankhede Stadium, Mumbai', 'Mumbai'),
+    ('Royal Challengers Bangalore', 'M Chinnaswamy Stadium', 'Bengaluru'),
+    ('Kolkata Knight Riders', 'Eden Gardens, Kolkata', 'Kolkata'),
+    ('Delhi Capitals', 'Arun Jaitley Stadium, Delhi', 'Delhi'),
+    ('Kings XI Punjab', 'IS Bindra Stadium, Mohali', 'Chandigarh'),
+    ('Rajasthan Royals', 'Sawai Mansingh Stadium, Jaipur', 'Jaipur'),
+    ('Sunrisers Hyderabad', 'Rajiv Gandhi International Stadium, Uppal', 'Hyderabad'),
+    ('Lucknow Super Giants', 'Bharat Ratna Shri Atal Bihari Vajpayee Ekana Cricket Stadium, Lucknow', 'Lucknow'),
+    ('Gujarat Titans', 'Narendra Modi Stadium, Ahmedabad', 'Ahmedabad')
+]
+
+NEUTRAL_VENUES = [
+    ('Dubai International Cricket Stadium', 'Dubai'),
+    ('Sharjah Cricket Stadium', 'Sharjah'),
+    ('Brabourne Stadium, Mumbai', 'Mumbai'),
+    ('Dr DY Patil Sports Academy, Mumbai', 'Mumbai')
+]
+
+SURNAMES = [
+    'Sharma', 'Kumar', 'Singh', 'Patel', 'Yadav', 'Iyer', 'Pandya', 'Rahul', 'Chahal', 'Bumrah',
+    'Warner', 'Smith', 'Williamson', 'Buttler', 'Rashid', 'Narine', 'Russell', 'Pollard', 'Khan', 'Gill',
+    'Jadeja', 'Ashwin', 'Samson', 'Pant', 'Kishan', 'Siraj', 'Shami', 'Thakur', 'Chahar', 'Rana'
+]
+
+# Relative weights of runs off the bat for a legal delivery
+RUN_OUTCOMES = [0, 1, 2, 3, 4, 6]
+RUN_WEIGHTS = [0.38, 0.37, 0.07, 0.005, 0.12, 0.055]
+
+WICKET_KINDS = ['caught', 'bowled', 'lbw', 'run out', 'stumped', 'caught and bowled', 'hit wicket']
+WICKET_WEIGHTS = [0.6, 0.17, 0.1, 0.08, 0.03, 0.015, 0.005]
+
+EXTRA_KINDS = ['wides', 'noballs', 'legbyes', 'byes']
+EXTRA_WEIGHTS = [0.035, 0.005, 0.015, 0.005]
+
+DAY_TIMES = ['15:30:00', '16:00:00', '16:30:00', '17:00:00', '17:30:00', '18:00:00', '18:30:00', '19:00:00']
+NIGHT_TIMES = ['19:30:00', '20:00:00', '20:30:00', '21:00:00', '21:30:00', '22:00:00', '22:30:00', '23:00:00', '23:30:00']
+
+FIRST_MATCH_ID = 1000001
+
+def build_league(n_teams, player_pool, seed):
+    """Create teams (name, home venue, city) and a pool of players with batting/bowling skills"""
+    rng = random.Random(seed)
+    teams = list(IPL_TEAMS[:n_teams])
+    for i in range(len(teams), n_teams):
+        teams.append((f'Synthetic XI {i + 1}', f'Synthetic Ground {i + 1}', f'City {i + 1}'))
+
+    players = []
+    for i in range(player_pool):
+        initials = chr(ord('A') + i % 26) + chr(ord('A') + (i // 26) % 26)
+        name = f'{initials} {SURNAMES[(i // 676) % len(SURNAMES)]}{"" if i < 676 * len(SURNAMES) else i}'
+        # Batting skill scales boundary rate, bowling skill scales wicket rate
+        players.append((name, rng.uniform(0.5, 1.5), rng.uniform(0.5, 1.5)))
+    return teams, players
+
+def match_date(start_year, season, match_in_season, matches_per_season):
+    """
+    Schedule a match IPL-style: single- and double-header days alternate.
+
+    Seasons packed with more than 120 matches play more matches per day instead.
+    """
+    per_day = -(-matches_per_season // 60)
+    if per_day <= 2:
+        day = (match_in_season // 3) * 2 + (1 if match_in_season % 3 else 0)
+    else:
+        day = match_in_season // per_day
+    return date(start_year + season, 3, 25) + timedelta(days=day)
+
+def match_fixture(index, config):
+    """Return (season, match_in_season, team1, team2, venue, city) for a match"""
+    season, match_in_season = divmod(index, config['matches_per_season'])
+    rng = random.Random(config['seed'] * 104729 + index)
+    t1, t2 = rng.sample(range(len(config['teams'])), 2)
+    if rng.random() < 0.85:
+        venue, city = config['teams'][t1][1], config['teams'][t1][2]
+    else:
+        venue, city = rng.choice(NEUTRAL_VENUES)
+    return season, match_in_season, t1, t2, venue, city
+
+def draw_squads(teams, players, season, seed, squad_size):
+    """Assign each team a squad for the season from the shared player pool"""
+    rng = random.Random(seed * 1000003 + season)
+    pool = list(range(len(players)))
+    rng.shuffle(pool)
+    squads = []
+    for t in range(len(teams)):
+        squad = pool[t * squad_size:(t + 1) * squad_size]
+        if len(squad) < 11:
+            # Small pools are shared between teams rather than failing
+            squad = rng.sample(range(len(players)), min(len(players), max(11, squad_size)))
+        squads.append(squad)
+    return squads
+
+def simulate_innings(rng, players, batting_xi, bowling_xi, target=None, overs=20):
+    """Simulate one innings ball by ball; returns (overs_list, runs, wickets)"""
+    order = list(batting_xi)
+    bowlers = bowling_xi[-5:]
+    striker, non_striker, next_in = order[0], order[1], 2
+    runs = wickets = 0
+    overs_bowled = {b: 0 for b in bowlers}
+    last_bowler = None
+    overs_list = []
+
+    for over_no in range(overs):
+        options = [b for b in bowlers if overs_bowled[b] < 4 and b != last_bowler] or bowlers
+        bowler = rng.choice(options)
+        overs_bowled[bowler] = overs_bowled.get(bowler, 0) + 1
+        last_bowler = bowler
+        deliveries = []
+        legal = 0
+        while legal < 6:
+            bat_skill = players[striker][1]
+            bowl_skill = players[bowler][2]
+            delivery = {
+                'batter': players[striker][0],
+                'bowler': players[bowler][0],
+                'non_striker': players[non_striker][0]
+            }
+
+            extra_kind = rng.choices(EXTRA_KINDS + [None], EXTRA_WEIGHTS + [1 - sum(EXTRA_WEIGHTS)])[0]
+            if extra_kind in ('wides', 'noballs'):
+                batter_runs = rng.choices(RUN_OUTCOMES, RUN_WEIGHTS)[0] if extra_kind == 'noballs' else 0
+                extras = 1
+            elif extra_kind in ('legbyes', 'byes'):
+                batter_runs = 0
+                extras = rng.choice([1, 1, 1, 2, 4])
+                legal += 1
+            else:
+                weights = [RUN_WEIGHTS[0] / bat_skill] + RUN_WEIGHTS[1:4] + [w * bat_skill for w in RUN_WEIGHTS[4:]]
+                batter_runs = rng.choices(RUN_OUTCOMES, weights)[0]
+                extras = 0
+                legal += 1
+
+            delivery['runs'] = {'batter': batter_runs, 'extras': extras, 'total': batter_runs + extras}
+            if extra_kind:
+                delivery['extras'] = {extra_kind: extras}
+            runs += batter_runs + extras
+
+            # Wides and no-balls only allow run outs and stumpings, ignored here for simplicity
+            if extra_kind not in ('wides', 'noballs') and rng.random() < 0.045 * bowl_skill / bat_skill:
+                kind = rng.choices(WICKET_KINDS, WICKET_WEIGHTS)[0]
+                out = non_striker if kind == 'run out' and rng.random() < 0.3 else striker
+                wicket = {'player_out': players[out][0], 'kind': kind}
+                if kind in ('caught', 'run out', 'stumped'):
+                    wicket['fielders'] = [{'name': players[rng.choice(bowling_xi)][0]}]
+                delivery['wickets'] = [wicket]
+                wickets += 1
+                if wickets == 10:
+                    deliveries.append(delivery)
+                    overs_list.append({'over': over_no, 'deliveries': deliveries})
+                    return overs_list, runs, wickets
+                if out == striker:
+                    striker = order[next_in]
+                else:
+                    non_striker = order[next_in]
+                next_in += 1
+
+            if batter_runs % 2 == 1 or (extra_kind in ('legbyes', 'byes') and extras % 2 == 1):
+                striker, non_striker = non_striker, striker
+            deliveries.append(delivery)
+
+            if target is not None and runs >= target:
+                overs_list.append({'over': over_no, 'deliveries': deliveries})
+                return overs_list, runs, wickets
+
+        overs_list.append({'over': over_no, 'deliveries': deliveries})
+        striker, non_striker = non_striker, striker
+
+    return overs_list, runs, wickets
+
+def generate_match(index, config):
+    """Generate the Cricsheet JSON document for one match"""
+    teams, players = config['teams'], config['players']
+    season, match_in_season, t1, t2, venue, city = match_fixture(index, config)
+    rng = random.Random(config['seed'] * 7919 + index)
+    squads = draw_squads(teams, players, season, config['seed'], config['squad_size'])
+    xi = {t: rng.sample(squads[t], 11) for t in (t1, t2)}
+
+    toss_winner = rng.choice((t1, t2))
+    decision = 'field' if rng.random() < 0.65 else 'bat'
+    batting_first = toss_winner if decision == 'bat' else (t2 if toss_winner == t1 else t1)
+    chasing = t2 if batting_first == t1 else t1
+
+    info = {
+        'balls_per_over': 6,
+        'city': city,
+        'dates': [match_date(config['start_year'], season, match_in_season, config['matches_per_season']).isoformat()],
+        'event': {'name': 'Indian Premier League', 'match_number': match_in_season + 1},
+        'gender': 'male',
+        'match_type': 'T20',
+        'outcome': {},
+        'overs': 20,
+        'players': {teams[t][0]: [players[p][0] for p in xi[t]] for t in (t1, t2)},
+        'season': str(config['start_year'] + season),
+        'team_type': 'club',
+        'teams': [teams[t1][0], teams[t2][0]],
+        'toss': {'decision': decision, 'winner': teams[toss_winner][0]},
+        'venue': venue
+    }
+    if match_in_season >= config['matches_per_season'] - 4:
+        info['event'] = {'name': 'Indian Premier League',
+                         'stage': ['Qualifier 1', 'Eliminator', 'Qualifier 2', 'Final'][match_in_season - config['matches_per_season'] + 4]}
+
+    # A small share of matches are washed out
+    if rng.random() < 0.01:
+        info['outcome'] = {'result': 'no result'}
+        return {'meta': {'data_version': '1.1.0', 'created': '2024-01-01', 'revision': 1}, 'info': info, 'innings': []}
+
+    overs1, runs1, wkts1 = simulate_innings(rng, players, xi[batting_first], xi[chasing])
+    overs2, runs2, wkts2 = simulate_innings(rng, players, xi[chasing], xi[batting_first], target=runs1 + 1)
+    innings = [
+        {'team': teams[batting_first][0], 'overs': overs1},
+        {'team': teams[chasing][0], 'overs': overs2, 'target': {'overs': 20, 'runs': runs1 + 1}}
+    ]
+
+    if runs1 > runs2:
+        info['outcome'] = {'by': {'runs': runs1 - runs2}, 'winner': teams[batting_first][0]}
+    elif runs2 > runs1:
+        info['outcome'] = {'by': {'wickets': 10 - wkts2}, 'winner': teams[chasing][0]}
+    else:
+        # Tied: settle with a super over
+        so1, so_runs1, _ = simulate_innings(rng, players, xi[chasing], xi[batting_first], overs=1)
+        so2, so_runs2, _ = simulate_innings(rng, players, xi[batting_first], xi[chasing], overs=1)
+        innings += [{'team': teams[chasing][0], 'overs': so1, 'super_over': True},
+                    {'team': teams[batting_first][0], 'overs': so2, 'super_over': True}]
+        info['outcome'] = {'result': 'tie', 'eliminator': teams[chasing if so_runs1 >= so_runs2 else batting_first][0]}
+
+    top_scorer = max(xi[batting_first] + xi[chasing], key=lambda p: players[p][1] * rng.random())
+    info['player_of_match'] = [players[top_scorer][0]]
+    return {'meta': {'data_version': '1.1.0', 'created': '2024-01-01', 'revision': 1}, 'info': info, 'innings': innings}
+
+def _write_matches(indices, config, out_dir):
+    """Worker task: generate and write a block of matches"""
+    for index in indices:
+        with open(os.path.join(out_dir, f'{FIRST_MATCH_ID + index}.json'), 'w') as f:
+            json.dump(generate_match(index, config), f)
+    return len(indices)
+
+def write_weather(config, n_matches, weather_path):
+    """
+    Write a weather_by_match.csv for the generated matches, in the bundled file's schema.
+
+    Day/night follows fetch_matches: on dates with several matches, the lowest
+    match ID is the day match.
+    """
+    by_date = {}
+    for index in range(n_matches):
+        season, match_in_season = divmod(index, config['matches_per_season'])
+        day = match_date(config['start_year'], season, match_in_season, config['matches_per_season'])
+        by_date.setdefault(day, []).append(index)
+
+    os.makedirs(os.path.dirname(weather_path) or '.', exist_ok=True)
+    rng = random.Random(config['seed'])
+    with open(weather_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['match_id', 'date', 'venue', 'city', 'day_night', 'timestamp_ist', 'temperature', 'feels_like',
+                         'dew_point', 'humidity', 'wind_speed', 'wind_direction', 'pressure', 'weather', 'visibility'])
+        for day, indices in sorted(by_date.items()):
+            for index in indices:
+                is_day = len(indices) > 1 and index == indices[0]
+                venue, city = match_fixture(index, config)[4:]
+                temperature = rng.uniform(24, 38)
+                dew_point = temperature - rng.uniform(5, 20)
+                for hour, timestamp in enumerate(DAY_TIMES if is_day else NIGHT_TIMES):
+                    temp = round(temperature - hour * 0.4, 1)
+                    writer.writerow([FIRST_MATCH_ID + index, day.strftime('%d-%m-%Y'), venue, city,
+                                     'Day' if is_day else 'Night', timestamp, temp, round(temp - 2, 1),
+                                     round(dew_point, 1), round(min(100, 30 + hour * 3 + rng.uniform(0, 20)), 1),
+                                     round(rng.uniform(2, 20), 1), rng.choice(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']),
+                                     round(rng.uniform(905, 1012), 2), rng.choice(['Fair', 'Haze', 'Partly Cloudy', 'Mist']),
+                                     round(rng.uniform(3, 10), 1)])
+
+def generate_corpus(out_dir, n_matches, n_teams=10, player_pool=None, squad_size=25,
+                    matches_per_season=74, start_year=2008, seed=42, workers=1, weather_path=None):
+    """
+    Write n_matches synthetic Cricsheet match files to out_dir.
+
+    player_pool defaults to 3 players per squad place, so squads change from
+    season to season. Large corpora are packed into more matches per season
+    (at most 30 seasons) so dates stay realistic.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    teams, players = build_league(n_teams, player_pool or n_teams * squad_size * 3, seed)
+    config = {
+        'teams': teams,
+        'players': players,
+        'squad_size': squad_size,
+        'matches_per_season': max(matches_per_season, -(-n_matches // 30)),
+        'start_year': start_year,
+        'seed': seed
+    }
+
+    blocks = [range(start, min(start + 500, n_matches)) for start in range(0, n_matches, 500)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_write_matches, blocks, [config] * len(blocks), [out_dir] * len(blocks)))
+    else:
+        for block in blocks:
+            _write_matches(block, config, out_dir)
+
+    if weather_path:
+        write_weather(config, n_matches, weather_path)
+
+    print(f"Generated {n_matches} matches ({len(teams)} teams, {len(players)} players) in {out_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Cricsheet-format match corpus")
+    parser.add_argument('--matches', type=int, default=1000, help="number of matches (default: %(default)s)")
+    parser.add_argument('--teams', type=int, default=10, help="number of teams (default: %(default)s)")
+    parser.add_argument('--player-pool', type=int, help="players shared by all squads (default: 3 per squad place)")
+    parser.add_argument('--squad-size', type=int, default=25, help="players per team each season (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=42, help="random seed (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1, help="processes used to write files (default: 1)")
+    parser.add_argument('--output-dir', default='ipl_data', help="where to write match files (default: %(default)s)")
+    parser.add_argument('--weather', help="also write a matching weather_by_match.csv to this path")
+    args = parser.parse_args()
+
+    generate_corpus(args.output_dir, args.matches, n_teams=args.teams, player_pool=args.player_pool,
+                    squad_size=args.squad_size, seed=args.seed, workers=args.workers, weather_path=args.weather)
@@ -0,0 +1,215 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from instrument import count, stage
+from predict_service import ENGINEERED_FEATURES, FEATURE_PATH, MATCH_WEATHER_PATH
+from table_io import read_table, write_table
+
+# ----------------------
+#  backtest.py
+# ----------------------
+# Walk-forward backtest of the match-winner model. Matches are replayed in
+# date order one matchweek at a time: each week's matches are predicted by a
+# model trained on every match before that week, so no prediction sees its
+# own or a later result. Accuracy, log-loss, Brier score and calibration are
+# reported per season.
+#
+# The feature matrix is built once, sorted by date, so a fold's training set
+# is a prefix of it and is sliced without copying. Each season is a chain of
+# folds, and chains run in a process pool that receives the matrix once per
+# worker. With warm starting, the first fold of a season trains a full model
+# and every later fold adds a few boosting rounds to the previous fold's
+# booster on the longer history, instead of retraining from scratch.
+
+OUTPUT_DIR = os.path.join('data', 'processed', 'backtest')
+PREDICTIONS_TABLE = 'backtest_predictions'
+SEASONS_TABLE = 'backtest_seasons'
+CALIBRATION_TABLE = 'backtest_calibration'
+
+# Identifier columns of the training frame; every other column except the label is a feature
+ID_COLUMNS = ['match_id', 'match_date', 'team1', 'team2', 'winner']
+
+# Team features the model is trained on (team1_/team2_ columns of match_feature_set)
+TEAM_COLUMNS = [
+    'team1_momentum_score', 'team2_momentum_score',
+    'team1_avg_batting_score_last_7', 'team2_avg_batting_score_last_7',
+    'team1_bowling_economy_death_last_7', 'team2_bowling_economy_death_last_7',
+    'team1_home_win_rate_overall', 'team2_home_win_rate_overall',
+    'team1_away_win_rate_overall', 'team2_away_win_rate_overall',
+    'team1_batting_first_win_rate_last_7', 'team1_chasing_win_rate_last_7',
+    'team2_batting_first_win_rate_last_7', 'team2_chasing_win_rate_last_7',
+    'team1_margin_of_victory_mean_last_7', 'team2_margin_of_victory_mean_last_7'
+]
+
+# Column prefixes of the lineup aggregates in match_feature_set
+LINEUP_PREFIXES = ('team1_xi_', 'team2_xi_')
+
+# Model settings of notebooks/prediction_model.py, as native xgboost parameters
+MODEL_PARAMS = {'objective': 'binary:logistic', 'eta': 0.1, 'max_depth': 3, 'eval_metric': 'logloss'}
+ROUNDS = 100
+
+CALIBRATION_BINS = 10
+
+def training_frame(team_columns=TEAM_COLUMNS, lineup=False, feature_path=FEATURE_PATH, weather_path=MATCH_WEATHER_PATH):
+    """
+    One row per match with its identifiers, label and features, plus the list of feature columns.
+
+    Features are the team columns, every match_weather column and the
+    ENGINEERED_FEATURES whose inputs are present. label is 1 if team1 won.
+    Rows with any missing feature are dropped. lineup=True also adds every
+    team1_xi_/team2_xi_ column (see lineups.py); those may be missing.
+    """
+    columns = ID_COLUMNS + list(team_columns)
+    df = read_table(feature_path, columns=None if lineup else columns)
+    optional = [col for col in df.columns if col.startswith(LINEUP_PREFIXES)] if lineup else []
+    merged = pd.merge(df[columns + optional], read_table(weather_path), on='match_id', how='inner')
+    added = {'label': (merged['winner'] == merged['team1']).astype(int)}
+    for name, (left, right, operation) in ENGINEERED_FEATURES.items():
+        if left in merged.columns and right in merged.columns:
+            added[name] = operation(merged[left], merged[right])
+    merged = pd.concat([merged, pd.DataFrame(added)], axis=1)
+
+    features = [col for col in merged.columns if col not in ID_COLUMNS and col != 'label']
+    return merged.dropna(subset=[col for col in features if col not in optional]), features
+
+def plan_folds(dates, min_train=50):
+    """
+    Walk-forward folds over date-sorted matches, grouped into one chain per season.
+
+    A fold is (season, start, stop): train on rows [0, start), predict rows
+    [start, stop), one fold per matchweek (Monday to Sunday). Weeks with fewer
+    than min_train earlier matches are not predicted.
+    """
+    weeks = pd.DatetimeIndex(dates).to_period('W').to_numpy()
+    starts = np.flatnonzero(np.r_[True, weeks[1:] != weeks[:-1]])
+    stops = np.r_[starts[1:], len(weeks)]
+    seasons = pd.DatetimeIndex(dates).year.to_numpy()
+
+    chains = {}
+    for start, stop in zip(starts, stops):
+        if start >= min_train:
+            chains.setdefault(int(seasons[start]), []).append((int(seasons[start]), int(start), int(stop)))
+    return list(chains.values())
+
+# Feature matrix and labels of the backtest, set once per worker process
+_MATRIX = None
+_LABELS = None
+
+def _init_worker(matrix, labels):
+    global _MATRIX, _LABELS
+    _MATRIX, _LABELS = matrix, labels
+
+def _run_chain(folds, params, rounds, warm_rounds):
+    """Probabilities for every fold of one chain, as one array in row order"""
+    booster = None
+    probabilities = []
+    for _, start, stop in folds:
+        train = xgb.DMatrix(_MATRIX[:start], label=_LABELS[:start])
+        if booster is not None and warm_rounds:
+            booster = xgb.train(params, train, num_boost_round=warm_rounds, xgb_model=booster)
+        else:
+            booster = xgb.train(params, train, num_boost_round=rounds)
+        probabilities.append(booster.predict(xgb.DMatrix(_MATRIX[start:stop])))
+    return np.concatenate(probabilities)
+
+@stage('backtest')
+def backtest(frame, features, params=MODEL_PARAMS, rounds=ROUNDS, warm_rounds=0, min_train=50, workers=1):
+    """
+    Walk-forward predictions for every match after the first min_train.
+
+    frame and features come from training_frame(). warm_rounds > 0 continues
+    each season's previous booster with that many rounds instead of training
+    rounds from scratch. Returns match_id, date, season, label and
+    probability (of a team1 win), in date order.
+    """
+    frame = frame.sort_values('match_date', kind='stable').reset_index(drop=True)
+    matrix = np.ascontiguousarray(frame[features].to_numpy(dtype=np.float32))
+    labels = frame['label'].to_numpy(dtype=np.float32)
+    chains = plan_folds(frame['match_date'], min_train)
+    count('folds', sum(len(chain) for chain in chains))
+
+    params = dict(params)
+    if workers > 1:
+        # One thread per process, so the pool does not oversubscribe the cores
+        params.setdefault('nthread', 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix, labels)) as executor:
+            results = list(executor.map(_run_chain, chains, [params] * len(chains),
+                                        [rounds] * len(chains), [warm_rounds] * len(chains)))
+    else:
+        _init_worker(matrix, labels)
+        results = [_run_chain(chain, params, rounds, warm_rounds) for chain in chains]
+
+    rows = [row for chain in chains for _, start, stop in chain for row in range(start, stop)]
+    predictions = frame.loc[rows, ['match_id', 'match_date', 'label']].rename(columns={'match_date': 'date'})
+    predictions.insert(2, 'season', predictions['date'].dt.year)
+    predictions['probability'] = np.concatenate(results) if results else np.array([], dtype=np.float32)
+    return predictions.reset_index(drop=True)
+
+def _bins(probability, bins=CALIBRATION_BINS):
+    return np.minimum((probability * bins).astype(int), bins - 1)
+
+def score(label, probability, bins=CALIBRATION_BINS):
+    """matches, accuracy, log_loss, brier and expected calibration error of a set of predictions"""
+    label = np.asarray(label, dtype=np.float64)
+    probability = np.clip(np.asarray(probability, dtype=np.float64), 1e-15, 1 - 1e-15)
+    slot = _bins(probability, bins)
+    counts = np.bincount(slot, minlength=bins)
+    gaps = np.abs(np.bincount(slot, probability - label, minlength=bins))
+    return {
+        'matches': len(label),
+        'accuracy': float(np.mean((probability >= 0.5) == (label == 1))),
+        'log_loss': float(-np.mean(label * np.log(probability) + (1 - label) * np.log(1 - probability))),
+        'brier': float(np.mean((probability - label) ** 2)),
+        'calibration_error': float(gaps.sum() / max(counts.sum(), 1))
+    }
+
+def season_report(predictions, bins=CALIBRATION_BINS):
+    """One row of scores per season, plus an 'all' row"""
+    rows = [{'season': str(season), **score(group['label'], group['probability'], bins)}
+            for season, group in predictions.groupby('season')]
+    rows.append({'season': 'all', **score(predictions['label'], predictions['probability'], bins)})
+    return pd.DataFrame(rows).round(4)
+
+def calibration_table(predictions, bins=CALIBRATION_BINS):
+    """Reliability table: per probability bin, the matches, mean predicted probability and observed team1 win rate"""
+    probability = predictions['probability'].to_numpy(dtype=np.float64)
+    slot = _bins(probability, bins)
+    table = pd.DataFrame({'bin': slot, 'predicted': probability, 'observed': predictions['label'].to_numpy()})
+    table = table.groupby('bin').agg(matches=('predicted', 'size'), predicted=('predicted', 'mean'), observed=('observed', 'mean'))
+    table.insert(0, 'lower', table.index / bins)
+    table.insert(1, 'upper', (table.index + 1) / bins)
+    return table.round(4).reset_index(drop=True)
+
+@stage('run_backtest')
+def run_backtest(rounds=ROUNDS, warm_rounds=0, min_train=50, workers=1, output_dir=OUTPUT_DIR):
+    """Backtest the model settings of prediction_model.py and write the predictions, season and calibration tables"""
+    frame, features = training_frame()
+    predictions = backtest(frame, features, rounds=rounds, warm_rounds=warm_rounds, min_train=min_train, workers=workers)
+    if predictions.empty:
+        print(f"Not enough matches to backtest ({len(frame)} with complete features, min_train={min_train})")
+        return
+
+    seasons = season_report(predictions)
+    write_table(predictions, os.path.join(output_dir, PREDICTIONS_TABLE))
+    write_table(seasons, os.path.join(output_dir, SEASONS_TABLE))
+    write_table(calibration_table(predictions), os.path.join(output_dir, CALIBRATION_TABLE))
+    print(seasons.to_string(index=False))
+    print(f"Saved {len(predictions)} walk-forward predictions to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward (matchweek by matchweek) backtest of the match-winner model")
+    parser.add_argument('--rounds', type=int, default=ROUNDS, help="boosting rounds of a model trained from scratch (default: %(default)s)")
+    parser.add_argument('--warm-rounds', type=int, default=0,
+                        help="rounds added to the previous fold's booster within a season; 0 retrains every fold (default: 0)")
+    parser.add_argument('--min-train', type=int, default=50, help="matches required before the first predicted week (default: 50)")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes running season chains (default: 1)")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help="where the tables are written (default: %(default)s)")
+    args = parser.parse_args()
+
+    run_backtest(rounds=args.rounds, warm_rounds=args.warm_rounds, min_train=args.min_train,
+                 workers=args.workers, output_dir=args.output_dir)
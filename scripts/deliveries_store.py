@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from fetch_players import process_wicket, new_player_stats, summarise_player_stats, save_player_stats
+from fetch_teams import build_team_entries, new_team_stats, add_match_to_team_stats, summarise_team_stats, save_team_stats
+from instrument import stage
+from match_loader import iter_matches
+from teams import is_excluded_match, team_name
+
+# ----------------------
+#  deliveries_store.py
+# ----------------------
+# Flattens every Cricsheet delivery into one typed, columnar ball-by-ball table
+# and derives player/team statistics from it with vectorized group-bys.
+#
+# The store is a directory of memory-mappable .npy files, one per column:
+#   matches/     match_id, date, team1, team2, venue, winner
+#   innings/     match_id, innings, batting_team, bowling_team
+#   deliveries/  match_id, innings, over, ball, batter, bowler, runs_batter,
+#                runs_extras, runs_total, wicket_kind, wickets, bowler_wickets
+#   strings.json dictionaries for the integer-coded string columns
+#
+# Rows are kept in match file order, innings order and delivery order, so the
+# statistics derived here match the ones built from the JSON files exactly.
+# Cricsheet match IDs are numeric and are stored as int64.
+
+STORE_DIR = os.path.join('data', 'processed', 'deliveries')
+
+DELIVERY_DTYPES = {
+    'match_id': np.int64,
+    'innings': np.int8,  # 1-based position in the match's innings list
+    'over': np.int16,
+    'ball': np.int16,  # 1-based position within the over, extras included
+    'batter': np.int32,
+    'bowler': np.int32,
+    'runs_batter': np.int16,
+    'runs_extras': np.int16,
+    'runs_total': np.int16,
+    'wicket_kind': np.int16,  # Code 0 means no wicket fell
+    'wickets': np.int8,  # Wickets that fell on the ball
+    'bowler_wickets': np.int8  # Wickets credited to the bowler (see process_wicket)
+}
+
+INNINGS_DTYPES = {
+    'match_id': np.int64,
+    'innings': np.int8,
+    'batting_team': np.int16,
+    'bowling_team': np.int16
+}
+
+MATCH_DTYPES = {
+    'match_id': np.int64,
+    'date': 'datetime64[D]',
+    'team1': np.int16,
+    'team2': np.int16,
+    'venue': np.int32,
+    'winner': np.int16  # Code 0 means no winner
+}
+
+# Which string dictionary each coded column uses
+STRING_COLUMNS = {
+    'batter': 'players',
+    'bowler': 'players',
+    'wicket_kind': 'wicket_kinds',
+    'batting_team': 'teams',
+    'bowling_team': 'teams',
+    'team1': 'teams',
+    'team2': 'teams',
+    'winner': 'teams',
+    'venue': 'venues'
+}
+
+class _Interner:
+    """Assign dense integer codes to strings in order of first appearance"""
+
+    def __init__(self, reserve_empty=False):
+        self.codes = {}
+        self.values = []
+        if reserve_empty:
+            self.code('')
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+@stage('build_delivery_store')
+def build_delivery_store(matches=None, store_dir=STORE_DIR):
+    """
+    Flatten all match files into the columnar ball-by-ball store.
+
+    matches is an optional iterable of (match_id, match_data) pairs, as yielded by
+    match_loader.iter_matches; by default every file in ipl_data/ is parsed.
+    """
+    if matches is None:
+        matches = iter_matches()
+
+    strings = {
+        'players': _Interner(),
+        'teams': _Interner(reserve_empty=True),
+        'venues': _Interner(),
+        'wicket_kinds': _Interner(reserve_empty=True)
+    }
+    players, teams, kinds = strings['players'], strings['teams'], strings['wicket_kinds']
+
+    match_cols = {name: [] for name in MATCH_DTYPES}
+    innings_cols = {name: [] for name in INNINGS_DTYPES}
+    delivery_cols = {name: [] for name in DELIVERY_DTYPES}
+
+    for match_id, match_data in matches:
+        # Matches without innings data contribute nothing to player or team stats
+        if 'innings' not in match_data or not match_data['innings']:
+            continue
+
+        info = match_data['info']
+        match_teams = info['teams']
+        match_cols['match_id'].append(int(match_id))
+        match_cols['date'].append(info['dates'][0])
+        match_cols['team1'].append(teams.code(match_teams[0]))
+        match_cols['team2'].append(teams.code(match_teams[1]))
+        match_cols['venue'].append(strings['venues'].code(info.get('venue', '')))
+        match_cols['winner'].append(teams.code(info.get('outcome', {}).get('winner') or ''))
+
+        for innings_no, innings in enumerate(match_data['innings'], start=1):
+            if 'overs' not in innings:
+                continue
+
+            batting_team = innings['team']
+            bowling_team = [team for team in match_teams if team != batting_team][0]
+            innings_cols['match_id'].append(int(match_id))
+            innings_cols['innings'].append(innings_no)
+            innings_cols['batting_team'].append(teams.code(batting_team))
+            innings_cols['bowling_team'].append(teams.code(bowling_team))
+
+            for over in innings['overs']:
+                for ball_no, delivery in enumerate(over.get('deliveries', []), start=1):
+                    runs = delivery.get('runs', {})
+                    wickets = delivery.get('wickets')
+                    delivery_cols['match_id'].append(int(match_id))
+                    delivery_cols['innings'].append(innings_no)
+                    delivery_cols['over'].append(over['over'])
+                    delivery_cols['ball'].append(ball_no)
+                    delivery_cols['batter'].append(players.code(delivery['batter']))
+                    delivery_cols['bowler'].append(players.code(delivery['bowler']))
+                    delivery_cols['runs_batter'].append(runs.get('batter', 0))
+                    delivery_cols['runs_extras'].append(runs.get('extras', 0))
+                    delivery_cols['runs_total'].append(runs.get('total', 0))
+                    delivery_cols['wicket_kind'].append(kinds.code(wickets[0].get('kind', '')) if wickets else 0)
+                    delivery_cols['wickets'].append(len(wickets) if wickets else 0)
+                    delivery_cols['bowler_wickets'].append(process_wicket(delivery))
+
+    _write_table(os.path.join(store_dir, 'matches'), match_cols, MATCH_DTYPES)
+    _write_table(os.path.join(store_dir, 'innings'), innings_cols, INNINGS_DTYPES)
+    _write_table(os.path.join(store_dir, 'deliveries'), delivery_cols, DELIVERY_DTYPES)
+    with open(os.path.join(store_dir, 'strings.json'), 'w') as f:
+        json.dump({name: interner.values for name, interner in strings.items()}, f)
+
+    print(f"Delivery store saved to {store_dir} "
+          f"({len(match_cols['match_id'])} matches, {len(delivery_cols['match_id'])} deliveries)")
+
+def _write_table(table_dir, columns, dtypes):
+    os.makedirs(table_dir, exist_ok=True)
+    for name, dtype in dtypes.items():
+        np.save(os.path.join(table_dir, f'{name}.npy'), np.asarray(columns[name], dtype=dtype))
+
+def _read_table(table_dir, dtypes, strings):
+    columns = {}
+    for name in dtypes:
+        values = np.load(os.path.join(table_dir, f'{name}.npy'), mmap_mode='r')
+        if name in STRING_COLUMNS:
+            values = pd.Categorical.from_codes(values, categories=strings[STRING_COLUMNS[name]])
+        columns[name] = values
+    return pd.DataFrame(columns)
+
+def load_delivery_store(store_dir=STORE_DIR):
+    """
+    Load the store as {'matches', 'innings', 'deliveries'} DataFrames.
+
+    Numeric columns are memory-mapped; coded string columns come back as categoricals.
+    """
+    with open(os.path.join(store_dir, 'strings.json'), 'r') as f:
+        strings = json.load(f)
+    return {
+        'matches': _read_table(os.path.join(store_dir, 'matches'), MATCH_DTYPES, strings),
+        'innings': _read_table(os.path.join(store_dir, 'innings'), INNINGS_DTYPES, strings),
+        'deliveries': _read_table(os.path.join(store_dir, 'deliveries'), DELIVERY_DTYPES, strings)
+    }
+
+def _overs_from_balls(balls):
+    """
+    Convert ball counts to overs exactly as the per-delivery loop does.
+
+    fetch_players accumulates 1/6 per delivery; a cumulative sum reproduces the
+    same floating-point result, so derived economies are identical.
+    """
+    lookup = np.concatenate([[0.0], np.cumsum(np.full(int(balls.max(initial=0)), 1/6))])
+    return lookup[balls]
+
+def player_stats_from_store(store):
+    """Derive final player statistics from the store with grouped aggregations"""
+    deliveries = store['deliveries']
+    innings = store['innings']
+    matches = store['matches']
+
+    # Matches of defunct franchises are left out, as in fetch_players
+    excluded = np.array([is_excluded_match([str(m.team1), str(m.team2)]) for m in matches.itertuples(index=False)], dtype=bool)
+    deliveries = deliveries[~deliveries['match_id'].isin(matches['match_id'][excluded])]
+
+    runs_batter = deliveries['runs_batter'].to_numpy()
+    is_dot = deliveries['runs_total'].to_numpy() == 0
+    flags = pd.DataFrame({
+        'match_id': deliveries['match_id'],
+        'innings': deliveries['innings'],
+        'batter': deliveries['batter'].cat.codes,
+        'bowler': deliveries['bowler'].cat.codes,
+        'runs_batter': runs_batter,
+        'runs_total': deliveries['runs_total'],
+        'bowler_wickets': deliveries['bowler_wickets'],
+        'four': runs_batter == 4,
+        'six': runs_batter == 6,
+        'dot': is_dot,
+        'row': np.arange(len(deliveries))
+    })
+
+    batting = flags.groupby(['match_id', 'innings', 'batter'], sort=False).agg(
+        runs=('runs_batter', 'sum'), balls=('row', 'size'), fours=('four', 'sum'),
+        sixes=('six', 'sum'), dots=('dot', 'sum'), first_row=('row', 'min')).reset_index()
+    bowling = flags.groupby(['match_id', 'innings', 'bowler'], sort=False).agg(
+        balls=('row', 'size'), runs_conceded=('runs_total', 'sum'), wickets=('bowler_wickets', 'sum'),
+        dots=('dot', 'sum'), first_row=('row', 'min')).reset_index()
+
+    # Per innings, batters are recorded before bowlers, each in order of first appearance
+    batting['role'] = 0
+    bowling['role'] = 1
+    batting = batting.rename(columns={'batter': 'player'})
+    bowling = bowling.rename(columns={'bowler': 'player'})
+    bowling['overs'] = _overs_from_balls(bowling['balls'].to_numpy())
+    records = pd.concat([batting, bowling], ignore_index=True)
+
+    # Attach innings teams and match dates
+    innings_teams = innings.assign(
+        batting_team=innings['batting_team'].astype(str).map(team_name),
+        bowling_team=innings['bowling_team'].astype(str).map(team_name))
+    records = records.merge(innings_teams, on=['match_id', 'innings'], how='left')
+    records = records.merge(matches[['match_id', 'date']], on='match_id', how='left')
+    records['team'] = np.where(records['role'] == 0, records['batting_team'], records['bowling_team'])
+
+    match_order = pd.Series(np.arange(len(matches)), index=matches['match_id'].to_numpy())
+    records['match_pos'] = records['match_id'].map(match_order)
+    records = records.sort_values(['match_pos', 'innings', 'role', 'first_row'], kind='stable')
+
+    names = deliveries['batter'].cat.categories
+    player_stats = new_player_stats()
+    # Batting and bowling rows share one frame, so counts come back as floats
+    batting_fields = ['runs', 'balls', 'fours', 'sixes', 'dots']
+    bowling_fields = ['runs_conceded', 'wickets', 'dots']
+    for rec in records.itertuples(index=False):
+        name = names[rec.player]
+        record = player_stats[name]
+        record.name = name
+        record.teams.add(rec.team)
+        record.latest_team = rec.team
+        if rec.role == 0:
+            record.add_batting(str(rec.match_id), rec.date, {field: int(getattr(rec, field)) for field in batting_fields})
+        else:
+            performance = {field: int(getattr(rec, field)) for field in bowling_fields}
+            performance['overs'] = float(rec.overs)
+            record.add_bowling(str(rec.match_id), rec.date, performance)
+
+    return summarise_player_stats(player_stats)
+
+def team_stats_from_store(store):
+    """Derive final team statistics from the store with grouped aggregations"""
+    deliveries = store['deliveries']
+    innings = store['innings']
+    matches = store['matches']
+
+    over = deliveries['over'].to_numpy()
+    runs_total = deliveries['runs_total'].to_numpy().astype(np.int64)
+    totals = pd.DataFrame({
+        'match_id': deliveries['match_id'],
+        'innings': deliveries['innings'],
+        'score': runs_total,
+        'powerplay_runs': np.where(over < 6, runs_total, 0),
+        'death_overs_runs': np.where(over >= 15, runs_total, 0),
+        'wickets': deliveries['wicket_kind'].cat.codes.to_numpy() != 0
+    }).groupby(['match_id', 'innings'], sort=False).sum()
+
+    # Only the first two innings count towards team stats; super overs are ignored
+    first_two = innings[innings['innings'] <= 2]
+    first_two = first_two.join(totals, on=['match_id', 'innings'])
+    innings_by_match = {}
+    for rec in first_two.itertuples(index=False):
+        # An innings with no deliveries has no totals row
+        score = 0 if pd.isna(rec.score) else int(rec.score)
+        innings_by_match.setdefault(rec.match_id, []).append((
+            str(rec.batting_team), score,
+            0 if pd.isna(rec.powerplay_runs) else int(rec.powerplay_runs),
+            0 if pd.isna(rec.death_overs_runs) else int(rec.death_overs_runs),
+            0 if pd.isna(rec.wickets) else int(rec.wickets)
+        ))
+
+    team_stats = new_team_stats()
+    for match in matches.itertuples(index=False):
+        if is_excluded_match([str(match.team1), str(match.team2)]):
+            continue
+        innings_totals = innings_by_match.get(match.match_id)
+        if not innings_totals:
+            continue
+        entries = build_team_entries(match.date.to_pydatetime(), str(match.venue), str(match.winner) or None, innings_totals)
+        add_match_to_team_stats(team_stats, entries)
+
+    return summarise_team_stats(team_stats)
+
+@stage('derive_stats_from_store')
+def derive_stats_from_store(store_dir=STORE_DIR):
+    """Rebuild players_performance.csv and team_performance.csv from the store without re-parsing JSON"""
+    store = load_delivery_store(store_dir)
+    save_player_stats(player_stats_from_store(store))
+    save_team_stats(team_stats_from_store(store))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar ball-by-ball store or derive stats from it")
+    parser.add_argument('--derive', action='store_true',
+                        help="re-derive player and team CSVs from an existing store instead of building it")
+    parser.add_argument('--store-dir', default=STORE_DIR, help="store location (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.derive:
+        derive_stats_from_store(args.store_dir)
+    else:
+        build_delivery_store(store_dir=args.store_dir)
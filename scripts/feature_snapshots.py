@@ -0,0 +1,174 @@
+import argparse
+import os
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from fetch_all import extract_all
+from fetch_players import new_player_stats, add_match_to_player_stats, summarise_player
+from fetch_teams import new_team_stats, add_match_to_team_stats, summarise_team
+from form_engine import add_form_arguments, form_windows, form_windows_from_args
+from instrument import stage
+from match_loader import list_match_files, map_matches
+from table_io import read_table, write_table
+from teams import team_code
+
+# ----------------------
+#  feature_snapshots.py
+# ----------------------
+# Point-in-time (as-of) feature store. Matches are swept once in date order;
+# before each match day the features of every team and player taking part are
+# recorded exactly as they stood, then that day's matches are folded in. A
+# 2017 match therefore only ever sees statistics built from earlier matches,
+# instead of the end-of-history rows in team_performance. Career figures come
+# from running totals kept as matches are folded and form windows read only the
+# innings they weigh, so a snapshot costs the same late in a career as early.
+#
+# Each snapshot row is (entity, date, match_id, features...): the entity's
+# features at the start of `date`, taken for match `match_id`. A final row per
+# entity, dated the day after the last match and with no match_id, holds the
+# current state. Entities without any earlier match have empty features.
+
+SNAPSHOT_DIR = os.path.join('data', 'processed', 'snapshots')
+TEAM_SNAPSHOTS_TABLE = 'team_snapshots'
+PLAYER_SNAPSHOTS_TABLE = 'player_snapshots'
+
+def _match_date(extracted, entries):
+    """Date of a match from its extracted player innings or team entries"""
+    if extracted is not None:
+        return extracted[0]
+    return entries[0][1][0]
+
+def _snapshot_row(key, entity, snapshot_date, match_id, features):
+    """One snapshot row: entity, date and match_id followed by the features (if any)"""
+    row = {key: entity, 'date': snapshot_date.strftime('%Y-%m-%d'), 'match_id': match_id}
+    if features is not None:
+        row.update((name, value) for name, value in features.items() if name != key)
+    return row
+
+def _match_players(innings_list):
+    """Names of everyone who batted or bowled in a match, in order of first appearance"""
+    players = {}
+    for _, _, batter_stats, bowler_stats in innings_list:
+        players.update(dict.fromkeys(batter_stats))
+        players.update(dict.fromkeys(bowler_stats))
+    return list(players)
+
+def build_snapshots(results, forms=None):
+    """
+    Sweep matches in date order and record team and player features as they stood before each match.
+
+    results is an iterable of (match_id, (match_row, player_innings, team_entries))
+    as yielded by map_matches(extract_all, ...). Matches on the same date are
+    taken in file order. Returns (team_rows, player_rows).
+    """
+    if forms is None:
+        forms = form_windows()
+
+    matches = sorted(
+        ((_match_date(extracted, entries), match_id, extracted, entries)
+         for match_id, (_, extracted, entries) in results if extracted is not None or entries),
+        key=itemgetter(0)
+    )
+
+    player_stats = new_player_stats()
+    team_stats = new_team_stats()
+    team_rows = []
+    player_rows = []
+
+    for match_date, day in groupby(matches, key=itemgetter(0)):
+        day = list(day)
+
+        # Record everyone's features before any of the day's matches are added
+        for _, match_id, extracted, entries in day:
+            for team, *_ in entries or []:
+                features = summarise_team(team, team_stats[team], forms) if team in team_stats else None
+                team_rows.append(_snapshot_row('team_name', team_code(team), match_date, match_id, features))
+            for player in _match_players(extracted[1]) if extracted is not None else []:
+                features = summarise_player(player_stats[player], forms, match_date.year) if player in player_stats else None
+                player_rows.append(_snapshot_row('player_name', player, match_date, match_id, features))
+
+        for _, match_id, extracted, entries in day:
+            if extracted is not None:
+                add_match_to_player_stats(player_stats, match_id, *extracted)
+            if entries:
+                add_match_to_team_stats(team_stats, entries)
+
+    # Current state, valid from the day after the last match
+    if matches:
+        final_date = matches[-1][0] + timedelta(days=1)
+        for team, stats in team_stats.items():
+            team_rows.append(_snapshot_row('team_name', team_code(team), final_date, None, summarise_team(team, stats, forms)))
+        for player, stats in player_stats.items():
+            player_rows.append(_snapshot_row('player_name', player, final_date, None, summarise_player(stats, forms, final_date.year)))
+
+    return team_rows, player_rows
+
+def save_snapshots(team_rows, player_rows, snapshot_dir=SNAPSHOT_DIR):
+    """Write the team and player snapshot tables"""
+    write_table(pd.DataFrame(team_rows), os.path.join(snapshot_dir, TEAM_SNAPSHOTS_TABLE))
+    write_table(pd.DataFrame(player_rows), os.path.join(snapshot_dir, PLAYER_SNAPSHOTS_TABLE))
+    print(f"Saved {len(team_rows)} team and {len(player_rows)} player snapshots to {snapshot_dir}")
+
+class SnapshotIndex:
+    """
+    Indexed as-of lookup over team or player snapshots.
+
+    Rows are grouped by entity and sorted by date once; a lookup is a dict hit
+    followed by a binary search over that entity's snapshot dates.
+    """
+
+    def __init__(self, snapshots, key):
+        self.key = key
+        self.snapshots = snapshots.sort_values([key, 'date'], kind='stable').reset_index(drop=True)
+        self.dates = pd.to_datetime(self.snapshots['date']).to_numpy().astype('datetime64[D]')
+
+        entities = self.snapshots[key].astype('object').to_numpy()
+        starts = np.flatnonzero(np.r_[True, entities[1:] != entities[:-1]]) if len(entities) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(entities)]
+        self.ranges = {entity: (start, stop) for entity, start, stop in zip(entities[starts], starts, stops)}
+
+    def position(self, entity, as_of):
+        """Row position of the entity's features at the start of date as_of, or None if the entity is unknown"""
+        if entity not in self.ranges:
+            return None
+        start, stop = self.ranges[entity]
+        pos = start + int(np.searchsorted(self.dates[start:stop], np.datetime64(as_of, 'D'), side='left'))
+        # Past the final snapshot the current state still holds
+        return min(pos, stop - 1)
+
+    def as_of(self, entity, as_of):
+        """The entity's snapshot row (a Series) as it stood at the start of date as_of, or None"""
+        pos = self.position(entity, as_of)
+        return None if pos is None else self.snapshots.iloc[pos]
+
+def load_snapshot_index(kind='team', snapshot_dir=SNAPSHOT_DIR):
+    """Load the team or player snapshot table into a SnapshotIndex"""
+    table, key = (TEAM_SNAPSHOTS_TABLE, 'team_name') if kind == 'team' else (PLAYER_SNAPSHOTS_TABLE, 'player_name')
+    return SnapshotIndex(read_table(os.path.join(snapshot_dir, table)), key)
+
+@stage('build_feature_snapshots')
+def build_feature_snapshots(match_files=None, workers=1, forms=None, snapshot_dir=SNAPSHOT_DIR):
+    """Parse every match file and write the team and player snapshot tables"""
+    if match_files is None:
+        match_files = list_match_files()
+
+    if not match_files:
+        print("No match JSON files found. Please ensure data is in ipl_data directory.")
+        return
+
+    print(f"Processing {len(match_files)} match files...")
+    team_rows, player_rows = build_snapshots(map_matches(extract_all, match_files, workers=workers), forms)
+    save_snapshots(team_rows, player_rows, snapshot_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build point-in-time team and player feature snapshots")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes used to parse match files (default: 1)")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help="where the snapshot tables are written (default: %(default)s)")
+    add_form_arguments(parser)
+    args = parser.parse_args()
+
+    build_feature_snapshots(workers=args.workers, forms=form_windows_from_args(args), snapshot_dir=args.snapshot_dir)
@@ -0,0 +1,153 @@
+import argparse
+from datetime import datetime
+
+from fetch_matches import build_match_row, try_extract_match_row, save_match_features
+from fetch_players import (new_player_stats, new_innings_stats, add_delivery_to_innings_stats, extract_player_innings,
+                           add_match_to_player_stats, summarise_player_stats, save_player_stats)
+from fetch_teams import (new_team_stats, summarise_over, innings_totals_from_overs, build_team_entries,
+                         extract_team_innings, add_match_to_team_stats, summarise_team_stats, save_team_stats)
+from form_engine import add_form_arguments, form_windows_from_args
+from instrument import stage
+from match_loader import iter_match_events, list_match_files, map_match_files, map_matches, match_id_from_path
+from teams import is_excluded_match, team_name
+
+# ----------------------
+#  fetch_all.py
+# ----------------------
+# Single ingestion stage for match, player and team data. Every Cricsheet JSON
+# file is parsed once and fed to all three extractors from the same in-memory
+# pass, instead of each fetch script re-reading ipl_data/ on its own.
+
+def extract_all(match_id, data):
+    """
+    Run the match, player and team extractors on one parsed match.
+
+    Returns (match_row, player_innings, team_entries); each part is None when
+    the corresponding extractor skips the match.
+    """
+    return try_extract_match_row(match_id, data), extract_player_innings(match_id, data), extract_team_innings(match_id, data)
+
+def extract_all_streaming(file_path):
+    """
+    Same result as extract_all, computed while streaming the match file one over at a time.
+
+    Per-innings batter/bowler figures and per-over summaries are accumulated as
+    each over is read, so the full delivery tree is never held in memory.
+    """
+    match_id = match_id_from_path(file_path)
+    info = {}
+    innings = []
+
+    for kind, value in iter_match_events(file_path):
+        if kind == 'over':
+            current = innings[-1]
+            for delivery in value.get('deliveries', []):
+                add_delivery_to_innings_stats(current['batters'], current['bowlers'], delivery)
+            current['overs'].append(summarise_over(value))
+        elif kind == 'innings_start':
+            batters, bowlers = new_innings_stats()
+            innings.append({'team': None, 'has_overs': False, 'batters': batters, 'bowlers': bowlers, 'overs': []})
+        elif kind == 'team':
+            innings[-1]['team'] = value
+        elif kind == 'overs':
+            innings[-1]['has_overs'] = True
+        elif kind == 'info':
+            info = value
+
+    # Match row: runs and wickets of the first two innings
+    try:
+        row = build_match_row(match_id, info, [
+            (sum(runs for _, runs, _ in inn['overs']), sum(wickets for _, _, wickets in inn['overs']))
+            for inn in innings[:2]
+        ])
+    except Exception as e:
+        print(f"Error processing {match_id}: {e}")
+        row = None
+
+    # Matches of defunct franchises count for neither players nor teams
+    if not innings or is_excluded_match(info['teams']):
+        return row, None, None
+
+    match_date = datetime.strptime(info['dates'][0], '%Y-%m-%d')
+
+    # Player figures for every innings that has an overs list
+    innings_list = []
+    for inn in innings:
+        if not inn['has_overs']:
+            continue
+        bowling_team = [team for team in info['teams'] if team != inn['team']][0]
+        innings_list.append((team_name(inn['team']), team_name(bowling_team), dict(inn['batters']), dict(inn['bowlers'])))
+
+    # Team records from the first two innings
+    entries = build_team_entries(match_date, info.get('venue', ''), info.get('outcome', {}).get('winner', None),
+                                 [(inn['team'],) + innings_totals_from_overs(inn['overs']) for inn in innings[:2]])
+
+    return row, (match_date, innings_list), entries
+
+def fold_all(results, folded=None):
+    """
+    Fold per-match results, in order, into (match_rows, player_stats, team_stats).
+
+    results is an iterable of (match_id, (match_row, player_innings, team_entries)),
+    in the same file order a full run would process them. folded continues an
+    earlier fold of the matches before them, and is updated in place.
+    """
+    if folded is None:
+        folded = ([], new_player_stats(), new_team_stats())
+    match_data, player_stats, team_stats = folded
+
+    for match_id, (row, extracted, entries) in results:
+        if row is not None:
+            match_data.append(row)
+        if extracted is not None:
+            add_match_to_player_stats(player_stats, match_id, *extracted)
+        if entries:
+            add_match_to_team_stats(team_stats, entries)
+    return folded
+
+def save_folded(folded, forms=None):
+    """
+    Write all three CSVs from a fold made by fold_all.
+
+    forms selects the recent-form columns of the player and team CSVs (last 7
+    matches by default).
+    """
+    match_data, player_stats, team_stats = folded
+    save_match_features(match_data)
+    save_player_stats(summarise_player_stats(player_stats, forms))
+    save_team_stats(summarise_team_stats(team_stats, forms))
+
+def save_all(results, forms=None):
+    """Merge per-match results in order and write all three CSVs (see fold_all and save_folded)"""
+    save_folded(fold_all(results), forms)
+
+@stage('fetch_all')
+def fetch_all(match_files=None, workers=1, stream=False, forms=None):
+    """
+    Build match_metadata.csv, players_performance.csv and team_performance.csv in one pass.
+
+    With workers > 1, match files are parsed and extracted in a process pool.
+    With stream=True, match files are streamed one over at a time instead of
+    being parsed whole, which bounds memory on very long matches.
+    """
+    if match_files is None:
+        match_files = list_match_files()
+
+    if not match_files:
+        print("No match JSON files found. Please ensure data is in ipl_data directory.")
+        return
+
+    print(f"Processing {len(match_files)} match files...")
+    if stream:
+        save_all(map_match_files(extract_all_streaming, match_files, workers=workers), forms)
+    else:
+        save_all(map_matches(extract_all, match_files, workers=workers), forms)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build match, player and team statistics in a single pass")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes used to parse match files (default: 1)")
+    parser.add_argument('--stream', action='store_true', help="stream match files over by over to bound memory")
+    add_form_arguments(parser)
+    args = parser.parse_args()
+
+    fetch_all(workers=args.workers, stream=args.stream, forms=form_windows_from_args(args))
@@ -1,192 +1,177 @@
+import argparse
 import pandas as pd
 import os
-import json
-import glob
-from datetime import datetime
 from collections import defaultdict
 
-def extract_match_features():
+from instrument import stage
+from match_loader import list_match_files, map_matches
+from table_io import write_table
+from teams import is_excluded_match, team_name
+
+def innings_runs_and_wickets(innings):
+    """Return (total runs, deliveries with a wicket) for one innings"""
+    deliveries = [d for over in innings.get('overs', []) for d in over.get('deliveries', [])]
+    wickets = sum(1 for d in deliveries if 'wickets' in d)
+    runs = sum(d.get('runs', {}).get('total', 0) for d in deliveries)
+    return runs, wickets
+
+def build_match_row(match_id, info, innings_totals):
     """
-    Extract match-level features from JSON files and save to CSV.
+    Build the match-level row from the match info and (runs, wickets) of the first two innings.
+
+    Returns None for matches involving excluded teams. The day_night column is
+    filled in later by assign_day_night, once every match on the same date is known.
     """
-    # List of teams to exclude - only historical/defunct teams
-    EXCLUDED_TEAMS = {
-        'Rising Pune Supergiant',
-        'Gujarat Lions',
-        'Rising Pune Supergiants',
-        'Pune Warriors',
-        'Kochi Tuskers Kerala',
-        'Deccan Chargers'  # Historical team
-    }
+    date = info.get('dates', [''])[0] if 'dates' in info else ''
+    teams = info.get('teams', [])
     
-    # Team name mapping for teams that have changed names or have variations
-    TEAM_NAME_MAPPING = {
-        'Kings XI Punjab': 'Punjab Kings',
-        'Royal Challengers Bangalore': 'Royal Challengers Bengaluru',
-        'Delhi Daredevils': 'Delhi Capitals',
-        'Gujarat Titans': 'Gujarat Titans', 
-        'Lucknow Super Giants': 'Lucknow Super Giants'
-    }
+    # Skip matches involving excluded teams
+    if is_excluded_match(teams):
+        return None
+        
+    # Map team names for consistency
+    team1 = team_name(teams[0]) if len(teams) > 0 else ''
+    team2 = team_name(teams[1]) if len(teams) > 1 else ''
     
-    # Create output directory if it doesn't exist
-    output_dir = os.path.join('data', 'raw', 'matches')
-    os.makedirs(output_dir, exist_ok=True)
+    toss = info.get('toss', {})
+    toss_winner = toss.get('winner', '')
+    # Map toss winner name for consistency
+    toss_winner = team_name(toss_winner)
+    toss_decision = toss.get('decision', '')
+    
+    venue = info.get('venue', '')
+    city = info.get('city', '')
     
-    # Get list of match JSON files
-    match_files = glob.glob(os.path.join('ipl_data', '*.json'))
+    # Extract event/stage information
+    event = info.get('event', {})
+    stage = event.get('stage', 'Group') if event else 'Group'
     
-    if not match_files:
-        print("No match JSON files found. Please ensure data is in ipl_data directory.")
-        return
+    outcome = info.get('outcome', {})
+    winner = outcome.get('winner', '')
+    # Map winner name for consistency
+    winner = team_name(winner)
     
-    # First pass - collect matches by date to determine day/night
+    # Extract win type and margin
+    win_by = ''
+    win_margin = 0
+    if 'by' in outcome:
+        for win_type, margin in outcome['by'].items():
+            win_by = win_type
+            win_margin = margin
+    
+    innings1_runs, innings1_wickets = innings_totals[0] if len(innings_totals) > 0 else (0, 0)
+    innings2_runs, innings2_wickets = innings_totals[1] if len(innings_totals) > 1 else (0, 0)
+    
+    dl_applied = 'method' in outcome
+    
+    return {
+        'match_id': match_id,
+        'date': date,
+        'team1': team1,
+        'team2': team2,
+        'toss_winner': toss_winner,
+        'toss_decision': toss_decision,
+        'venue': venue,
+        'city': city,
+        'match_type': stage,  # Using stage field for match_type
+        'winner': winner,
+        'win_by': win_by,
+        'win_margin': win_margin,
+        'innings1_runs': innings1_runs,
+        'innings2_runs': innings2_runs,
+        'innings1_wickets': innings1_wickets,
+        'innings2_wickets': innings2_wickets,
+        'day_night': 'Night',  # Resolved by assign_day_night
+        'dl_applied': dl_applied
+    }
+
+def extract_match_row(match_id, data):
+    """Extract the match-level row for a single parsed match (see build_match_row)"""
+    info = data.get('info', {})
+    
+    # Skip matches involving excluded teams before walking any deliveries
+    if is_excluded_match(info.get('teams', [])):
+        return None
+    
+    # Extract innings data if available
+    innings = data.get('innings', [])
+    return build_match_row(match_id, info, [innings_runs_and_wickets(inn) for inn in innings[:2]])
+
+def try_extract_match_row(match_id, data):
+    """extract_match_row that reports and skips malformed matches instead of raising"""
+    try:
+        return extract_match_row(match_id, data)
+    except Exception as e:
+        print(f"Error processing {match_id}: {e}")
+        return None
+
+def assign_day_night(match_data):
+    """
+    Determine day/night for every extracted match row, in place.
+
+    If multiple matches are on the same date, the first match (by ID) is a day
+    match and the rest are night matches.
+    """
+    # Collect matches by date
     matches_by_date = defaultdict(list)
-    date_match_mapping = {}
-    
-    # First scan to group matches by date
-    for file_path in match_files:
-        try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            
-            match_id = os.path.basename(file_path).split('.')[0]
-            info = data.get('info', {})
-            date = info.get('dates', [''])[0] if 'dates' in info else ''
-            teams = info.get('teams', [])
-            
-            # Skip matches involving excluded teams
-            if any(team in EXCLUDED_TEAMS for team in teams):
-                continue
-                
-            if date:
-                matches_by_date[date].append(match_id)
-                date_match_mapping[match_id] = date
-        except Exception as e:
-            print(f"Error pre-processing {file_path}: {e}")
+    for row in match_data:
+        if row['date']:
+            matches_by_date[row['date']].append(row['match_id'])
     
     # Sort match IDs within each date to determine day/night
     for date, match_ids in matches_by_date.items():
         match_ids.sort()  # Sort by match ID (ascending)
     
-    # Second pass - extract all match data
-    match_data = []
-    
-    for file_path in match_files:
-        try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            
-            # Extract match ID from filename
-            match_id = os.path.basename(file_path).split('.')[0]
-            
-            # Extract basic match info
-            info = data.get('info', {})
-            
-            date = info.get('dates', [''])[0] if 'dates' in info else ''
-            teams = info.get('teams', [])
-            
-            # Skip matches involving excluded teams
-            if any(team in EXCLUDED_TEAMS for team in teams):
-                continue
-                
-            # Map team names for consistency
-            team1 = TEAM_NAME_MAPPING.get(teams[0], teams[0]) if len(teams) > 0 else ''
-            team2 = TEAM_NAME_MAPPING.get(teams[1], teams[1]) if len(teams) > 1 else ''
-            
-            toss = info.get('toss', {})
-            toss_winner = toss.get('winner', '')
-            # Map toss winner name for consistency
-            toss_winner = TEAM_NAME_MAPPING.get(toss_winner, toss_winner)
-            toss_decision = toss.get('decision', '')
-            
-            venue = info.get('venue', '')
-            city = info.get('city', '')
-            
-            match_type = info.get('match_type', '')
-            
-            # Extract event/stage information
-            event = info.get('event', {})
-            stage = event.get('stage', 'Group') if event else 'Group'
-            
-            outcome = info.get('outcome', {})
-            winner = outcome.get('winner', '')
-            # Map winner name for consistency
-            winner = TEAM_NAME_MAPPING.get(winner, winner)
-            
-            # Extract win type and margin
-            win_by = ''
-            win_margin = 0
-            if 'by' in outcome:
-                for win_type, margin in outcome['by'].items():
-                    win_by = win_type
-                    win_margin = margin
-            
-            # Extract innings data if available
-            innings = data.get('innings', [])
-            
-            innings1_runs = 0
-            innings2_runs = 0
-            innings1_wickets = 0
-            innings2_wickets = 0
-            
-            if len(innings) > 0:
-                # Count deliveries to calculate wickets
-                deliveries1 = [d for over in innings[0].get('overs', []) for d in over.get('deliveries', [])]
-                innings1_wickets = sum(1 for d in deliveries1 if 'wickets' in d)
-                
-                # Calculate total runs
-                innings1_runs = sum(d.get('runs', {}).get('total', 0) for d in deliveries1)
-            
-            if len(innings) > 1:
-                # Count deliveries to calculate wickets
-                deliveries2 = [d for over in innings[1].get('overs', []) for d in over.get('deliveries', [])]
-                innings2_wickets = sum(1 for d in deliveries2 if 'wickets' in d)
-                
-                # Calculate total runs
-                innings2_runs = sum(d.get('runs', {}).get('total', 0) for d in deliveries2)
-            
-            # Determine day/night based on the rule:
-            # If multiple matches on same date, first match (by ID) is day match, rest are night
-            day_night_value = "Night"  # Default assumption
-            if date in matches_by_date and len(matches_by_date[date]) > 1:
-                # If this is the lowest match ID for this date, it's a day match
-                if match_id == matches_by_date[date][0]:
-                    day_night_value = "Day"
-            
-            dl_applied = 'method' in outcome
-            
-            match_data.append({
-                'match_id': match_id,
-                'date': date,
-                'team1': team1,
-                'team2': team2,
-                'toss_winner': toss_winner,
-                'toss_decision': toss_decision,
-                'venue': venue,
-                'city': city,
-                'match_type': stage,  # Using stage field for match_type
-                'winner': winner,
-                'win_by': win_by,
-                'win_margin': win_margin,
-                'innings1_runs': innings1_runs,
-                'innings2_runs': innings2_runs,
-                'innings1_wickets': innings1_wickets,
-                'innings2_wickets': innings2_wickets,
-                'day_night': day_night_value,  # Using new day/night value
-                'dl_applied': dl_applied
-            })
-            
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-    
-    # Create DataFrame and save to CSV
+    for row in match_data:
+        day_night_value = "Night"  # Default assumption
+        match_ids = matches_by_date.get(row['date'], [])
+        # If this is the lowest match ID for this date, it's a day match
+        if len(match_ids) > 1 and row['match_id'] == match_ids[0]:
+            day_night_value = "Day"
+        row['day_night'] = day_night_value
+
+@stage('save_match_features')
+def save_match_features(match_data):
+    """Resolve day/night for the extracted rows and save them as the match_metadata table"""
+    # Create output directory if it doesn't exist
+    output_dir = os.path.join('data', 'raw', 'matches')
+    os.makedirs(output_dir, exist_ok=True)
+    
+    assign_day_night(match_data)
+    
+    # Create DataFrame and save it (Parquet by default, see table_io.py)
     if match_data:
         df = pd.DataFrame(match_data)
-        output_path = os.path.join(output_dir, 'match_metadata.csv')
-        df.to_csv(output_path, index=False)
+        output_path = write_table(df, os.path.join(output_dir, 'match_metadata'))
         print(f"Match features saved to {output_path}")
     else:
         print("No match data was extracted.")
 
+@stage('extract_match_features')
+def extract_match_features(matches=None, workers=1):
+    """
+    Extract match-level features from JSON files and save to CSV.
+
+    matches is an optional iterable of (match_id, match_data) pairs, as yielded by
+    match_loader.iter_matches; by default every file in ipl_data/ is parsed, using
+    a pool of `workers` processes when workers > 1.
+    """
+    if matches is None:
+        match_files = list_match_files()
+        if not match_files:
+            print("No match JSON files found. Please ensure data is in ipl_data directory.")
+            return
+        rows = map_matches(try_extract_match_row, match_files, workers=workers)
+    else:
+        rows = ((match_id, try_extract_match_row(match_id, data)) for match_id, data in matches)
+    
+    match_data = [row for _, row in rows if row is not None]
+    
+    save_match_features(match_data)
+
 if __name__ == "__main__":
-    extract_match_features()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract match-level features from Cricsheet JSON files")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes used to parse match files (default: 1)")
+    args = parser.parse_args()
+
+    extract_match_features(workers=args.workers)
\ No newline at end of file
@@ -1,16 +1,51 @@
-import json
-import os
+import argparse
 import pandas as pd
 from collections import defaultdict
-from datetime import datetime
+from datetime import date, datetime
 import numpy as np
 from pathlib import Path
 
+from form_engine import RECENT_WINDOW, PerformanceLog, add_form_arguments, form_depth, form_windows, form_windows_from_args
+from instrument import stage
+from match_loader import list_match_files, map_matches
+from table_io import write_table
+from teams import is_excluded_match, team_name
+
+# Per-innings fields kept for every player, with their array typecodes
+BATTING_FIELDS = {'runs': 'i', 'balls': 'i', 'fours': 'i', 'sixes': 'i', 'dots': 'i'}
+BOWLING_FIELDS = {'overs': 'd', 'runs_conceded': 'i', 'wickets': 'i', 'dots': 'i'}
+
+class PlayerRecord:
+    """Everything accumulated for one player across matches"""
+    __slots__ = ('name', 'teams', 'latest_team', 'batting', 'bowling', 'match_ids')
+
+    def __init__(self):
+        self.name = ''
+        self.teams = set()
+        self.latest_team = ''
+        self.batting = PerformanceLog(BATTING_FIELDS)
+        self.bowling = PerformanceLog(BOWLING_FIELDS)
+        self.match_ids = set()
+
+    def add_batting(self, match_id, match_date, stats):
+        """Add one batting innings (see PerformanceLog.append)"""
+        self.batting.append(match_id, match_date, stats)
+        self.match_ids.add(match_id)
+
+    def add_bowling(self, match_id, match_date, stats):
+        """Add one bowling innings (see PerformanceLog.append)"""
+        self.bowling.append(match_id, match_date, stats)
+        self.match_ids.add(match_id)
+
+    def matches_played(self):
+        """Number of distinct matches the player batted or bowled in"""
+        return len(self.match_ids)
+
 def determine_role(player_stats):
     """Determine player role based on their statistics"""
-    total_runs = sum(match['runs'] for match in player_stats['batting_performances'])
-    total_wickets = sum(match['wickets'] for match in player_stats['bowling_performances'])
-    total_matches = len(set(match['match_id'] for match in player_stats['batting_performances'] + player_stats['bowling_performances']))
+    total_runs = player_stats.batting.totals['runs']
+    total_wickets = player_stats.bowling.totals['wickets']
+    total_matches = player_stats.matches_played()
     
     # Basic classification logic
     if total_wickets > total_matches * 0.5:  # Average more than 0.5 wickets per match
@@ -23,23 +58,24 @@ def determine_role(player_stats):
 
 def calculate_player_consistency(stats, role):
     """Calculate player consistency score based on role and recent performances"""
-    batting_perfs = sorted(stats['batting_performances'], key=lambda x: x['date'], reverse=True)[:7]
-    bowling_perfs = sorted(stats['bowling_performances'], key=lambda x: x['date'], reverse=True)[:7]
+    batting = stats.batting
+    bowling = stats.bowling
     
     # Calculate batting consistency if relevant
     consistency_bat = 0
     if role in ['Batsman', 'All-rounder']:
-        if batting_perfs:
+        if len(batting):
             # Get last 7 matches stats
-            runs_per_match = [p['runs'] for p in batting_perfs]
+            runs_per_match = batting.latest('runs', RECENT_WINDOW)
+            innings_count = len(runs_per_match)
             total_runs = sum(runs_per_match)
-            total_balls = sum(p['balls'] for p in batting_perfs)
-            boundaries = sum(p['fours'] + p['sixes'] for p in batting_perfs)
+            total_balls = sum(batting.latest('balls', RECENT_WINDOW))
+            boundaries = sum(batting.latest('fours', RECENT_WINDOW)) + sum(batting.latest('sixes', RECENT_WINDOW))
             
             # Calculate metrics
-            avg_last_7 = total_runs / len(batting_perfs)
+            avg_last_7 = total_runs / innings_count
             strike_rate_last_7 = (total_runs / total_balls * 100) if total_balls > 0 else 0
-            boundaries_per_match = boundaries / len(batting_perfs)
+            boundaries_per_match = boundaries / innings_count
             std_dev_runs = np.std(runs_per_match) if len(runs_per_match) > 1 else 0
             
             # Normalize values
@@ -59,23 +95,26 @@ def calculate_player_consistency(stats, role):
     # Calculate bowling consistency if relevant
     consistency_bowl = 0
     if role in ['Bowler', 'All-rounder']:
-        if bowling_perfs:
+        if len(bowling):
             # Get last 7 matches stats
-            wickets_per_match = [p['wickets'] for p in bowling_perfs]
+            wickets_per_match = bowling.latest('wickets', RECENT_WINDOW)
+            runs_conceded = bowling.latest('runs_conceded', RECENT_WINDOW)
+            overs = bowling.latest('overs', RECENT_WINDOW)
+            innings_count = len(wickets_per_match)
             total_wickets = sum(wickets_per_match)
-            total_runs_conceded = sum(p['runs_conceded'] for p in bowling_perfs)
-            total_overs = sum(p['overs'] for p in bowling_perfs)
-            total_dots = sum(p['dots'] for p in bowling_perfs)
+            total_runs_conceded = sum(runs_conceded)
+            total_overs = sum(overs)
+            total_dots = sum(bowling.latest('dots', RECENT_WINDOW))
             total_balls = total_overs * 6
             
             # Calculate metrics
-            economy_per_match = [(p['runs_conceded'] / p['overs']) if p['overs'] > 0 else 0 for p in bowling_perfs]
+            economy_per_match = [(runs / o) if o > 0 else 0 for runs, o in zip(runs_conceded, overs)]
             avg_economy = (total_runs_conceded / total_overs) if total_overs > 0 else 0
             dot_ball_pct = (total_dots / total_balls * 100) if total_balls > 0 else 0
             std_dev_economy = np.std(economy_per_match) if len(economy_per_match) > 1 else 0
             
             # Normalize values
-            normalized_wickets = min(total_wickets / len(bowling_perfs) * 20, 100)  # 5 wickets per match as max
+            normalized_wickets = min(total_wickets / innings_count * 20, 100)  # 5 wickets per match as max
             normalized_dots = dot_ball_pct  # Already a percentage
             normalized_economy = max(0, 100 - (avg_economy * 10))  # Economy of 10+ gets 0, 0 gets 100
             volatility_score = 100 - min((std_dev_economy / (avg_economy if avg_economy > 0 else 1)) * 100, 100)
@@ -113,199 +152,268 @@ def process_wicket(delivery):
             
     return wicket_count
 
-def process_player_stats():
-    # Initialize player statistics
-    player_stats = defaultdict(lambda: {
-        'name': '',
-        'teams': set(),
-        'batting_performances': [],
-        'bowling_performances': [],
-        'latest_team': ''
-    })
+def new_player_stats():
+    """Create the empty per-player accumulator filled by add_match_to_player_stats"""
+    return defaultdict(PlayerRecord)
+
+def new_innings_stats():
+    """Create the empty per-innings batter and bowler accumulators"""
+    innings_stats = defaultdict(lambda: {'runs': 0, 'balls': 0, 'fours': 0, 'sixes': 0, 'dots': 0})
+    bowler_stats = defaultdict(lambda: {'overs': 0, 'runs_conceded': 0, 'wickets': 0, 'dots': 0})
+    return innings_stats, bowler_stats
+
+def add_delivery_to_innings_stats(innings_stats, bowler_stats, delivery):
+    """Credit one delivery to its batter and bowler"""
+    batter = delivery['batter']
+    bowler = delivery['bowler']
     
-    # Get all JSON files from ipl_data directory and sort them chronologically
-    json_files = sorted([f for f in os.listdir('ipl_data') if f.endswith('.json')])
-    print(f"Processing {len(json_files)} match files...")
+    # Update batter stats
+    runs = delivery.get('runs', {})
+    batter_runs = runs.get('batter', 0)
+    total_runs = runs.get('total', 0)
     
-    for file_name in json_files:
-        with open(os.path.join('ipl_data', file_name), 'r') as f:
-            match_data = json.load(f)
-            
-        # Skip if the match doesn't have innings data
-        if 'innings' not in match_data or not match_data['innings']:
-            continue
-            
-        match_date = datetime.strptime(match_data['info']['dates'][0], '%Y-%m-%d')
-        match_id = file_name.split('.')[0]
-        
-        # Process each innings
-        for innings in match_data['innings']:
-            if 'overs' not in innings:
-                continue
-                
-            batting_team = innings['team']
-            bowling_team = [team for team in match_data['info']['teams'] if team != batting_team][0]
-            
-            # Initialize per-innings player stats
-            innings_stats = defaultdict(lambda: {'runs': 0, 'balls': 0, 'fours': 0, 'sixes': 0, 'dots': 0})
-            bowler_stats = defaultdict(lambda: {'overs': 0, 'runs_conceded': 0, 'wickets': 0, 'dots': 0})
-            
-            # Process each over
-            for over in innings['overs']:
-                for delivery in over.get('deliveries', []):
-                    batter = delivery['batter']
-                    bowler = delivery['bowler']
-                    
-                    # Update batter stats
-                    runs = delivery.get('runs', {})
-                    batter_runs = runs.get('batter', 0)
-                    total_runs = runs.get('total', 0)
-                    
-                    innings_stats[batter]['runs'] += batter_runs
-                    innings_stats[batter]['balls'] += 1
-                    innings_stats[batter]['fours'] += 1 if batter_runs == 4 else 0
-                    innings_stats[batter]['sixes'] += 1 if batter_runs == 6 else 0
-                    innings_stats[batter]['dots'] += 1 if total_runs == 0 else 0
-                    
-                    # Update bowler stats with new wicket calculation
-                    bowler_stats[bowler]['overs'] += 1/6
-                    bowler_stats[bowler]['runs_conceded'] += total_runs
-                    bowler_stats[bowler]['wickets'] += process_wicket(delivery)
-                    bowler_stats[bowler]['dots'] += 1 if total_runs == 0 else 0
-            
-            # Add innings stats to overall player stats
-            for batter, stats in innings_stats.items():
-                player_stats[batter]['name'] = batter
-                player_stats[batter]['teams'].add(batting_team)
-                player_stats[batter]['latest_team'] = batting_team
-                player_stats[batter]['batting_performances'].append({
-                    'match_id': match_id,
-                    'date': match_date,
-                    **stats
-                })
-            
-            for bowler, stats in bowler_stats.items():
-                player_stats[bowler]['name'] = bowler
-                player_stats[bowler]['teams'].add(bowling_team)
-                player_stats[bowler]['latest_team'] = bowling_team
-                player_stats[bowler]['bowling_performances'].append({
-                    'match_id': match_id,
-                    'date': match_date,
-                    **stats
-                })
+    innings_stats[batter]['runs'] += batter_runs
+    innings_stats[batter]['balls'] += 1
+    innings_stats[batter]['fours'] += 1 if batter_runs == 4 else 0
+    innings_stats[batter]['sixes'] += 1 if batter_runs == 6 else 0
+    innings_stats[batter]['dots'] += 1 if total_runs == 0 else 0
     
-    # Calculate final statistics for each player
-    final_stats = []
-    for player_id, stats in player_stats.items():
-        # Sort performances by date
-        batting_perfs = sorted(stats['batting_performances'], key=lambda x: x['date'], reverse=True)
-        bowling_perfs = sorted(stats['bowling_performances'], key=lambda x: x['date'], reverse=True)
-        
-        # Determine player role
-        role = determine_role(stats)
-        
-        # Check if batsman has bowled in the last 3 years
-        current_year = 2025
-        three_years_ago = current_year - 3
-        has_bowled_recently = False
-        
-        if role == 'Batsman':
-            # Check if player has bowled any overs in the last 3 years
-            for perf in bowling_perfs:
-                perf_year = perf['date'].year
-                if perf_year >= three_years_ago and perf['overs'] > 0:
-                    has_bowled_recently = True
-                    break
-        
-        recent_batting = batting_perfs[:7]
-        recent_bowling = bowling_perfs[:7]
-        
-        # Calculate overall batting stats
-        total_career_runs = sum(p['runs'] for p in batting_perfs)
-        total_career_balls = sum(p['balls'] for p in batting_perfs)
-        total_career_fours = sum(p['fours'] for p in batting_perfs)
-        total_career_sixes = sum(p['sixes'] for p in batting_perfs)
-        
-        # Calculate recent batting stats
-        recent_runs = sum(p['runs'] for p in recent_batting)
-        recent_balls = sum(p['balls'] for p in recent_batting)
-        recent_fours = sum(p['fours'] for p in recent_batting)
-        recent_sixes = sum(p['sixes'] for p in recent_batting)
-        recent_batting_dots = sum(p['dots'] for p in recent_batting)
-        
-        # Calculate recent bowling stats only if:
-        # 1. There are bowling performances, AND
-        # 2. Player is either a Bowler/All-rounder OR a Batsman who has bowled in the last 3 years
-        if recent_bowling and (role != 'Batsman' or has_bowled_recently):
-            recent_wickets = sum(p['wickets'] for p in recent_bowling)
-            recent_overs = sum(p['overs'] for p in recent_bowling)
-            recent_runs_conceded = sum(p['runs_conceded'] for p in recent_bowling)
-            recent_bowling_dots = sum(p['dots'] for p in recent_bowling)
-            recent_economy = (recent_runs_conceded / recent_overs) if recent_overs > 0 else 0
-        else:
-            recent_wickets = 0
-            recent_overs = 0
-            recent_runs_conceded = 0
-            recent_bowling_dots = 0
-            recent_economy = 0
-        
-        # Calculate overall bowling stats
-        total_career_wickets = sum(p['wickets'] for p in bowling_perfs)
-        total_career_overs = sum(p['overs'] for p in bowling_perfs)
-        total_career_runs_conceded = sum(p['runs_conceded'] for p in bowling_perfs)
-        
-        # Calculate metrics
-        matches_played = len(set(p['match_id'] for p in stats['batting_performances'] + stats['bowling_performances']))
-        recent_matches = len(set(p['match_id'] for p in recent_batting + recent_bowling))
+    # Update bowler stats with new wicket calculation
+    bowler_stats[bowler]['overs'] += 1/6
+    bowler_stats[bowler]['runs_conceded'] += total_runs
+    bowler_stats[bowler]['wickets'] += process_wicket(delivery)
+    bowler_stats[bowler]['dots'] += 1 if total_runs == 0 else 0
+
+def extract_player_innings(match_id, match_data):
+    """
+    Extract per-innings batter and bowler figures from a single parsed match.
+
+    Returns (match_date, innings_list), where innings_list holds one
+    (batting_team, bowling_team, batter_stats, bowler_stats) tuple per innings
+    with current franchise names, or None if the match has no innings data or
+    involves a defunct franchise.
+    """
+    # Skip if the match doesn't have innings data
+    if 'innings' not in match_data or not match_data['innings']:
+        return None
+    
+    # Skip matches involving excluded teams, as for match and team stats
+    if is_excluded_match(match_data['info']['teams']):
+        return None
         
-        career_avg = total_career_runs / matches_played if matches_played > 0 else 0
-        career_sr = (total_career_runs / total_career_balls * 100) if total_career_balls > 0 else 0
+    match_date = datetime.strptime(match_data['info']['dates'][0], '%Y-%m-%d')
+    innings_list = []
+    
+    # Process each innings
+    for innings in match_data['innings']:
+        if 'overs' not in innings:
+            continue
+            
+        batting_team = innings['team']
+        bowling_team = [team for team in match_data['info']['teams'] if team != batting_team][0]
+        batting_team, bowling_team = team_name(batting_team), team_name(bowling_team)
         
-        recent_avg = recent_runs / recent_matches if recent_matches > 0 else 0
-        recent_sr = (recent_runs / recent_balls * 100) if recent_balls > 0 else 0
+        # Initialize per-innings player stats
+        innings_stats, bowler_stats = new_innings_stats()
         
-        career_economy = (total_career_runs_conceded / total_career_overs) if total_career_overs > 0 else 0
+        # Process each over
+        for over in innings['overs']:
+            for delivery in over.get('deliveries', []):
+                add_delivery_to_innings_stats(innings_stats, bowler_stats, delivery)
         
-        # Ensure recent_overs is always a number (0 if there are no bowling performances)
-        total_recent_deliveries = recent_balls + (recent_overs * 6)
-        dot_ball_pct = ((recent_batting_dots + recent_bowling_dots) / total_recent_deliveries * 100) if total_recent_deliveries > 0 else 0
+        innings_list.append((batting_team, bowling_team, dict(innings_stats), dict(bowler_stats)))
+    
+    return match_date, innings_list
+
+def add_match_to_player_stats(player_stats, match_id, match_date, innings_list):
+    """Add one match's per-innings figures to the overall player stats"""
+    for batting_team, bowling_team, innings_stats, bowler_stats in innings_list:
+        for batter, stats in innings_stats.items():
+            record = player_stats[batter]
+            record.name = batter
+            record.teams.add(batting_team)
+            record.latest_team = batting_team
+            record.add_batting(match_id, match_date, stats)
         
-        # Calculate player consistency score using the new method
-        player_consistency_score = calculate_player_consistency(stats, role)
+        for bowler, stats in bowler_stats.items():
+            record = player_stats[bowler]
+            record.name = bowler
+            record.teams.add(bowling_team)
+            record.latest_team = bowling_team
+            record.add_bowling(match_id, match_date, stats)
+
+def recent_form_stats(stats, role, has_bowled_recently, form, batting, bowling):
+    """
+    Recent-form columns of one player for one FormWindow.
+
+    batting and bowling map each field (and 'match_id') to its values, most
+    recent first.
+    """
+    recent_runs = form.total(batting['runs'])
+    recent_balls = form.total(batting['balls'])
+    recent_fours = form.total(batting['fours'])
+    recent_sixes = form.total(batting['sixes'])
+    recent_batting_dots = form.total(batting['dots'])
+    
+    # Calculate recent bowling stats only if:
+    # 1. There are bowling performances, AND
+    # 2. Player is either a Bowler/All-rounder OR a Batsman who has bowled in the last 3 years
+    if len(stats.bowling) and (role != 'Batsman' or has_bowled_recently):
+        recent_wickets = form.total(bowling['wickets'])
+        recent_overs = form.total(bowling['overs'])
+        recent_runs_conceded = form.total(bowling['runs_conceded'])
+        recent_bowling_dots = form.total(bowling['dots'])
+        recent_economy = (recent_runs_conceded / recent_overs) if recent_overs > 0 else 0
+    else:
+        recent_wickets = 0
+        recent_overs = 0
+        recent_runs_conceded = 0
+        recent_bowling_dots = 0
+        recent_economy = 0
+    
+    recent_matches = form.match_weight(batting['match_id'], bowling['match_id'])
+    recent_avg = recent_runs / recent_matches if recent_matches > 0 else 0
+    recent_sr = (recent_runs / recent_balls * 100) if recent_balls > 0 else 0
+    
+    # Ensure recent_overs is always a number (0 if there are no bowling performances)
+    total_recent_deliveries = recent_balls + (recent_overs * 6)
+    dot_ball_pct = ((recent_batting_dots + recent_bowling_dots) / total_recent_deliveries * 100) if total_recent_deliveries > 0 else 0
+    
+    suffix = form.suffix
+    return {
+        f'runs_{suffix}': round(recent_runs, 2),
+        f'avg_{suffix}': round(recent_avg, 2),
+        f'strike_rate_{suffix}': round(recent_sr, 2),
+        f'wickets_{suffix}': round(recent_wickets, 2),
+        f'economy_{suffix}': round(recent_economy, 2),
+        f'4s_6s_{suffix}': round(recent_fours + recent_sixes, 2),
+        f'dot_ball_pct_{suffix}': round(dot_ball_pct, 2)
+    }
+
+def summarise_player(stats, forms, current_year=2025):
+    """
+    Final statistics row for one player.
+
+    forms is the list of FormWindows to emit recent-form columns for.
+    current_year is the year "bowled in the last 3 years" is measured from.
+    """
+    # Read the tail of each log the form windows need once, most recent first;
+    # every form window slices these. Career figures come from running totals.
+    depth = form_depth(forms)
+    batting = {field: stats.batting.latest(field, depth) for field in ('match_id', *BATTING_FIELDS)}
+    bowling = {field: stats.bowling.latest(field, depth) for field in ('match_id', *BOWLING_FIELDS)}
+    
+    # Determine player role
+    role = determine_role(stats)
+    
+    # Check if batsman has bowled in the last 3 years
+    three_years_ago = current_year - 3
+    has_bowled_recently = False
+    
+    if role == 'Batsman':
+        # Check if player has bowled any overs in the last 3 years
+        has_bowled_recently = any(overs > 0 for overs in stats.bowling.since('overs', date(three_years_ago, 1, 1)))
+    
+    # Calculate overall batting stats
+    total_career_runs = stats.batting.totals['runs']
+    total_career_balls = stats.batting.totals['balls']
+    total_career_fours = stats.batting.totals['fours']
+    total_career_sixes = stats.batting.totals['sixes']
+    
+    # Calculate overall bowling stats; overs are floats, summed most recent first as they always were
+    total_career_wickets = stats.bowling.totals['wickets']
+    total_career_overs = sum(reversed(stats.bowling.columns['overs']))
+    total_career_runs_conceded = stats.bowling.totals['runs_conceded']
+    
+    # Calculate metrics
+    matches_played = stats.matches_played()
+    
+    career_avg = total_career_runs / matches_played if matches_played > 0 else 0
+    career_sr = (total_career_runs / total_career_balls * 100) if total_career_balls > 0 else 0
+    
+    career_economy = (total_career_runs_conceded / total_career_overs) if total_career_overs > 0 else 0
+    
+    # Calculate player consistency score using the new method
+    player_consistency_score = calculate_player_consistency(stats, role)
+    
+    row = {
+        'player_name': stats.name,
+        'matches_played': matches_played,
+        'role': role,
         
-        final_stats.append({
-            'player_name': stats['name'],
-            'matches_played': matches_played,
-            'role': role,
-            
-            # Career stats
-            'total_runs': total_career_runs,
-            'career_average': round(career_avg, 2),
-            'career_strike_rate': round(career_sr, 2),
-            'total_wickets': total_career_wickets,
-            'career_economy': round(career_economy, 2),
-            'total_4s': total_career_fours,
-            'total_6s': total_career_sixes,
-            
-            # Recent form (last 7 matches)
-            'runs_last_7': recent_runs,
-            'avg_last_7': round(recent_avg, 2),
-            'strike_rate_last_7': round(recent_sr, 2),
-            'wickets_last_7': recent_wickets,
-            'economy_last_7': round(recent_economy, 2),
-            '4s_6s_last_7': recent_fours + recent_sixes,
-            'dot_ball_pct_last_7': round(dot_ball_pct, 2),
-            'player_consistency_score': round(player_consistency_score, 2)
-        })
+        # Career stats
+        'total_runs': total_career_runs,
+        'career_average': round(career_avg, 2),
+        'career_strike_rate': round(career_sr, 2),
+        'total_wickets': total_career_wickets,
+        'career_economy': round(career_economy, 2),
+        'total_4s': total_career_fours,
+        'total_6s': total_career_sixes
+    }
+    
+    # Recent form (last 7 matches by default, plus any other configured windows)
+    for form in forms:
+        row.update(recent_form_stats(stats, role, has_bowled_recently, form, batting, bowling))
+    
+    row['player_consistency_score'] = round(player_consistency_score, 2)
+    return row
+
+@stage('summarise_player_stats')
+def summarise_player_stats(player_stats, forms=None):
+    """
+    Turn accumulated player performances into one row of final statistics per player.
+
+    forms is the list of FormWindows to emit recent-form columns for; by default
+    the last 7 matches.
+    """
+    if forms is None:
+        forms = form_windows()
     
+    # Calculate final statistics for each player
+    return [summarise_player(stats, forms) for stats in player_stats.values()]
+
+@stage('save_player_stats')
+def save_player_stats(final_stats):
+    """Save the final player statistics as the players_performance table"""
     # Create output directory if it doesn't exist
     output_dir = Path('data/raw/players')
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Save to CSV
+    # Save (Parquet by default, see table_io.py)
     df = pd.DataFrame(final_stats)
-    df.to_csv('data/raw/players/players_performance.csv', index=False)
+    write_table(df, str(output_dir / 'players_performance'))
     print(f"Processed {len(final_stats)} players statistics")
 
+@stage('process_player_stats')
+def process_player_stats(matches=None, workers=1, forms=None):
+    """
+    Build player statistics from match JSON files and save to CSV.
+
+    matches is an optional iterable of (match_id, match_data) pairs, as yielded by
+    match_loader.iter_matches; by default every file in ipl_data/ is parsed, using
+    a pool of `workers` processes when workers > 1. forms selects the recent-form
+    columns (see summarise_player_stats).
+    """
+    if matches is None:
+        # Get all JSON files from ipl_data directory and sort them chronologically
+        json_files = list_match_files()
+        print(f"Processing {len(json_files)} match files...")
+        results = map_matches(extract_player_innings, json_files, workers=workers)
+    else:
+        results = ((match_id, extract_player_innings(match_id, match_data)) for match_id, match_data in matches)
+    
+    # Merge in file order so the output does not depend on the number of workers
+    player_stats = new_player_stats()
+    for match_id, extracted in results:
+        if extracted is not None:
+            add_match_to_player_stats(player_stats, match_id, *extracted)
+    
+    save_player_stats(summarise_player_stats(player_stats, forms))
+
 if __name__ == "__main__":
-    process_player_stats()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build player statistics from Cricsheet JSON files")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes used to parse match files (default: 1)")
+    add_form_arguments(parser)
+    args = parser.parse_args()
+
+    process_player_stats(workers=args.workers, forms=form_windows_from_args(args))
@@ -1,345 +1,382 @@
-import json
-import os
+import argparse
 import pandas as pd
 from collections import defaultdict
 from datetime import datetime
 import numpy as np
 from pathlib import Path
 
-def get_team_code(team_name):
-    """Return the standardized team code"""
-    team_codes = {
-        'Mumbai Indians': 'MI',
-        'Chennai Super Kings': 'CSK',
-        'Royal Challengers Bangalore': 'RCB',
-        'Royal Challengers Bengaluru': 'RCB',
-        'Kolkata Knight Riders': 'KKR',
-        'Delhi Capitals': 'DC',
-        'Delhi Daredevils': 'DC',
-        'Punjab Kings': 'PBKS',
-        'Kings XI Punjab': 'PBKS',
-        'Rajasthan Royals': 'RR',
-        'Sunrisers Hyderabad': 'SRH',
-        'Lucknow Super Giants': 'LSG',
-        'Gujarat Titans': 'GT'
-    }
-    return team_codes.get(team_name, team_name)
+from form_engine import RECENT_WINDOW, FormWindow, PerformanceLog, add_form_arguments, form_depth, form_windows, form_windows_from_args
+from instrument import stage
+from match_loader import list_match_files, map_matches
+from table_io import write_table
+from teams import is_excluded_match, team_code, team_id, team_name
+from venues import REGISTRY as VENUES
 
-def get_home_venue(team):
-    """Return the home venue(s) for each IPL team"""
-    home_venues = {
-        'Mumbai Indians': ['Wankhede Stadium, Mumbai'],
-        'Chennai Super Kings': ['MA Chidambaram Stadium, Chepauk', 'MA Chidambaram Stadium', 'MA Chidambaram Stadium, Chennai'],
-        'Royal Challengers Bengaluru': ['M Chinnaswamy Stadium, Bengaluru', 'M Chinnaswamy Stadium'],
-        'Kolkata Knight Riders': ['Eden Gardens, Kolkata'],
-        'Delhi Capitals': ['Arun Jaitley Stadium, Delhi'],
-        'Punjab Kings': ['IS Bindra Stadium, Mohali', 'Himachal Pradesh Cricket Association Stadium, Dharamsala', 'Himachal Pradesh Cricket Association Stadium'],
-        'Rajasthan Royals': ['Sawai Mansingh Stadium, Jaipur'],
-        'Sunrisers Hyderabad': ['Rajiv Gandhi International Stadium, Uppal'],
-        'Lucknow Super Giants': ['Bharat Ratna Shri Atal Bihari Vajpayee Ekana Cricket Stadium, Lucknow'],
-        'Gujarat Titans': ['Narendra Modi Stadium, Ahmedabad']
-    }
-    return home_venues.get(team, [])
+# Per-match fields kept for every team, with their array typecodes
+TEAM_FIELDS = {
+    'result': 'b', 'margin': 'i', 'batting_first': 'b', 'home': 'b',
+    'score': 'i', 'powerplay_runs': 'i', 'death_overs_runs': 'i',
+    'wickets_taken': 'i', 'wickets_lost': 'i'
+}
 
-def calculate_team_stats():
-    # List of teams to exclude - only historical/defunct teams
-    EXCLUDED_TEAMS = {
-        'Rising Pune Supergiant',
-        'Gujarat Lions',
-        'Rising Pune Supergiants',
-        'Pune Warriors',
-        'Kochi Tuskers Kerala',
-        'Deccan Chargers'  # Historical team
-    }
+class TeamRecord:
+    """Everything accumulated for one team across matches, with running win counts batting first and at home"""
+    __slots__ = ('matches', 'venues_played', 'batting_first_wins', 'home_wins')
+
+    def __init__(self):
+        self.matches = PerformanceLog(TEAM_FIELDS)
+        self.venues_played = set()
+        self.batting_first_wins = 0
+        self.home_wins = 0
+
+    # IDs of venues outside the fixed registry differ between processes, so venues are pickled by name
+    def __getstate__(self):
+        venues = [VENUES.names[venue] if venue is not None else '' for venue in self.venues_played]
+        return self.matches, venues, self.batting_first_wins, self.home_wins
+
+    def __setstate__(self, state):
+        self.matches, venues, self.batting_first_wins, self.home_wins = state
+        self.venues_played = {VENUES.venue_id(venue) for venue in venues}
+
+def new_team_stats():
+    """Create the empty per-team accumulator filled by add_match_to_team_stats"""
+    return defaultdict(TeamRecord)
+
+def summarise_over(over):
+    """Return (over number, runs, deliveries with a wicket) for one over"""
+    over_runs = sum(d.get('runs', {}).get('total', 0) for d in over['deliveries'])
+    over_wickets = sum(1 for d in over['deliveries'] if 'wickets' in d)
+    return over['over'], over_runs, over_wickets
+
+def innings_totals_from_overs(over_summaries):
+    """Return (score, powerplay_runs, death_overs_runs, wickets_lost) from per-over summaries"""
+    powerplay_runs = 0
+    death_overs_runs = 0
+    total_runs = 0
+    total_wickets = 0
     
-    # Team name mapping for teams that have changed names or have variations
-    TEAM_NAME_MAPPING = {
-        'Kings XI Punjab': 'Punjab Kings',
-        'Royal Challengers Bangalore': 'Royal Challengers Bengaluru',
-        'Delhi Daredevils': 'Delhi Capitals',
-        'Gujarat Titans': 'Gujarat Titans', 
-        'Lucknow Super Giants': 'Lucknow Super Giants'
-    }
+    for over_num, over_runs, over_wickets in over_summaries:
+        if over_num < 6:  # Powerplay
+            powerplay_runs += over_runs
+        elif over_num >= 15:  # Death overs
+            death_overs_runs += over_runs
+            
+        total_runs += over_runs
+        total_wickets += over_wickets
+    
+    return total_runs, powerplay_runs, death_overs_runs, total_wickets
+
+def summarise_innings(innings):
+    """Return (score, powerplay_runs, death_overs_runs, wickets_lost) for one innings"""
+    return innings_totals_from_overs(summarise_over(over) for over in innings['overs'])
+
+def build_team_entries(match_date, venue, winner, innings_totals):
+    """
+    Build the per-team records of one match from its innings totals.
+
+    innings_totals holds (batting_team, score, powerplay_runs, death_overs_runs,
+    wickets_lost) for the first and, if played, second innings, with team names
+    as they appear in the match data. Returns a list of
+    [team, match_record, batting_record, wickets_record, venue] entries, first
+    innings team first. The venue_type in match_record is 'home', 'away' or
+    'neutral' (see venues.py); venue stays the raw venue string.
+    """
+    if winner:
+        winner = team_name(winner)
     
-    # Initialize data structures to store team statistics
-    team_stats = defaultdict(lambda: {
-        'matches': [],  
-        'batting_scores': [],  
-        'bowling_scores': [],  
-        'wickets_data': [],  
-        'venues_played': set()  
-    })
+    entries = []
     
-    # Get all JSON files from ipl_data directory and sort them chronologically
-    json_files = sorted([f for f in os.listdir('ipl_data') if f.endswith('.json')])
-    print(f"Total JSON files found: {len(json_files)}")
+    # Process first innings
+    first_innings_team, first_innings_score, powerplay_runs, death_overs_runs, total_wickets = innings_totals[0]
+    first_innings_team = team_name(first_innings_team)
     
-    # Debug counters
-    match_counts = defaultdict(int)
-    skipped_matches = []
+    # Update first innings team stats
+    margin = 0
+    if winner:
+        second_innings_score = innings_totals[1][1]
+        margin = first_innings_score - second_innings_score if winner == first_innings_team else -(first_innings_score - second_innings_score)
     
-    for file_name in json_files:
-        with open(os.path.join('ipl_data', file_name), 'r') as f:
-            match_data = json.load(f)
-            
-        # Skip if the match doesn't have innings data
-        if 'innings' not in match_data or not match_data['innings']:
-            continue
-            
-        match_date = datetime.strptime(match_data['info']['dates'][0], '%Y-%m-%d')
-        teams = [TEAM_NAME_MAPPING.get(team, team) for team in match_data['info']['teams']]
-        venue = match_data['info'].get('venue', '')
+    # Home/away/neutral from the venue registry (one dict lookup per match)
+    venue_id = VENUES.venue_id(venue)
+    first_innings_id = team_id(first_innings_team)
+    second_innings_team = second_innings_id = None
+    if len(innings_totals) >= 2:
+        second_innings_team = team_name(innings_totals[1][0])
+        second_innings_id = team_id(second_innings_team)
+    
+    entries.append([
+        first_innings_team,
+        (
+            match_date,
+            1 if first_innings_team == winner else 0,
+            margin,
+            True,  # batting_first
+            VENUES.venue_type(first_innings_id, second_innings_id, venue_id)
+        ),
+        (
+            match_date,
+            first_innings_score,
+            powerplay_runs,
+            death_overs_runs
+        ),
+        (
+            match_date,
+            0,  # wickets_taken (will be updated in second innings)
+            total_wickets  # wickets_lost
+        ),
+        venue
+    ])
+    
+    # Process second innings similarly
+    if len(innings_totals) >= 2:
+        _, second_innings_score, powerplay_runs, death_overs_runs, total_wickets = innings_totals[1]
         
-        # Skip matches involving excluded teams
-        if any(team in EXCLUDED_TEAMS for team in teams):
-            continue
-            
-        winner = match_data['info'].get('outcome', {}).get('winner', None)
-        if winner:
-            winner = TEAM_NAME_MAPPING.get(winner, winner)
-            
-        # Process first innings
-        if len(match_data['innings']) >= 1:
-            first_innings = match_data['innings'][0]
-            first_innings_team = TEAM_NAME_MAPPING.get(first_innings['team'], first_innings['team'])
-            
-            # Calculate phase-wise scores and wickets
-            powerplay_runs = 0
-            death_overs_runs = 0
-            total_wickets = 0
-            
-            for over in first_innings['overs']:
-                over_num = over['over']
-                over_runs = sum(d.get('runs', {}).get('total', 0) for d in over['deliveries'])
-                over_wickets = sum(1 for d in over['deliveries'] if 'wickets' in d)
-                
-                if over_num < 6:  # Powerplay
-                    powerplay_runs += over_runs
-                elif over_num >= 15:  # Death overs
-                    death_overs_runs += over_runs
-                    
-                total_wickets += over_wickets
-            
-            first_innings_score = sum(
-                delivery.get('runs', {}).get('total', 0)
-                for over in first_innings['overs']
-                for delivery in over['deliveries']
-            )
-            
-            # Update first innings team stats
-            margin = 0
-            if winner:
-                margin = first_innings_score - sum(
-                    delivery.get('runs', {}).get('total', 0)
-                    for over in match_data['innings'][1]['overs']
-                    for delivery in over['deliveries']
-                ) if winner == first_innings_team else -(first_innings_score - sum(
-                    delivery.get('runs', {}).get('total', 0)
-                    for over in match_data['innings'][1]['overs']
-                    for delivery in over['deliveries']
-                ))
-            
-            # Check if it's a home game
-            home_venues = get_home_venue(first_innings_team)
-            is_home_game = any(home_venue in venue for home_venue in home_venues)
-            
-            team_stats[first_innings_team]['matches'].append((
+        entries.append([
+            second_innings_team,
+            (
                 match_date,
-                1 if first_innings_team == winner else 0,
-                margin,
-                True,  # batting_first
-                'home' if is_home_game else 'away'
-            ))
-            
-            team_stats[first_innings_team]['batting_scores'].append((
+                1 if second_innings_team == winner else 0,
+                -margin,  # Negative of first innings margin
+                False,  # batting_first
+                VENUES.venue_type(second_innings_id, first_innings_id, venue_id)
+            ),
+            (
                 match_date,
-                first_innings_score,
+                second_innings_score,
                 powerplay_runs,
                 death_overs_runs
-            ))
-            
-            team_stats[first_innings_team]['wickets_data'].append((
+            ),
+            (
                 match_date,
-                0,  # wickets_taken (will be updated in second innings)
-                total_wickets  # wickets_lost
-            ))
-            
-            team_stats[first_innings_team]['venues_played'].add(venue)
-            
-            # Process second innings similarly
-            if len(match_data['innings']) >= 2:
-                second_innings = match_data['innings'][1]
-                second_innings_team = TEAM_NAME_MAPPING.get(second_innings['team'], second_innings['team'])
-                
-                powerplay_runs = 0
-                death_overs_runs = 0
-                total_wickets = 0
-                
-                for over in second_innings['overs']:
-                    over_num = over['over']
-                    over_runs = sum(d.get('runs', {}).get('total', 0) for d in over['deliveries'])
-                    over_wickets = sum(1 for d in over['deliveries'] if 'wickets' in d)
-                    
-                    if over_num < 6:
-                        powerplay_runs += over_runs
-                    elif over_num >= 15:
-                        death_overs_runs += over_runs
-                        
-                    total_wickets += over_wickets
-                
-                second_innings_score = sum(
-                    delivery.get('runs', {}).get('total', 0)
-                    for over in second_innings['overs']
-                    for delivery in over['deliveries']
-                )
-                
-                # Check if it's a home game for second innings team
-                home_venues = get_home_venue(second_innings_team)
-                is_home_game = any(home_venue in venue for home_venue in home_venues)
-                
-                team_stats[second_innings_team]['matches'].append((
-                    match_date,
-                    1 if second_innings_team == winner else 0,
-                    -margin,  # Negative of first innings margin
-                    False,  # batting_first
-                    'home' if is_home_game else 'away'
-                ))
-                
-                team_stats[second_innings_team]['batting_scores'].append((
-                    match_date,
-                    second_innings_score,
-                    powerplay_runs,
-                    death_overs_runs
-                ))
-                
-                team_stats[second_innings_team]['wickets_data'].append((
-                    match_date,
-                    total_wickets,  # wickets_taken
-                    0  # wickets_lost (will be updated)
-                ))
-                
-                team_stats[second_innings_team]['venues_played'].add(venue)
-                
-                # Update wickets_taken for first innings team
-                team_stats[first_innings_team]['wickets_data'][-1] = (
-                    match_date,
-                    total_wickets,  # Update wickets_taken
-                    team_stats[first_innings_team]['wickets_data'][-1][2]  # Keep wickets_lost
-                )
+                total_wickets,  # wickets_taken
+                0  # wickets_lost (will be updated)
+            ),
+            venue
+        ])
+        
+        # Update wickets_taken for first innings team
+        entries[0][3] = (
+            match_date,
+            total_wickets,  # Update wickets_taken
+            entries[0][3][2]  # Keep wickets_lost
+        )
+    
+    return entries
 
-    # Create output directory if it doesn't exist
-    output_dir = Path('data/raw/teams')
-    output_dir.mkdir(parents=True, exist_ok=True)
+def extract_team_innings(match_id, match_data):
+    """
+    Extract innings totals and phase scores for both teams of a single parsed match.
 
-    # Prepare final statistics for CSV
-    final_stats = []
-    for team, stats in team_stats.items():
-        if not stats['matches']:
-            continue
-            
-        # Sort all lists by date and get recent matches (last 7)
-        recent_matches = sorted(stats['matches'], key=lambda x: x[0], reverse=True)[:7]
-        recent_count = len(recent_matches)
+    Returns the entries built by build_team_entries, or None if the match is skipped.
+    """
+    # Skip if the match doesn't have innings data
+    if 'innings' not in match_data or not match_data['innings']:
+        return None
         
-        # Core Metadata
-        team_code = get_team_code(team)
-        matches_played = len(stats['matches'])
+    # Skip matches involving excluded teams
+    if is_excluded_match(match_data['info']['teams']):
+        return None
         
-        # Match Outcome Stats
-        all_matches = sorted(stats['matches'], key=lambda x: x[0], reverse=True)
-        win_percentage_overall = sum(1 for _, result, _, _, _ in all_matches if result == 1) / matches_played * 100
-        win_percentage_last_7 = sum(result for _, result, _, _, _ in recent_matches) / recent_count * 100
+    match_date = datetime.strptime(match_data['info']['dates'][0], '%Y-%m-%d')
+    venue = match_data['info'].get('venue', '')
+    winner = match_data['info'].get('outcome', {}).get('winner', None)
+    
+    innings_totals = [(innings['team'],) + summarise_innings(innings) for innings in match_data['innings'][:2]]
+    return build_team_entries(match_date, venue, winner, innings_totals)
+
+def add_match_to_team_stats(team_stats, entries):
+    """Add one match's per-team entries to the overall team stats"""
+    for team, match_record, batting_record, wickets_record, venue in entries:
+        match_date, result, margin, batting_first, venue_type = match_record
+        _, score, powerplay_runs, death_overs_runs = batting_record
+        _, wickets_taken, wickets_lost = wickets_record
+        record = team_stats[team]
+        record.matches.append(None, match_date, {
+            'result': result, 'margin': margin, 'batting_first': batting_first, 'home': venue_type == 'home',
+            'score': score, 'powerplay_runs': powerplay_runs, 'death_overs_runs': death_overs_runs,
+            'wickets_taken': wickets_taken, 'wickets_lost': wickets_lost
+        })
+        record.venues_played.add(VENUES.venue_id(venue))
+        if batting_first:
+            record.batting_first_wins += result
+        if venue_type == 'home':
+            record.home_wins += result
+
+def summarise_team(team, stats, forms):
+    """
+    Final statistics row for one team, or None if it has no matches.
+
+    forms is the list of FormWindows to emit recent-form columns for. The
+    momentum score always uses the last 7 matches.
+    """
+    if not len(stats.matches):
+        return None
+    recent = FormWindow(size=RECENT_WINDOW)
+    
+    # Read the tail of the match log the form windows need once, most recent
+    # first; every form window slices these. Career figures come from running totals.
+    depth = form_depth(forms)
+    log = {field: stats.matches.latest(field, depth) for field in TEAM_FIELDS}
+    results = log['result']
+    totals = stats.matches.totals
+    recent_count = len(recent.weights(len(results)))
+    
+    # Core Metadata
+    code = team_code(team)
+    matches_played = len(stats.matches)
+    wins = totals['result']
+    
+    # Match Outcome Stats
+    win_percentage_overall = wins / matches_played * 100
+    
+    # Batting first vs Chasing stats
+    batting_first_results = stats.matches.latest_where('result', 'batting_first', depth)
+    chasing_results = stats.matches.latest_where('result', 'batting_first', depth, flag=False)
+    batting_first_matches = totals['batting_first']
+    chasing_matches = matches_played - batting_first_matches
+    
+    batting_first_win_rate_overall = (stats.batting_first_wins / batting_first_matches * 100) if batting_first_matches else 0
+    chasing_win_rate_overall = ((wins - stats.batting_first_wins) / chasing_matches * 100) if chasing_matches else 0
+    
+    # Batting Performance
+    avg_batting_score_overall = totals['score'] / matches_played
+    
+    # Home/Away stats
+    home_matches = totals['home']
+    away_matches = matches_played - home_matches
+    
+    home_win_rate_overall = (stats.home_wins / home_matches * 100) if home_matches else 0
+    away_win_rate_overall = ((wins - stats.home_wins) / away_matches * 100) if away_matches else 0
+    
+    # Calculate venue adaptability score (0-100)
+    venue_count = len(stats.venues_played)
+    venue_adaptability_score = min(100, (venue_count / 10) * 100)  # Normalize to max of 100
+    
+    # Calculate momentum score (0-100) over the last 7 matches
+    recent_win_weight = 0.4
+    margin_weight = 0.3
+    consistency_weight = 0.3
+    
+    recent_win_component = recent.mean(results) * 100
+    margin_component = min(100, abs(recent.mean(log['margin'])) * 10)
+    consistency_component = 100 - (np.std(results[:RECENT_WINDOW]) * 100)
+    
+    momentum_score = (recent_win_component * recent_win_weight +
+                    margin_component * margin_weight +
+                    consistency_component * consistency_weight)
+    
+    # Recent form for every window, grouped as the columns are laid out
+    outcome_form = {}
+    chase_form = {}
+    batting_form = {}
+    bowling_form = {}
+    margin_form = {}
+    for form in forms:
+        suffix = form.suffix
+        avg_powerplay_score = form.mean(log['powerplay_runs'])
+        avg_death_overs_score = form.mean(log['death_overs_runs'])
         
-        # Batting first vs Chasing stats
-        batting_first_matches = [(date, result) for date, result, _, batting_first, _ in all_matches if batting_first]
-        chasing_matches = [(date, result) for date, result, _, batting_first, _ in all_matches if not batting_first]
-        recent_batting_first = [(date, result) for date, result in batting_first_matches][:7]
-        recent_chasing = [(date, result) for date, result in chasing_matches][:7]
+        outcome_form[f'win_percentage_{suffix}'] = round(form.mean(results) * 100, 2)
+        chase_form[f'batting_first_win_rate_{suffix}'] = round(form.mean(batting_first_results) * 100, 2) if batting_first_results else 0
+        chase_form[f'chasing_win_rate_{suffix}'] = round(form.mean(chasing_results) * 100, 2) if chasing_results else 0
+        batting_form[f'avg_batting_score_{suffix}'] = round(form.mean(log['score']), 2)
+        batting_form[f'avg_powerplay_score_{suffix}'] = round(avg_powerplay_score, 2)
+        batting_form[f'avg_death_overs_score_{suffix}'] = round(avg_death_overs_score, 2)
+        batting_form[f'wickets_lost_avg_{suffix}'] = round(form.mean(log['wickets_lost']), 2)
+        bowling_form[f'wickets_taken_avg_{suffix}'] = round(form.mean(log['wickets_taken']), 2)
+        bowling_form[f'bowling_economy_powerplay_{suffix}'] = round(avg_powerplay_score / 6, 2)  # Runs per over in PP
+        bowling_form[f'bowling_economy_death_{suffix}'] = round(avg_death_overs_score / 5, 2)  # Runs per over in death
+        margin_form[f'margin_of_victory_mean_{suffix}'] = round(form.mean(log['margin']), 2)
+    
+    return {
+        # Core Metadata
+        'team_name': code,
+        'matches_played': matches_played,
+        'recent_matches_count': recent_count,
         
-        batting_first_win_rate_overall = (sum(result for _, result in batting_first_matches) / len(batting_first_matches) * 100) if batting_first_matches else 0
-        chasing_win_rate_overall = (sum(result for _, result in chasing_matches) / len(chasing_matches) * 100) if chasing_matches else 0
-        batting_first_win_rate_last_7 = (sum(result for _, result in recent_batting_first) / len(recent_batting_first) * 100) if recent_batting_first else 0
-        chasing_win_rate_last_7 = (sum(result for _, result in recent_chasing) / len(recent_chasing) * 100) if recent_chasing else 0
+        # Match Outcome Stats
+        'win_percentage_overall': round(win_percentage_overall, 2),
+        **outcome_form,
+        'batting_first_win_rate_overall': round(batting_first_win_rate_overall, 2),
+        'chasing_win_rate_overall': round(chasing_win_rate_overall, 2),
+        **chase_form,
         
         # Batting Performance
-        batting_scores = sorted(stats['batting_scores'], key=lambda x: x[0], reverse=True)
-        recent_batting = batting_scores[:7]
-        
-        avg_batting_score_overall = sum(score for _, score, _, _ in batting_scores) / len(batting_scores)
-        avg_batting_score_last_7 = sum(score for _, score, _, _ in recent_batting) / len(recent_batting)
-        avg_powerplay_score_last_7 = sum(pp_score for _, _, pp_score, _ in recent_batting) / len(recent_batting)
-        avg_death_overs_score_last_7 = sum(death_score for _, _, _, death_score in recent_batting) / len(recent_batting)
+        'avg_batting_score_overall': round(avg_batting_score_overall, 2),
+        **batting_form,
         
-        # Recent wickets stats
-        recent_wickets = sorted(stats['wickets_data'], key=lambda x: x[0], reverse=True)[:7]
-        wickets_lost_avg_last_7 = sum(wl for _, _, wl in recent_wickets) / len(recent_wickets)
-        wickets_taken_avg_last_7 = sum(wt for _, wt, _ in recent_wickets) / len(recent_wickets)
+        # Bowling Performance
+        **bowling_form,
         
         # Advanced Contextual Features
-        recent_margins = [margin for _, _, margin, _, _ in recent_matches]
-        margin_of_victory_mean_last_7 = sum(recent_margins) / len(recent_margins)
-        
-        # Home/Away stats
-        home_matches = [(date, result) for date, result, _, _, venue_type in all_matches if venue_type == 'home']
-        away_matches = [(date, result) for date, result, _, _, venue_type in all_matches if venue_type == 'away']
-        
-        home_win_rate_overall = (sum(result for _, result in home_matches) / len(home_matches) * 100) if home_matches else 0
-        away_win_rate_overall = (sum(result for _, result in away_matches) / len(away_matches) * 100) if away_matches else 0
-        
-        # Calculate venue adaptability score (0-100)
-        venue_count = len(stats['venues_played'])
-        venue_adaptability_score = min(100, (venue_count / 10) * 100)  # Normalize to max of 100
-        
-        # Calculate momentum score (0-100)
-        recent_win_weight = 0.4
-        margin_weight = 0.3
-        consistency_weight = 0.3
-        
-        recent_win_component = win_percentage_last_7
-        margin_component = min(100, abs(margin_of_victory_mean_last_7) * 10)
-        consistency_component = 100 - (np.std([result for _, result, _, _, _ in recent_matches]) * 100)
-        
-        momentum_score = (recent_win_component * recent_win_weight +
-                        margin_component * margin_weight +
-                        consistency_component * consistency_weight)
-        
-        final_stats.append({
-            # Core Metadata
-            'team_name': team_code,
-            'matches_played': matches_played,
-            'recent_matches_count': recent_count,
-            
-            # Match Outcome Stats
-            'win_percentage_overall': round(win_percentage_overall, 2),
-            'win_percentage_last_7': round(win_percentage_last_7, 2),
-            'batting_first_win_rate_overall': round(batting_first_win_rate_overall, 2),
-            'chasing_win_rate_overall': round(chasing_win_rate_overall, 2),
-            'batting_first_win_rate_last_7': round(batting_first_win_rate_last_7, 2),
-            'chasing_win_rate_last_7': round(chasing_win_rate_last_7, 2),
-            
-            # Batting Performance
-            'avg_batting_score_overall': round(avg_batting_score_overall, 2),
-            'avg_batting_score_last_7': round(avg_batting_score_last_7, 2),
-            'avg_powerplay_score_last_7': round(avg_powerplay_score_last_7, 2),
-            'avg_death_overs_score_last_7': round(avg_death_overs_score_last_7, 2),
-            'wickets_lost_avg_last_7': round(wickets_lost_avg_last_7, 2),
-            
-            # Bowling Performance
-            'wickets_taken_avg_last_7': round(wickets_taken_avg_last_7, 2),
-            'bowling_economy_powerplay_last_7': round(avg_powerplay_score_last_7 / 6, 2),  # Runs per over in PP
-            'bowling_economy_death_last_7': round(avg_death_overs_score_last_7 / 5, 2),  # Runs per over in death
-            
-            # Advanced Contextual Features
-            'margin_of_victory_mean_last_7': round(margin_of_victory_mean_last_7, 2),
-            'momentum_score': round(momentum_score, 2),
-            'home_win_rate_overall': round(home_win_rate_overall, 2),
-            'away_win_rate_overall': round(away_win_rate_overall, 2),
-            'venue_adaptability_score': round(venue_adaptability_score, 2)
-        })
+        **margin_form,
+        'momentum_score': round(momentum_score, 2),
+        'home_win_rate_overall': round(home_win_rate_overall, 2),
+        'away_win_rate_overall': round(away_win_rate_overall, 2),
+        'venue_adaptability_score': round(venue_adaptability_score, 2)
+    }
+
+@stage('summarise_team_stats')
+def summarise_team_stats(team_stats, forms=None):
+    """
+    Turn accumulated per-match team records into one row of final statistics per team.
 
-    # Save to CSV
+    forms is the list of FormWindows to emit recent-form columns for; by default
+    the last 7 matches.
+    """
+    if forms is None:
+        forms = form_windows()
+    
+    # Prepare final statistics for CSV
+    final_stats = []
+    for team, stats in team_stats.items():
+        row = summarise_team(team, stats, forms)
+        if row is not None:
+            final_stats.append(row)
+
+    return final_stats
+
+@stage('save_team_stats')
+def save_team_stats(final_stats):
+    """Save the final team statistics as the team_performance table"""
+    # Create output directory if it doesn't exist
+    output_dir = Path('data/raw/teams')
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Save (Parquet by default, see table_io.py)
     df = pd.DataFrame(final_stats)
-    df.to_csv('data/raw/teams/team_performance.csv', index=False)
+    write_table(df, str(output_dir / 'team_performance'))
+
+@stage('calculate_team_stats')
+def calculate_team_stats(matches=None, workers=1, forms=None):
+    """
+    Build team statistics from match JSON files and save to CSV.
+
+    matches is an optional iterable of (match_id, match_data) pairs, as yielded by
+    match_loader.iter_matches; by default every file in ipl_data/ is parsed, using
+    a pool of `workers` processes when workers > 1. forms selects the recent-form
+    columns (see summarise_team_stats).
+    """
+    if matches is None:
+        # Get all JSON files from ipl_data directory and sort them chronologically
+        json_files = list_match_files()
+        print(f"Total JSON files found: {len(json_files)}")
+        results = map_matches(extract_team_innings, json_files, workers=workers)
+    else:
+        results = ((match_id, extract_team_innings(match_id, match_data)) for match_id, match_data in matches)
+    
+    # Merge in file order so the output does not depend on the number of workers
+    team_stats = new_team_stats()
+    for match_id, entries in results:
+        if entries:
+            add_match_to_team_stats(team_stats, entries)
+    
+    save_team_stats(summarise_team_stats(team_stats, forms))
 
 if __name__ == "__main__":
-    calculate_team_stats()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build team statistics from Cricsheet JSON files")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes used to parse match files (default: 1)")
+    add_form_arguments(parser)
+    args = parser.parse_args()
+
+    calculate_team_stats(workers=args.workers, forms=form_windows_from_args(args))
@@ -0,0 +1,161 @@
+from array import array
+from bisect import bisect_left
+
+# ----------------------
+#  form_engine.py
+# ----------------------
+# Recent-form calculations shared by the player and team statistics. Every
+# player or team keeps its innings in a date-ordered PerformanceLog; a
+# FormWindow weights those innings, most recent first, either as a plain
+# last-N window or as an exponential decay by half-life. Each log is read
+# once and every configured window is computed from that single pass, so one
+# run can emit 3/5/7/10/20-match and decayed form columns side by side.
+
+# Form variants emitted by default: the existing "_last_7" columns
+FORM_WINDOWS = (7,)
+FORM_HALF_LIVES = ()
+
+# Window behind the player consistency and team momentum scores
+RECENT_WINDOW = 7
+
+class PerformanceLog:
+    """
+    One player's or team's innings, kept in date order as one typed array per field.
+
+    Innings are inserted by date as they arrive, so last-N windows are slices
+    of the tail; nothing has to be re-sorted. Innings on the same date read
+    back, most recent first, in the order they were added, matching a stable
+    sort by date. Career totals of the integer fields are kept as running sums
+    in `totals`, so reading them does not grow with the length of the log.
+    """
+    __slots__ = ('match_ids', 'dates', 'columns', 'totals')
+
+    def __init__(self, fields):
+        self.match_ids = []
+        self.dates = array('i')
+        self.columns = {field: array(typecode) for field, typecode in fields.items()}
+        self.totals = {field: 0 for field, typecode in fields.items() if typecode != 'd'}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def append(self, match_id, match_date, stats):
+        """Add one innings; match_date is a date or datetime, stats maps every field to its value"""
+        ordinal = match_date.toordinal()
+        for field in self.totals:
+            self.totals[field] += stats[field]
+        pos = bisect_left(self.dates, ordinal)
+        if pos == len(self.dates):
+            self.match_ids.append(match_id)
+            self.dates.append(ordinal)
+            for field, column in self.columns.items():
+                column.append(stats[field])
+        else:
+            self.match_ids.insert(pos, match_id)
+            self.dates.insert(pos, ordinal)
+            for field, column in self.columns.items():
+                column.insert(pos, stats[field])
+
+    def latest(self, field, n=None):
+        """Values of a field for the last n innings (all if n is None), most recent first"""
+        column = self.match_ids if field == 'match_id' else self.columns[field]
+        start = 0 if n is None else max(0, len(column) - n)
+        return column[start:][::-1]
+
+    def latest_where(self, field, flag_field, n=None, flag=True):
+        """Values of a field for the last n innings (all if n is None) whose flag_field is flag, most recent first"""
+        column = self.columns[field]
+        flags = self.columns[flag_field]
+        values = []
+        for pos in range(len(column) - 1, -1, -1):
+            if bool(flags[pos]) == flag:
+                values.append(column[pos])
+                if len(values) == n:
+                    break
+        return values
+
+    def since(self, field, since_date):
+        """Values of a field for innings played on or after since_date, oldest first"""
+        return self.columns[field][bisect_left(self.dates, since_date.toordinal()):]
+
+class FormWindow:
+    """
+    A weighting of innings given most recent first.
+
+    With size=n the last n innings weigh 1 and older ones are ignored; with
+    half_life=h every innings counts, weighted 0.5 ** (age / h) where age is
+    the number of more recent innings. Column names end in `suffix`
+    ('last_7', 'decay_5', 'decay_2p5').
+    """
+    __slots__ = ('size', 'half_life', 'suffix')
+
+    def __init__(self, size=None, half_life=None):
+        if (size is None) == (half_life is None):
+            raise ValueError("Give exactly one of size or half_life")
+        if (size is not None and size < 1) or (half_life is not None and half_life <= 0):
+            raise ValueError("Window size and half-life must be positive")
+        self.size = size
+        self.half_life = half_life
+        self.suffix = f'last_{size}' if size is not None else f'decay_{half_life:g}'.replace('.', 'p')
+
+    def weights(self, count):
+        """Weights of the `count` most recent innings, most recent first (zero weights dropped)"""
+        if self.size is not None:
+            return [1] * min(count, self.size)
+        return [0.5 ** (age / self.half_life) for age in range(count)]
+
+    def total(self, values):
+        """Weighted sum of values given most recent first"""
+        if self.size is not None:
+            return sum(values[:self.size])
+        return sum(w * v for w, v in zip(self.weights(len(values)), values))
+
+    def weight(self, values):
+        """Total weight of values given most recent first (the innings count for a plain window)"""
+        return sum(self.weights(len(values)))
+
+    def mean(self, values):
+        """Weighted mean of values given most recent first; values must not be empty"""
+        return self.total(values) / self.weight(values)
+
+    def match_weight(self, *match_id_lists):
+        """
+        Weighted number of distinct matches across lists of match IDs given most recent first.
+
+        A match counts once, with the largest weight any of its innings gets, so
+        for a plain window this is the number of distinct matches in the window.
+        """
+        best = {}
+        for match_ids in match_id_lists:
+            for w, match_id in zip(self.weights(len(match_ids)), match_ids):
+                if w > best.get(match_id, 0):
+                    best[match_id] = w
+        return sum(best.values())
+
+def form_depth(forms):
+    """
+    How many of the most recent innings the form windows (and the RECENT_WINDOW scores) read, or None for all.
+
+    Plain windows only see their last n innings; a decay window weighs every
+    innings.
+    """
+    if any(form.size is None for form in forms):
+        return None
+    return max([RECENT_WINDOW] + [form.size for form in forms])
+
+def form_windows(windows=FORM_WINDOWS, half_lives=FORM_HALF_LIVES):
+    """Build the FormWindows for the given window sizes and decay half-lives"""
+    return [FormWindow(size=n) for n in windows] + [FormWindow(half_life=h) for h in half_lives]
+
+def add_form_arguments(parser):
+    """Add the --form-windows and --half-lives options to a script's argument parser"""
+    parser.add_argument('--form-windows', default=','.join(map(str, FORM_WINDOWS)),
+                        help="comma-separated last-N match windows for the form columns (default: %(default)s)")
+    parser.add_argument('--half-lives', default=','.join(map(str, FORM_HALF_LIVES)),
+                        help="comma-separated half-lives, in matches, for exponentially decayed form columns")
+
+def form_windows_from_args(args):
+    """Build the FormWindows requested on the command line"""
+    windows = [int(n) for n in args.form_windows.split(',') if n]
+    half_lives = [float(h) for h in args.half_lives.split(',') if h]
+    return form_windows(windows, half_lives)
@@ -0,0 +1,17 @@
+import hashlib
+
+# ----------------------
+#  hashing.py
+# ----------------------
+# Content hashes of files, shared by the incremental rebuild, the pipeline
+# runner and the caches of weather_features.py and sweep.py. It imports
+# nothing from scripts/, so using it adds no modules to a stage's dependencies
+# (see run_pipeline.local_modules).
+
+def content_hash(file_path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+
+from fetch_all import extract_all, extract_all_streaming, fold_all, save_folded
+from form_engine import add_form_arguments, form_windows_from_args
+from hashing import content_hash
+from match_loader import list_match_files, map_match_files, map_matches, match_id_from_path
+
+# ----------------------
+#  incremental.py
+# ----------------------
+# Incremental rebuild of match_metadata.csv, players_performance.csv and
+# team_performance.csv. A manifest records every processed match file by
+# match_id, mtime and content hash, and the per-match extraction results (the
+# per-innings batter/bowler figures and team innings records that feed the
+# running player and team aggregates) are persisted alongside it, together
+# with the aggregates themselves: the match rows, player records and team
+# records folded from every match so far. A run parses only new or changed
+# files. When every new file sorts after the ones already folded and none of
+# those changed or went away (the daily case), only the new matches are folded
+# into the saved aggregates, and their results are appended to the cache
+# without reading it back. Otherwise the aggregates are folded again from the
+# cached results, still without parsing. Either way the matches are folded
+# in file order, so the CSVs come out exactly as a full rebuild would write them.
+#
+# Saved state is keyed by the source of the modules the cached results come
+# from, so any change to the extractors, the team or venue registries or the
+# loader discards it and the next run parses every file again.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_DIR = os.path.join('data', 'processed', 'state')
+MANIFEST_FILE = 'manifest.json'
+RESULTS_FILE = 'match_results.pkl'
+FOLDED_FILE = 'folded.pkl'
+
+# Bump when the layout of the saved state changes
+STATE_VERSION = 4
+# Modules whose code shapes the cached per-match results and folded aggregates
+EXTRACTOR_MODULES = ('fetch_all', 'fetch_matches', 'fetch_players', 'fetch_teams', 'form_engine', 'match_loader', 'teams', 'venues')
+
+def extractor_key():
+    """Hash of STATE_VERSION and the source of every module in EXTRACTOR_MODULES"""
+    digest = hashlib.sha256(f"{STATE_VERSION}\n".encode())
+    for module in EXTRACTOR_MODULES:
+        digest.update(f"{module}:{content_hash(os.path.join(SCRIPTS_DIR, module + '.py'))}\n".encode())
+    return digest.hexdigest()
+
+def load_state(state_dir=STATE_DIR):
+    """
+    Load (manifest, results_size, folded_ids, folded); all are empty if there is no usable saved state.
+
+    results_size is how much of the results file the manifest vouches for
+    (see load_results). folded is the (match_rows, player_stats, team_stats)
+    fold of fetch_all.fold_all over the matches in folded_ids, in that order.
+    """
+    manifest_path = os.path.join(state_dir, MANIFEST_FILE)
+    folded_path = os.path.join(state_dir, FOLDED_FILE)
+    if not all(os.path.exists(path) for path in (manifest_path, folded_path, os.path.join(state_dir, RESULTS_FILE))):
+        return {}, 0, [], None
+
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STATE_VERSION or manifest.get('extractors') != extractor_key():
+        print("Saved state was built by different extraction code, rebuilding from scratch")
+        return {}, 0, [], None
+
+    with open(folded_path, 'rb') as f:
+        folded_ids, folded = pickle.load(f)
+    return manifest['files'], manifest['results_size'], folded_ids, folded
+
+def load_results(size, state_dir=STATE_DIR):
+    """
+    Per-match results saved so far, by match_id.
+
+    The results file is a sequence of pickled dicts, one per run that added
+    results; later entries replace earlier ones. Only the first size bytes
+    count, as a run that stopped early may have appended past them.
+    """
+    results = {}
+    with open(os.path.join(state_dir, RESULTS_FILE), 'rb') as f:
+        while f.tell() < size:
+            results.update(pickle.load(f))
+    return results
+
+def write_results(results, state_dir=STATE_DIR):
+    """Replace the results file with results alone, atomically; returns its size"""
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, RESULTS_FILE)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = f.tell()
+    os.replace(path + '.tmp', path)
+    return size
+
+def append_results(results, size, state_dir=STATE_DIR):
+    """Add results after the first size bytes of the results file; returns its new size"""
+    with open(os.path.join(state_dir, RESULTS_FILE), 'r+b') as f:
+        f.truncate(size)
+        f.seek(size)
+        pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return f.tell()
+
+def save_state(manifest, results_size, folded_ids, folded, state_dir=STATE_DIR):
+    """Persist the folded aggregates, then the manifest, replacing each file atomically"""
+    os.makedirs(state_dir, exist_ok=True)
+
+    # The manifest goes last: if a run stops early, the next one parses its files again
+    folded_path = os.path.join(state_dir, FOLDED_FILE)
+    with open(folded_path + '.tmp', 'wb') as f:
+        pickle.dump((folded_ids, folded), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(folded_path + '.tmp', folded_path)
+
+    manifest_path = os.path.join(state_dir, MANIFEST_FILE)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump({'version': STATE_VERSION, 'extractors': extractor_key(), 'results_size': results_size, 'files': manifest},
+                  f, indent=1, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def find_changed_files(match_files, manifest):
+    """
+    Compare match files against the manifest.
+
+    Returns (changed, fingerprints): the files that need parsing, and the
+    manifest entry for every file. Files whose mtime and size are unchanged are
+    trusted without hashing; otherwise the content hash decides.
+    """
+    changed = []
+    fingerprints = {}
+
+    for file_path in match_files:
+        match_id = match_id_from_path(file_path)
+        stat = os.stat(file_path)
+        entry = {'file': os.path.basename(file_path), 'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+        previous = manifest.get(match_id)
+
+        if previous and previous['mtime'] == entry['mtime'] and previous['size'] == entry['size']:
+            entry['sha256'] = previous['sha256']
+        else:
+            entry['sha256'] = content_hash(file_path)
+            if not previous or previous['sha256'] != entry['sha256']:
+                changed.append(file_path)
+
+        fingerprints[match_id] = entry
+
+    return changed, fingerprints
+
+def incremental_fetch_all(match_files=None, state_dir=STATE_DIR, full=False, workers=1, stream=False, forms=None):
+    """
+    Rebuild the match, player and team CSVs, parsing only new or changed match files.
+
+    With full=True the saved state is discarded and every file is parsed again.
+    With workers > 1, changed files are parsed in a process pool. With
+    stream=True they are streamed over by over (see fetch_all.extract_all_streaming).
+    forms selects the recent-form columns, as in fetch_all; they are computed
+    when the CSVs are written, so changing them needs no re-parse.
+    """
+    if match_files is None:
+        match_files = list_match_files()
+
+    if not match_files:
+        print("No match JSON files found. Please ensure data is in ipl_data directory.")
+        return
+
+    manifest, results_size, folded_ids, folded = ({}, 0, [], None) if full else load_state(state_dir)
+    changed, fingerprints = find_changed_files(match_files, manifest)
+    removed = set(manifest) - set(fingerprints)
+
+    print(f"{len(match_files)} match files: {len(changed)} new or changed, {len(removed)} removed")
+
+    # A changed file only goes back into the manifest once it loads, so files
+    # that fail are retried on the next run
+    pending = {}
+    for file_path in changed:
+        match_id = match_id_from_path(file_path)
+        pending[match_id] = fingerprints.pop(match_id)
+
+    if stream:
+        extracted = map_match_files(extract_all_streaming, changed, workers=workers)
+    else:
+        extracted = map_matches(extract_all, changed, workers=workers)
+    new_results = {}
+    for match_id, result in extracted:
+        new_results[match_id] = result
+        fingerprints[match_id] = pending[match_id]
+
+    # Fold in file order, exactly as a full run would. The saved fold still
+    # holds if it covers a prefix of the matches and none of them was parsed
+    # again: then only the new matches are folded in and their results appended
+    ordered_ids = [match_id for match_id in map(match_id_from_path, match_files) if match_id in fingerprints]
+    unfolded = ordered_ids[len(folded_ids):]
+    if (folded is not None and ordered_ids[:len(folded_ids)] == folded_ids
+            and pending.keys().isdisjoint(folded_ids) and new_results.keys() >= set(unfolded)):
+        print(f"Folding {len(unfolded)} new matches into the aggregates of {len(folded_ids)}")
+        if new_results:
+            results_size = append_results(new_results, results_size, state_dir)
+        folded = fold_all(((match_id, new_results[match_id]) for match_id in unfolded), folded)
+    else:
+        print(f"Folding all {len(ordered_ids)} matches")
+        results = load_results(results_size, state_dir) if folded is not None else {}
+        results.update(new_results)
+        results = {match_id: results[match_id] for match_id in ordered_ids}
+        results_size = write_results(results, state_dir)
+        folded = fold_all(results.items())
+
+    save_folded(folded, forms)
+    save_state(fingerprints, results_size, ordered_ids, folded, state_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally rebuild match, player and team statistics")
+    parser.add_argument('--full', action='store_true', help="ignore saved state and reprocess every match file")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes used to parse match files (default: 1)")
+    parser.add_argument('--state-dir', default=STATE_DIR, help="where the manifest and cached results live (default: %(default)s)")
+    parser.add_argument('--stream', action='store_true', help="stream match files over by over to bound memory")
+    add_form_arguments(parser)
+    args = parser.parse_args()
+
+    incremental_fetch_all(state_dir=args.state_dir, full=args.full, workers=args.workers, stream=args.stream,
+                          forms=form_windows_from_args(args))
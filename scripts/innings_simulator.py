@@ -0,0 +1,305 @@
+import argparse
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from match_loader import list_match_files, load_match, map_matches
+from table_io import read_table, table_exists, write_table
+
+# ----------------------
+#  innings_simulator.py
+# ----------------------
+# Ball-by-ball Monte Carlo match simulator. Every delivery in ipl_data/ is
+# bucketed into one of OUTCOMES and counted per batter, per bowler and per
+# over of the innings. A ball between a batter and a bowler in a given over is
+# drawn from a log-linear blend of the three distributions, with each
+# player's counts shrunk towards the league average (PRIOR_BALLS), so
+# unknown or replacement players bowl and bat like an average player.
+#
+# Simulations advance together as NumPy arrays: one step draws the next
+# delivery for every simulated innings at once, so the Python loop runs per
+# ball of an innings (about 125 times), never per simulation.
+#
+# Simplifications: wides and no-balls are one run and not a legal ball, and
+# the batters do not cross on them, so extras never change the strike; a
+# legal ball scores 0, 1, 2, 3, 4 or 6 (5s count as 4, 7+ as 6); a wicket
+# ball scores nothing and always dismisses the striker.
+
+PROFILE_PATH = os.path.join('data', 'processed', 'simulator', 'outcome_profiles')
+
+OUTCOMES = ('0', '1', '2', '3', '4', '6', 'W', 'X')
+OUTCOME_RUNS = np.array([0, 1, 2, 3, 4, 6, 0, 1], dtype=np.int16)
+OUTCOME_LEGAL = np.array([1, 1, 1, 1, 1, 1, 1, 0], dtype=np.int16)
+WICKET = OUTCOMES.index('W')
+EXTRA = OUTCOMES.index('X')
+COUNT_COLUMNS = [f"n_{outcome}" for outcome in OUTCOMES]
+
+MAX_OVERS = 20
+BALLS_PER_OVER = 6
+MAX_OVERS_PER_BOWLER = 4
+
+# Balls of league-average evidence added to every player's counts
+PRIOR_BALLS = 60
+
+# Name given to a player removed from a lineup; profiles never contain it
+REPLACEMENT = 'Replacement'
+
+def delivery_outcome(delivery):
+    """Index into OUTCOMES of one Cricsheet delivery"""
+    extras = delivery.get('extras', {})
+    if 'wides' in extras or 'noballs' in extras:
+        return EXTRA
+    if delivery.get('wickets'):
+        return WICKET
+    runs = delivery.get('runs', {}).get('total', 0)
+    return OUTCOMES.index('6') if runs >= 6 else min(runs, 4)
+
+def extract_outcome_counts(match_id, match_data):
+    """Per-batter, per-bowler and per-over outcome counts of a match's first two innings"""
+    batting = defaultdict(lambda: np.zeros(len(OUTCOMES), dtype=np.int64))
+    bowling = defaultdict(lambda: np.zeros(len(OUTCOMES), dtype=np.int64))
+    overs = np.zeros((MAX_OVERS, len(OUTCOMES)), dtype=np.int64)
+
+    for innings in match_data.get('innings', [])[:2]:
+        for over in innings.get('overs', []):
+            if over['over'] >= MAX_OVERS:
+                continue
+            for delivery in over.get('deliveries', []):
+                outcome = delivery_outcome(delivery)
+                # Wides and no-balls are the bowler's; the batter faced no legal ball
+                if outcome != EXTRA:
+                    batting[delivery['batter']][outcome] += 1
+                bowling[delivery['bowler']][outcome] += 1
+                overs[over['over'], outcome] += 1
+
+    return dict(batting), dict(bowling), overs
+
+def build_outcome_profiles(match_files=None, workers=1):
+    """Sum the outcome counts of every match into one profile table (kind, name, n_0 ... n_X)"""
+    totals = {'batter': defaultdict(lambda: np.zeros(len(OUTCOMES), dtype=np.int64)),
+              'bowler': defaultdict(lambda: np.zeros(len(OUTCOMES), dtype=np.int64))}
+    overs = np.zeros((MAX_OVERS, len(OUTCOMES)), dtype=np.int64)
+
+    for _, counts in map_matches(extract_outcome_counts, match_files, workers=workers):
+        if counts is None:
+            continue
+        batting, bowling, match_overs = counts
+        for name, values in batting.items():
+            totals['batter'][name] += values
+        for name, values in bowling.items():
+            totals['bowler'][name] += values
+        overs += match_overs
+
+    rows = [('over', str(over), *counts) for over, counts in enumerate(overs)]
+    for kind in ('batter', 'bowler'):
+        rows.extend((kind, name, *counts) for name, counts in sorted(totals[kind].items()))
+    return pd.DataFrame(rows, columns=['kind', 'name'] + COUNT_COLUMNS)
+
+def load_outcome_profiles(profile_path=PROFILE_PATH, workers=1):
+    """Load the saved profile table, building and saving it first if it does not exist"""
+    if not table_exists(profile_path):
+        write_table(build_outcome_profiles(workers=workers), profile_path)
+    return read_table(profile_path)
+
+def _shrink(counts, prior):
+    """Distributions from counts shrunk towards a prior distribution by PRIOR_BALLS balls"""
+    return (counts + PRIOR_BALLS * prior) / (counts.sum(axis=-1, keepdims=True) + PRIOR_BALLS)
+
+class OutcomeModel:
+    """
+    Ball outcome probabilities for any batter, bowler and over.
+
+    Legal-ball outcomes follow P_batter * P_bowler * P_over / P_league ** 2
+    (renormalised, each over legal balls only); the chance of a wide or
+    no-ball comes from the bowler and the over alone.
+    """
+
+    def __init__(self, profiles):
+        kinds = profiles['kind'].astype(str)
+        names = profiles['name'].astype(str)
+        counts = profiles[COUNT_COLUMNS].to_numpy(dtype=np.float64)
+
+        over_rows = kinds.eq('over').to_numpy()
+        over_counts = np.zeros((MAX_OVERS, len(OUTCOMES)))
+        over_counts[names[over_rows].astype(int).to_numpy()] = counts[over_rows]
+        self.league = _normalise(over_counts.sum(axis=0) + 1)
+        self.overs = _shrink(over_counts, self.league)
+
+        self.batters = {name: row for name, row in zip(names[kinds.eq('batter')], counts[kinds.eq('batter').to_numpy()])}
+        self.bowlers = {name: row for name, row in zip(names[kinds.eq('bowler')], counts[kinds.eq('bowler').to_numpy()])}
+
+    def batter_distribution(self, name):
+        counts = self.batters.get(name, np.zeros(len(OUTCOMES)))
+        # Batters never face wides or no-balls, so their prior has none either
+        prior = self.league.copy()
+        prior[EXTRA] = 0
+        return _shrink(counts, prior / prior.sum())
+
+    def bowler_distribution(self, name):
+        return _shrink(self.bowlers.get(name, np.zeros(len(OUTCOMES))), self.league)
+
+    def ball_probabilities(self, batters, bowling_plan):
+        """
+        Outcome probabilities per over and batting position: an array of shape
+        (len(bowling_plan), len(batters), len(OUTCOMES)) for bowler bowling_plan[over].
+        """
+        legal = OUTCOME_LEGAL == 1
+        bat = np.array([self.batter_distribution(name) for name in batters])[:, legal]
+        bowl = np.array([self.bowler_distribution(name) for name in bowling_plan])
+        overs = self.overs[:len(bowling_plan)]
+
+        # P(extra) per over: the bowler's rate scaled by how that over compares to the league
+        extra = np.clip(bowl[:, EXTRA] * overs[:, EXTRA] / self.league[EXTRA], 0, 0.5)
+
+        blend = (bat[None, :, :] * _normalise(bowl[:, legal])[:, None, :] * _normalise(overs[:, legal])[:, None, :]
+                 / _normalise(self.league[legal]) ** 2)
+        probabilities = np.zeros((len(bowling_plan), len(batters), len(OUTCOMES)))
+        probabilities[:, :, legal] = _normalise(blend) * (1 - extra)[:, None, None]
+        probabilities[:, :, EXTRA] = extra[:, None]
+        return probabilities
+
+def _normalise(values):
+    return values / values.sum(axis=-1, keepdims=True)
+
+def default_bowling_plan(bowlers, max_overs=MAX_OVERS):
+    """
+    Over-by-over bowlers from a list in order of preference.
+
+    Bowlers take turns, so nobody bowls consecutive overs; with five or more
+    bowlers nobody bowls more than MAX_OVERS_PER_BOWLER overs.
+    """
+    if not bowlers:
+        raise ValueError("At least one bowler is needed")
+    return [bowlers[over % len(bowlers)] for over in range(max_overs)]
+
+def simulate_innings(model, batters, bowling_plan, n_sims=10000, target=None, runs=0, wickets=0, balls=0, rng=None):
+    """
+    Simulate n_sims innings at once from the given state.
+
+    batters is the batting order, bowling_plan the bowler of every over.
+    target is the score to chase; it and the starting runs, wickets and balls
+    can each be one number or one per simulation. The innings ends when the
+    target is reached, all out, or the overs run out. Returns a dict of
+    per-simulation arrays: runs, wickets and balls (legal balls bowled).
+    """
+    rng = np.random.default_rng(rng)
+    max_balls = len(bowling_plan) * BALLS_PER_OVER
+    cumulative = np.cumsum(model.ball_probabilities(batters, bowling_plan), axis=-1).astype(np.float32)
+    cumulative[..., -1] = 1
+    cumulative = cumulative.reshape(-1, len(OUTCOMES))
+    last_batter = len(batters) - 1
+
+    runs = np.broadcast_to(np.asarray(runs, dtype=np.int32), (n_sims,)).copy()
+    wickets = np.broadcast_to(np.asarray(wickets, dtype=np.int32), (n_sims,)).copy()
+    balls = np.broadcast_to(np.asarray(balls, dtype=np.int32), (n_sims,)).copy()
+    striker = np.minimum(wickets, last_batter)
+    non_striker = np.minimum(wickets + 1, last_batter)
+    target = np.broadcast_to(np.asarray(np.iinfo(np.int32).max if target is None else target, dtype=np.int32), (n_sims,))
+    active = (balls < max_balls) & (wickets < last_batter) & (runs < target)
+
+    while active.any():
+        over = np.minimum(balls // BALLS_PER_OVER, len(bowling_plan) - 1)
+        u = rng.random(n_sims, dtype=np.float32)
+        outcome = (u[:, None] > cumulative[over * len(batters) + striker]).sum(axis=1)
+
+        scored = OUTCOME_RUNS[outcome] * active
+        legal = (OUTCOME_LEGAL[outcome] == 1) & active
+        out = (outcome == WICKET) & active
+        runs += scored
+        balls += legal
+        wickets += out
+
+        # A new batter replaces the striker; odd runs off a legal ball and the end of an over change ends
+        striker = np.where(out, np.minimum(wickets + 1, last_batter), striker)
+        swap = ((scored % 2 == 1) & legal) ^ (legal & (balls % BALLS_PER_OVER == 0))
+        striker, non_striker = np.where(swap, non_striker, striker), np.where(swap, striker, non_striker)
+
+        active &= (balls < max_balls) & (wickets < last_batter) & (runs < target)
+
+    return {'runs': runs, 'wickets': wickets, 'balls': balls}
+
+def simulate_match(model, team1, team2, n_sims=10000, seed=None):
+    """
+    Simulate a match in which team1 bats first.
+
+    team1 and team2 are dicts with 'batters' (batting order) and 'bowlers'
+    (list of bowlers, or the bowler of every over). Returns the first- and
+    second-innings results of every simulation and team1's win probability,
+    counting ties as half a win.
+    """
+    rng = np.random.default_rng(seed)
+    first = simulate_innings(model, team1['batters'], _plan(team2['bowlers']), n_sims, rng=rng)
+    second = simulate_innings(model, team2['batters'], _plan(team1['bowlers']), n_sims, target=first['runs'] + 1, rng=rng)
+
+    team1_wins = (first['runs'] > second['runs']).mean() + 0.5 * (first['runs'] == second['runs']).mean()
+    return {'first_innings': first, 'second_innings': second, 'team1_win_probability': float(team1_wins)}
+
+def _plan(bowlers):
+    """A full bowling plan, from either a per-over list or bowlers in order of preference"""
+    return list(bowlers) if len(bowlers) >= MAX_OVERS else default_bowling_plan(list(bowlers))
+
+def score_summary(runs):
+    """Mean, spread and percentiles of simulated scores"""
+    p5, p25, p50, p75, p95 = np.percentile(runs, [5, 25, 50, 75, 95])
+    return {'mean': float(runs.mean()), 'std': float(runs.std()),
+            'p5': p5, 'p25': p25, 'median': p50, 'p75': p75, 'p95': p95}
+
+def match_lineups(match_data):
+    """
+    Batting orders and over-by-over bowling plans of a played match, keyed by team.
+
+    Batters are taken in order of appearance, followed by the rest of the XI.
+    """
+    info = match_data['info']
+    lineups = {team: {'batters': [], 'bowlers': []} for team in info['teams']}
+    for innings in match_data.get('innings', [])[:2]:
+        batting_team = innings['team']
+        bowling_team = [team for team in info['teams'] if team != batting_team][0]
+        batters = lineups[batting_team]['batters']
+        plan = lineups[bowling_team]['bowlers']
+        for over in innings.get('overs', []):
+            for delivery in over.get('deliveries', []):
+                for name in (delivery['batter'], delivery.get('non_striker')):
+                    if name and name not in batters:
+                        batters.append(name)
+            if over.get('deliveries') and over['over'] < MAX_OVERS:
+                plan.append(over['deliveries'][0]['bowler'])
+
+    for team, lineup in lineups.items():
+        lineup['batters'] += [p for p in info.get('players', {}).get(team, []) if p not in lineup['batters']]
+    return lineups
+
+def drop_player(lineup, player):
+    """A copy of a lineup with player replaced by a league-average replacement"""
+    return {key: [REPLACEMENT if name == player else name for name in names] for key, names in lineup.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of a match from its lineups")
+    parser.add_argument('match', help="match ID of a file in ipl_data/ whose lineups, batting order and bowling plans are used")
+    parser.add_argument('--sims', type=int, default=100000, help="number of simulated matches (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--drop', nargs='+', default=[], metavar='PLAYER', help="replace these players with a league-average player")
+    parser.add_argument('--profiles', default=PROFILE_PATH, help="outcome profile table, built on first use (default: %(default)s)")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the outcome profiles from ipl_data/")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes used to parse match files (default: 1)")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        write_table(build_outcome_profiles(list_match_files(), workers=args.workers), args.profiles)
+    model = OutcomeModel(load_outcome_profiles(args.profiles, workers=args.workers))
+
+    _, match_data = load_match(os.path.join('ipl_data', f"{args.match}.json"))
+    lineups = match_lineups(match_data)
+    first_team = match_data['innings'][0]['team']
+    second_team = [team for team in lineups if team != first_team][0]
+    for player in args.drop:
+        lineups = {team: drop_player(lineup, player) for team, lineup in lineups.items()}
+
+    result = simulate_match(model, lineups[first_team], lineups[second_team], args.sims, args.seed)
+    for team, innings in ((first_team, 'first_innings'), (second_team, 'second_innings')):
+        summary = score_summary(result[innings]['runs'])
+        print(f"{team}: mean {summary['mean']:.1f} (sd {summary['std']:.1f}), "
+              f"median {summary['median']:.0f}, 90% range {summary['p5']:.0f}-{summary['p95']:.0f}")
+    print(f"{first_team} win probability: {result['team1_win_probability']:.3f}")
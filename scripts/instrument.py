@@ -0,0 +1,161 @@
+import argparse
+import cProfile
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Peak memory comes from getrusage, which is not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# ----------------------
+#  instrument.py
+# ----------------------
+# Timers and counters for the pipeline scripts. Code marks a unit of work
+# with `with stage('name'):` and records counts with count('name', n) (files
+# parsed, deliveries, rows joined, bytes read and written). When a stage
+# ends, one JSON line is written with its wall time, the process's peak
+# resident memory so far (and that of any worker processes), and its
+# counters. A nested stage's counters are added to its parent as well.
+#
+# Everything is off unless an environment variable turns it on, so the
+# scripts run unchanged by default:
+#   OVERCAST_METRICS=path   append JSON lines to path ('-' for stderr)
+#   OVERCAST_PROFILE=dir    run each outermost stage under cProfile and dump
+#                           dir/<script>.<stage>.<pid>.prof (pstats format)
+# run_pipeline.py sets both for its stages with --metrics and --profile.
+#
+# Counts made in pool workers are gathered with collect() and sent back with
+# each result (see match_loader.py), then added to the parent's open stage.
+
+METRICS_PATH = os.environ.get('OVERCAST_METRICS') or None
+PROFILE_DIR = os.environ.get('OVERCAST_PROFILE') or None
+ENABLED = METRICS_PATH is not None or PROFILE_DIR is not None
+
+class _Stage:
+    __slots__ = ('name', 'start', 'counters')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.counters = {}
+
+_STACK = []
+
+def count(name, value=1):
+    """Add value to a counter of the innermost open stage (ignored outside any stage)"""
+    if not ENABLED or not _STACK:
+        return
+    counters = _STACK[-1].counters
+    counters[name] = counters.get(name, 0) + value
+
+@contextmanager
+def collect():
+    """
+    Gather the counts made in the enclosed block into the yielded dict instead of the open stages.
+
+    Used in pool workers, which may have inherited the parent's open stages
+    when they were forked.
+    """
+    if not ENABLED:
+        yield {}
+        return
+    saved = _STACK[:]
+    entry = _Stage('collect')
+    _STACK[:] = [entry]
+    try:
+        yield entry.counters
+    finally:
+        _STACK[:] = saved
+
+def merge_counts(counts):
+    """Add counts collected in another process to the innermost open stage"""
+    for name, value in counts.items():
+        count(name, value)
+
+def peak_rss_mb(children=False):
+    """Peak resident memory in MB of this process, or of its largest finished child process"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def _script():
+    return os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+
+def emit(record, path=None):
+    """Write one JSON metrics line to path (default: OVERCAST_METRICS, if set)"""
+    path = path or METRICS_PATH
+    if path is None:
+        return
+    record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pid': os.getpid(), 'script': _script(), **record}
+    line = json.dumps(record) + '\n'
+    if path == '-':
+        sys.stderr.write(line)
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(line)
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as a stage and emit its metrics when it ends"""
+    if not ENABLED:
+        yield
+        return
+
+    profiler = None
+    if PROFILE_DIR is not None and not _STACK:
+        profiler = cProfile.Profile()
+    entry = _Stage(name)
+    _STACK.append(entry)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        seconds = time.perf_counter() - entry.start
+        path = '/'.join(s.name for s in _STACK)
+        _STACK.pop()
+        if _STACK:
+            for counter, value in entry.counters.items():
+                _STACK[-1].counters[counter] = _STACK[-1].counters.get(counter, 0) + value
+        if profiler is not None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(os.path.join(PROFILE_DIR, f"{_script()}.{name}.{os.getpid()}.prof"))
+        emit({'stage': path, 'seconds': round(seconds, 4), 'peak_rss_mb': peak_rss_mb(),
+              'worker_peak_rss_mb': peak_rss_mb(children=True), 'counters': entry.counters})
+
+def summarize(lines):
+    """Total seconds, calls and counters per (script, stage) of parsed metrics lines"""
+    totals = {}
+    for record in lines:
+        if 'stage' not in record:
+            continue
+        key = (record['script'], record['stage'])
+        total = totals.setdefault(key, {'calls': 0, 'seconds': 0.0, 'peak_rss_mb': 0.0, 'counters': {}})
+        total['calls'] += 1
+        total['seconds'] += record.get('seconds') or 0
+        total['peak_rss_mb'] = max(total['peak_rss_mb'], record.get('peak_rss_mb') or 0)
+        for counter, value in record.get('counters', {}).items():
+            total['counters'][counter] = total['counters'].get(counter, 0) + value
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a metrics file written with OVERCAST_METRICS")
+    parser.add_argument('metrics', help="JSON-lines metrics file")
+    args = parser.parse_args()
+
+    with open(args.metrics) as f:
+        totals = summarize(json.loads(line) for line in f if line.strip())
+    print(f"{'script':<20}{'stage':<40}{'calls':>6}{'seconds':>10}{'peak MB':>10}  counters")
+    for (script, name), total in sorted(totals.items()):
+        counters = ', '.join(f"{counter}={value}" for counter, value in sorted(total['counters'].items()))
+        print(f"{script:<20}{name:<40}{total['calls']:>6}{total['seconds']:>10.2f}{total['peak_rss_mb']:>10.1f}  {counters}")
@@ -0,0 +1,186 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrument import stage
+from match_loader import list_match_files, map_matches
+from table_io import write_table
+from teams import is_excluded_match, team_code
+
+# ----------------------
+#  lineups.py
+# ----------------------
+# Playing XIs and lineup-level player features. build_lineups() reads each
+# match's XIs from the Cricsheet `info.players` field into one long table
+# (match_id, date, team, player_name). lineup_features() then aggregates the
+# players' features as they stood before each match (the player snapshots of
+# feature_snapshots.py) over every XI.
+#
+# The aggregation never filters a DataFrame per match. Snapshot keys are
+# sorted once by (player, date), every lineup slot finds its as-of row with
+# one searchsorted over packed (player, day) keys, and then one feature at a
+# time is gathered for every slot (float32) and each XI reduced with
+# ufunc.reduceat over contiguous slots. Only one feature column of slots is
+# in memory at once, and player names are matched as categorical codes, so
+# no per-slot Python strings are created.
+
+LINEUP_DIR = os.path.join('data', 'processed', 'lineups')
+LINEUP_TABLE = 'match_lineups'
+
+def _xi_avg(values, present, starts):
+    return _xi_sum(values, present, starts) / np.add.reduceat(present, starts)
+
+def _xi_sum(values, present, starts):
+    return np.add.reduceat(np.where(present, values, 0), starts, dtype=np.float64)
+
+def _xi_max(values, present, starts):
+    return np.fmax.reduceat(values, starts)
+
+def _xi_min(values, present, starts):
+    return np.fmin.reduceat(values, starts)
+
+# Aggregates over an XI: name -> reducer over contiguous slot ranges, ignoring missing features
+AGGREGATORS = {'avg': _xi_avg, 'sum': _xi_sum, 'max': _xi_max, 'min': _xi_min}
+# Aggregates taken by default for every numeric player feature
+LINEUP_AGGREGATES = ('avg', 'max')
+
+# Snapshot columns that are keys, not features
+SNAPSHOT_KEYS = ('player_name', 'date', 'match_id')
+# Snapshot columns that describe a player rather than measure them
+SNAPSHOT_LABELS = ('role',)
+
+def snapshot_columns(columns):
+    """The player_snapshots columns lineup_features() reads, out of all of them"""
+    return [col for col in columns if col in ('player_name', 'date') or col not in SNAPSHOT_KEYS + SNAPSHOT_LABELS]
+
+def extract_lineup(match_id, match_data):
+    """
+    (date, [(team code, player), ...]) for the playing XIs of a single parsed match.
+
+    Returns None if the match has no players listed or involves a defunct franchise.
+    """
+    info = match_data['info']
+    players = info.get('players')
+    if not players or is_excluded_match(info['teams']):
+        return None
+    return info['dates'][0], [(team_code(team), player) for team in info['teams'] for player in players.get(team, [])]
+
+@stage('build_lineups')
+def build_lineups(match_files=None, workers=1, output_dir=LINEUP_DIR):
+    """Parse every match file and write the match_lineups table, one row per player per match"""
+    if match_files is None:
+        match_files = list_match_files()
+
+    if not match_files:
+        print("No match JSON files found. Please ensure data is in ipl_data directory.")
+        return
+
+    print(f"Processing {len(match_files)} match files...")
+    columns = {'match_id': [], 'date': [], 'team': [], 'player_name': []}
+    for match_id, extracted in map_matches(extract_lineup, match_files, workers=workers):
+        if extracted is None:
+            continue
+        match_date, slots = extracted
+        for team, player in slots:
+            columns['match_id'].append(match_id)
+            columns['date'].append(match_date)
+            columns['team'].append(team)
+            columns['player_name'].append(player)
+
+    lineups = pd.DataFrame(columns)
+    write_table(lineups, os.path.join(output_dir, LINEUP_TABLE))
+    print(f"Saved {len(lineups)} lineup slots for {lineups['match_id'].nunique()} matches to {output_dir}")
+
+def _days(dates):
+    """Dates as integer day numbers"""
+    return pd.to_datetime(dates).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+def snapshot_rows(snapshots, players, dates):
+    """
+    Position in snapshots of each lineup slot's features as they stood at the start of its date, or -1.
+
+    players and dates are parallel arrays of lineup slots; players without
+    any snapshot get -1. Past a player's last snapshot, the last one (the
+    current state) holds, as in feature_snapshots.SnapshotIndex.
+    """
+    names = pd.Categorical(snapshots['player_name'])
+    snapshot_player = names.codes.astype(np.int64)
+    snapshot_day = _days(snapshots['date'])
+    first_day = snapshot_day.min(initial=0)
+    span = int(snapshot_day.max(initial=0) - first_day + 2)
+
+    # Packed (player, day) keys, sorted once; one binary search finds every slot's row
+    keys = snapshot_player * span + (snapshot_day - first_day)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    owner = snapshot_player[order]
+
+    player = pd.Categorical(players, categories=names.categories).codes.astype(np.int64)
+    known = player >= 0
+    day = np.clip(_days(dates) - first_day, 0, span - 1)
+    pos = np.searchsorted(keys, np.where(known, player, 0) * span + day, side='left')
+    past_last = (pos == len(keys)) | (owner[np.minimum(pos, len(keys) - 1)] != player)
+    return np.where(known, order[np.where(past_last, pos - 1, pos)], -1)
+
+def _gather(snapshots, feature, rows):
+    """One feature of the given snapshot rows as float32, NaN where rows is -1"""
+    values = snapshots[feature].to_numpy(dtype=np.float32, na_value=np.nan)[rows]
+    values[rows < 0] = np.nan
+    return values
+
+def gather_player_features(snapshots, players, dates, features):
+    """Player features as they stood at the start of each date, as a float32 (len(players), len(features)) matrix (see snapshot_rows)"""
+    rows = snapshot_rows(snapshots, players, dates)
+    return np.column_stack([_gather(snapshots, feature, rows) for feature in features]) if features else np.empty((len(rows), 0), np.float32)
+
+def lineup_features(lineups, snapshots, aggregates=LINEUP_AGGREGATES):
+    """
+    Aggregate player features over every XI, as of its match date.
+
+    lineups is the match_lineups table and snapshots the player_snapshots
+    table. Returns one row per (match_id, team) with xi_known (players with
+    any earlier match) and a float32 xi_{aggregate}_{feature} column per
+    numeric player feature and aggregate.
+    """
+    features = [col for col in snapshots.columns
+                if col not in SNAPSHOT_KEYS and pd.api.types.is_numeric_dtype(snapshots[col])]
+
+    unknown = sorted(set(aggregates) - set(AGGREGATORS))
+    if unknown:
+        raise ValueError(f"Unknown lineup aggregates: {', '.join(unknown)}")
+    columns = ['match_id', 'team', 'xi_known'] + [f"xi_{aggregate}_{feature}" for aggregate in aggregates for feature in features]
+    if lineups.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Slots of the same XI must be contiguous for reduceat
+    group = lineups.groupby(['match_id', 'team'], sort=False, observed=True).ngroup().to_numpy()
+    order = np.argsort(group, kind='stable')
+    group = group[order]
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    rows = snapshot_rows(snapshots, lineups['player_name'].iloc[order], lineups['date'].iloc[order])
+
+    # One feature at a time, so only a single column of slots is held at once
+    result = {'match_id': lineups['match_id'].to_numpy()[order[starts]],
+              'team': lineups['team'].iloc[order[starts]].to_numpy()}
+    any_present = np.zeros(len(rows), dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for feature in features:
+            values = _gather(snapshots, feature, rows)
+            present = ~np.isnan(values)
+            any_present |= present
+            for aggregate in aggregates:
+                # Reduced in float64 and rounded before narrowing, as write_table would store it
+                reduced = AGGREGATORS[aggregate](values, present, starts)
+                result[f"xi_{aggregate}_{feature}"] = reduced.astype(np.float64).round(2).astype(np.float32)
+    result['xi_known'] = np.add.reduceat(any_present, starts).astype(np.int32)
+    return pd.DataFrame({col: result[col] for col in columns})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the playing XI of every match into the match_lineups table")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes used to parse match files (default: 1)")
+    parser.add_argument('--output-dir', default=LINEUP_DIR, help="where the table is written (default: %(default)s)")
+    args = parser.parse_args()
+
+    build_lineups(workers=args.workers, output_dir=args.output_dir)
@@ -0,0 +1,268 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from innings_simulator import (BALLS_PER_OVER, MAX_OVERS, REPLACEMENT, OutcomeModel, load_outcome_profiles,
+                               simulate_innings)
+from match_loader import iter_matches, list_match_files, match_id_from_path
+
+# ----------------------
+#  live_engine.py
+# ----------------------
+# In-play win probability for matches in progress. Deliveries arrive one at a
+# time in Cricsheet shape; each match keeps only its innings state (runs,
+# wickets, legal balls, target), so an update is O(1): a few table lookups.
+#
+# The tables are computed once from innings_simulator with league-average
+# players, for every (balls left, wickets down):
+#   additional[b, w, a]  P(the batting side adds exactly a more runs)
+#   chase[b, w, r]       P(the chasing side wins needing r), ties counting half
+# The first-innings win probability combines the two: the batting side's
+# final total is drawn from `additional` and the reply from `chase` at the
+# start of the second innings. Probabilities ignore who is playing.
+
+TABLES_PATH = os.path.join('data', 'processed', 'simulator', 'live_tables.npz')
+
+MAX_BALLS = MAX_OVERS * BALLS_PER_OVER
+MAX_WICKETS = 10
+# Largest number of additional runs tracked; anything above is counted here
+MAX_RUNS = 300
+
+SIMS_PER_STATE = 2000
+# Simulations run per vectorized batch while building the tables
+BATCH_SIMS = 200000
+
+def build_live_tables(model=None, sims_per_state=SIMS_PER_STATE, seed=0):
+    """Simulate every (balls left, wickets) state with league-average players and return the lookup tables"""
+    if model is None:
+        model = OutcomeModel(load_outcome_profiles())
+    rng = np.random.default_rng(seed)
+    batters = [REPLACEMENT] * (MAX_WICKETS + 1)
+    plan = [REPLACEMENT] * MAX_OVERS
+
+    balls_left, wickets = np.meshgrid(np.arange(1, MAX_BALLS + 1), np.arange(MAX_WICKETS), indexing='ij')
+    states = np.column_stack([balls_left.ravel(), wickets.ravel()])
+    counts = np.zeros((MAX_BALLS + 1, MAX_WICKETS + 1, MAX_RUNS + 1))
+
+    per_batch = max(1, BATCH_SIMS // sims_per_state)
+    for start in range(0, len(states), per_batch):
+        batch = np.repeat(states[start:start + per_batch], sims_per_state, axis=0)
+        result = simulate_innings(model, batters, plan, len(batch), balls=MAX_BALLS - batch[:, 0], wickets=batch[:, 1], rng=rng)
+        np.add.at(counts, (batch[:, 0], batch[:, 1], np.minimum(result['runs'], MAX_RUNS)), 1)
+
+    # With no balls left or all out, nothing more is added
+    counts[0, :, 0] = 1
+    counts[:, MAX_WICKETS, 0] = 1
+    counts[0, :, 1:] = 0
+    counts[:, MAX_WICKETS, 1:] = 0
+    additional = counts / counts.sum(axis=-1, keepdims=True)
+
+    # chase[b, w, r] = P(adds >= r) + 0.5 * P(adds == r - 1); needing 0 or fewer is a win
+    at_least = np.cumsum(additional[..., ::-1], axis=-1)[..., ::-1]
+    chase = np.zeros((MAX_BALLS + 1, MAX_WICKETS + 1, MAX_RUNS + 2))
+    chase[..., :MAX_RUNS + 1] = at_least
+    chase[..., 1:] += 0.5 * additional
+    chase[..., 0] = 1
+    return {'additional': additional.astype(np.float32), 'chase': chase.astype(np.float32)}
+
+def save_live_tables(tables, path=TABLES_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, **tables)
+
+def load_live_tables(path=TABLES_PATH):
+    """Load the lookup tables, building and saving them first if they do not exist"""
+    if not os.path.exists(path):
+        save_live_tables(build_live_tables(), path)
+    with np.load(path) as tables:
+        return {name: tables[name] for name in tables.files}
+
+class LiveMatch:
+    """Innings state of one match in progress"""
+    __slots__ = ('teams', 'balls_per_innings', 'innings', 'batting_team', 'runs', 'wickets', 'balls', 'target')
+
+    def __init__(self, teams, overs=MAX_OVERS):
+        self.teams = list(teams)
+        self.balls_per_innings = min(int(overs * BALLS_PER_OVER), MAX_BALLS)
+        self.innings = 1
+        self.batting_team = self.teams[0]
+        self.runs = 0
+        self.wickets = 0
+        self.balls = 0
+        self.target = None
+
+    def start_second_innings(self, batting_team=None, target=None):
+        self.innings = 2
+        self.batting_team = batting_team or [team for team in self.teams if team != self.batting_team][0]
+        self.target = target if target is not None else self.runs + 1
+        self.runs = self.wickets = self.balls = 0
+
+    def add_delivery(self, delivery):
+        """Fold one Cricsheet delivery into the state"""
+        extras = delivery.get('extras', {})
+        self.runs += delivery.get('runs', {}).get('total', 0)
+        self.wickets = min(self.wickets + len(delivery.get('wickets', [])), MAX_WICKETS)
+        if 'wides' not in extras and 'noballs' not in extras:
+            self.balls += 1
+
+class LiveEngine:
+    """
+    Win probability and projected total for many concurrent matches, updated per delivery.
+
+    Matches are keyed by any hashable match ID. Call start_match() once, then
+    add_delivery() for every ball; innings 2 starts the first time a delivery
+    arrives with innings=2.
+    """
+
+    def __init__(self, tables=None):
+        if tables is None:
+            tables = load_live_tables()
+        self.additional = tables['additional']
+        self.chase = tables['chase']
+        self.runs_added = np.arange(self.additional.shape[-1])
+        self.matches = {}
+
+    def start_match(self, match_id, teams, overs=MAX_OVERS):
+        """Register a match; teams[0] bats first"""
+        self.matches[match_id] = LiveMatch(teams, overs)
+
+    def end_match(self, match_id):
+        self.matches.pop(match_id, None)
+
+    def add_delivery(self, match_id, delivery, innings=1, batting_team=None, target=None):
+        """
+        Add one delivery and return the updated state and predictions.
+
+        innings is 1 or 2 (super overs are ignored and return None).
+        batting_team and target are read when the second innings starts;
+        target overrides first-innings runs + 1 (e.g. after a rain revision).
+        """
+        match = self.matches[match_id]
+        if innings > 2:
+            return None
+        if innings == 2 and match.innings == 1:
+            match.start_second_innings(batting_team, target)
+        match.add_delivery(delivery)
+        return self.state(match_id)
+
+    def state(self, match_id):
+        """Current score, projected total and each team's win probability"""
+        match = self.matches[match_id]
+        balls_left = max(match.balls_per_innings - match.balls, 0)
+        additional = self.additional[balls_left, match.wickets]
+        bowling_team = [team for team in match.teams if team != match.batting_team][0]
+
+        if match.innings == 1:
+            # Batting side wins if the reply falls short of its final total
+            reply = self.chase[match.balls_per_innings, 0]
+            totals = np.minimum(match.runs + self.runs_added + 1, len(reply) - 1)
+            batting_win = float(additional @ (1 - reply[totals]))
+            projected = match.runs + float(additional @ self.runs_added)
+        else:
+            required = match.target - match.runs
+            if required <= 0:
+                batting_win = 1.0
+            else:
+                batting_win = float(self.chase[balls_left, match.wickets, min(required, self.chase.shape[-1] - 1)])
+            projected = match.runs + float(additional @ np.minimum(self.runs_added, max(required, 0)))
+
+        return {
+            'innings': match.innings,
+            'batting_team': match.batting_team,
+            'runs': match.runs,
+            'wickets': match.wickets,
+            'overs': f"{match.balls // BALLS_PER_OVER}.{match.balls % BALLS_PER_OVER}",
+            'projected_total': projected,
+            'win_probability': {match.batting_team: batting_win, bowling_team: 1 - batting_win}
+        }
+
+def match_deliveries(match_data):
+    """Yield (innings, batting_team, target, delivery) for the first two innings of a match"""
+    for innings_no, innings in enumerate(match_data.get('innings', [])[:2], start=1):
+        target = innings.get('target', {}).get('runs')
+        for over in innings.get('overs', []):
+            for delivery in over.get('deliveries', []):
+                yield innings_no, innings['team'], target, delivery
+
+def replay(engine, matches, concurrent=100, interval=0.0, trace=None):
+    """
+    Feed historical matches through the engine, `concurrent` at a time.
+
+    Every round adds the next delivery of each active match; interval is the
+    pause between rounds in seconds. Returns per-delivery latencies in
+    seconds and the Brier score of the win probabilities against the results.
+    """
+    latencies = []
+    squared_errors = []
+    pending = iter(matches)
+    active = {}
+
+    def fill():
+        while len(active) < concurrent:
+            match_id, match_data = next(pending, (None, None))
+            if match_id is None:
+                return
+            info = match_data['info']
+            if not match_data.get('innings'):
+                continue
+            first = match_data['innings'][0]['team']
+            teams = [first] + [team for team in info['teams'] if team != first]
+            engine.start_match(match_id, teams, info.get('overs', MAX_OVERS))
+            active[match_id] = (match_deliveries(match_data), info.get('outcome', {}).get('winner'))
+
+    fill()
+    while active:
+        for match_id in list(active):
+            deliveries, winner = active[match_id]
+            item = next(deliveries, None)
+            if item is None:
+                engine.end_match(match_id)
+                del active[match_id]
+                continue
+            innings, batting_team, target, delivery = item
+            start = time.perf_counter()
+            state = engine.add_delivery(match_id, delivery, innings, batting_team, target)
+            latencies.append(time.perf_counter() - start)
+
+            if winner is not None:
+                squared_errors.append((state['win_probability'][batting_team] - (batting_team == winner)) ** 2)
+            if trace is not None and match_id == trace:
+                probability = state['win_probability'][batting_team]
+                print(f"{innings} {state['overs']:>5} {batting_team:<28} {state['runs']:>3}/{state['wickets']:<2} "
+                      f"projected {state['projected_total']:6.1f}  win {probability:.3f}")
+        fill()
+        if interval:
+            time.sleep(interval)
+
+    brier = float(np.mean(squared_errors)) if squared_errors else None
+    return np.array(latencies), brier
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay historical matches ball by ball through the live win-probability engine")
+    parser.add_argument('matches', nargs='*', help="match IDs to replay (default: every file in ipl_data/)")
+    parser.add_argument('--concurrent', type=int, default=100, help="matches in progress at once (default: %(default)s)")
+    parser.add_argument('--interval', type=float, default=0.0, help="seconds between deliveries of a match (default: as fast as possible)")
+    parser.add_argument('--trace', help="print every ball of this match ID")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the lookup tables from the outcome profiles")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        save_live_tables(build_live_tables())
+    engine = LiveEngine()
+
+    match_files = list_match_files()
+    if args.matches:
+        wanted = set(args.matches)
+        match_files = [f for f in match_files if match_id_from_path(f) in wanted]
+
+    start = time.perf_counter()
+    latencies, brier = replay(engine, iter_matches(match_files=match_files), args.concurrent, args.interval, args.trace)
+    elapsed = time.perf_counter() - start
+
+    if len(latencies):
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        print(f"{len(latencies)} deliveries in {elapsed:.2f}s ({len(latencies) / elapsed:,.0f}/s incl. parsing); "
+              f"update latency p50 {p50:.3f} ms, p99 {p99:.3f} ms, max {latencies.max() * 1000:.3f} ms")
+    if brier is not None:
+        print(f"Brier score of per-ball win probabilities: {brier:.4f}")
@@ -0,0 +1,210 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import instrument
+
+# Optional faster JSON backends: orjson for whole-document parsing, ijson
+# (C yajl2 backend when installed) for streaming one over at a time
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Directory holding Cricsheet's JSON match files
+DATA_DIR = 'ipl_data'
+
+# Errors that mean a match file could not be read or parsed
+LOAD_ERRORS = (OSError, ValueError) + ((ijson.JSONError,) if ijson is not None else ())
+
+def list_match_files(data_dir=DATA_DIR):
+    """Return the paths of all match JSON files, sorted by file name"""
+    if not os.path.isdir(data_dir):
+        return []
+    return [os.path.join(data_dir, f) for f in sorted(os.listdir(data_dir)) if f.endswith('.json')]
+
+def match_id_from_path(file_path):
+    """Match ID is the JSON file name without its extension"""
+    return os.path.basename(file_path).split('.')[0]
+
+def load_match(file_path):
+    """Parse a single match file and return (match_id, match_data)"""
+    if orjson is not None:
+        with open(file_path, 'rb') as f:
+            match_data = orjson.loads(f.read())
+    else:
+        with open(file_path, 'r') as f:
+            match_data = json.load(f)
+    return match_id_from_path(file_path), match_data
+
+def _build_object(parser, event, value):
+    """Assemble the JSON value starting at (event, value) from the rest of an ijson event stream"""
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    for _, event, value in parser:
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                break
+    return builder.value
+
+def _stream_events(f):
+    parser = ijson.parse(f, use_float=True)
+    for prefix, event, value in parser:
+        if prefix == 'info' and event == 'start_map':
+            yield 'info', _build_object(parser, event, value)
+        elif prefix == 'innings.item':
+            if event == 'start_map':
+                yield 'innings_start', None
+            elif event == 'end_map':
+                yield 'innings_end', None
+        elif prefix == 'innings.item.team':
+            yield 'team', value
+        elif prefix == 'innings.item.overs' and event == 'start_array':
+            yield 'overs', None
+        elif prefix == 'innings.item.overs.item' and event == 'start_map':
+            yield 'over', _build_object(parser, event, value)
+
+def _document_events(match_data):
+    yield 'info', match_data.get('info', {})
+    for innings in match_data.get('innings', []):
+        yield 'innings_start', None
+        if 'team' in innings:
+            yield 'team', innings['team']
+        if 'overs' in innings:
+            yield 'overs', None
+            for over in innings['overs']:
+                yield 'over', over
+        yield 'innings_end', None
+
+def iter_match_events(file_path):
+    """
+    Walk a match file as a flat stream of (kind, value) events without building the whole document.
+
+    Events are ('info', info_dict), then per innings ('innings_start', None),
+    ('team', name), ('overs', None) if the innings has an overs list, one
+    ('over', over_dict) per over and ('innings_end', None). Only one over is
+    held in memory at a time, so memory stays flat however long the match is.
+    Without ijson installed the file is parsed whole and the same events are
+    produced from the document.
+    """
+    if ijson is None:
+        yield from _document_events(load_match(file_path)[1])
+        return
+
+    with open(file_path, 'rb') as f:
+        yield from _stream_events(f)
+
+def iter_matches(data_dir=DATA_DIR, match_files=None):
+    """
+    Yield (match_id, match_data) for every match file, parsing each file exactly once.
+
+    Files that fail to parse are reported and skipped so one corrupt download
+    does not abort a full rebuild.
+    """
+    if match_files is None:
+        match_files = list_match_files(data_dir)
+
+    for file_path in match_files:
+        try:
+            match_id, match_data = load_match(file_path)
+        except LOAD_ERRORS as e:
+            print(f"Error loading {file_path}: {e}")
+            continue
+        _count_file(file_path, match_data)
+        yield match_id, match_data
+
+def map_match_files(extract_file, match_files=None, workers=1, data_dir=DATA_DIR):
+    """
+    Yield (match_id, extract_file(file_path)) for every match file, in file order.
+
+    Like map_matches, but the extractor reads the file itself (e.g. by streaming
+    it with iter_match_events). Files it fails to read are reported and skipped.
+    """
+    if match_files is None:
+        match_files = list_match_files(data_dir)
+
+    if workers <= 1:
+        for file_path in match_files:
+            result = _extract_file(extract_file, file_path)
+            if result is not None:
+                yield result
+        return
+
+    yield from _map_pool(partial(_extract_file, extract_file), match_files, workers)
+
+def _count_file(file_path, match_data=None):
+    """Record a parsed match file, and its deliveries when the parsed match is given (see instrument.py)"""
+    if not instrument.ENABLED:
+        return
+    instrument.count('files_parsed')
+    instrument.count('bytes_parsed', os.path.getsize(file_path))
+    if match_data is not None:
+        instrument.count('deliveries', sum(len(over.get('deliveries', ())) for innings in match_data.get('innings', ())
+                                           for over in innings.get('overs', ())))
+
+def _extract_file(extract_file, file_path):
+    """Worker task: run a file-level extractor on one match file"""
+    try:
+        result = match_id_from_path(file_path), extract_file(file_path)
+    except LOAD_ERRORS as e:
+        print(f"Error loading {file_path}: {e}")
+        return None
+    _count_file(file_path)
+    return result
+
+def _load_and_extract(extract, file_path):
+    """Worker task: parse one match file and run an extractor on it"""
+    try:
+        match_id, match_data = load_match(file_path)
+    except LOAD_ERRORS as e:
+        print(f"Error loading {file_path}: {e}")
+        return None
+    _count_file(file_path, match_data)
+    return match_id, extract(match_id, match_data)
+
+def _pooled(task, file_path):
+    """Pool task: run task on one file and return its result with the counts it made"""
+    with instrument.collect() as counts:
+        result = task(file_path)
+    return result, counts
+
+def _map_pool(task, match_files, workers):
+    """Yield task(file_path) for every file from a process pool, in file order, skipping None results"""
+    # Large enough chunks to amortise inter-process overhead, small enough to balance load
+    chunksize = max(1, min(64, len(match_files) // (workers * 8)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result, counts in executor.map(partial(_pooled, task), match_files, chunksize=chunksize):
+            instrument.merge_counts(counts)
+            if result is not None:
+                yield result
+
+def map_matches(extract, match_files=None, workers=1, data_dir=DATA_DIR):
+    """
+    Yield (match_id, extract(match_id, match_data)) for every match file, in file order.
+
+    With workers > 1, files are parsed and extracted in a process pool. Results
+    still come back in file order, so merging them gives exactly the same output
+    as a serial run. extract must be a module-level function so it can be pickled.
+    """
+    if match_files is None:
+        match_files = list_match_files(data_dir)
+
+    if workers <= 1:
+        for file_path in match_files:
+            result = _load_and_extract(extract, file_path)
+            if result is not None:
+                yield result
+        return
+
+    yield from _map_pool(partial(_load_and_extract, extract), match_files, workers)
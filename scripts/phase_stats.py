@@ -0,0 +1,212 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from deliveries_store import STORE_DIR, load_delivery_store
+from instrument import stage
+from table_io import write_table
+from teams import is_excluded_match, team_code
+
+# ----------------------
+#  phase_stats.py
+# ----------------------
+# Phase-wise (powerplay / middle / death) batting and bowling aggregates for
+# teams and players. Deliveries come from the columnar ball-by-ball store
+# (deliveries_store.py), so no match file is parsed here. Each is tagged with
+# its phase in one vectorized lookup on the over number, and every aggregate
+# comes from a grouped sum over (team or player, phase), so adding phases or
+# metrics does not add passes over the data.
+#
+# Output is one row per team and per player, with `{phase}_{metric}` columns.
+
+OUTPUT_DIR = os.path.join('data', 'processed', 'phases')
+TEAM_PHASE_TABLE = 'team_phase_stats'
+PLAYER_PHASE_TABLE = 'player_phase_stats'
+
+# Phase name -> (first over, last over + 1), 0-based overs
+PHASES = {'powerplay': (0, 6), 'middle': (6, 15), 'death': (15, 20)}
+
+DELIVERY_COLUMNS = ['innings_key', 'over', 'batting_team', 'bowling_team', 'batter', 'bowler',
+                    'runs_batter', 'runs_total', 'wicket', 'bowler_wicket']
+
+def parse_phases(spec):
+    """Phases from 'name:start-end,...' (0-based overs, end exclusive), e.g. 'powerplay:0-6,death:15-20'"""
+    phases = {}
+    for part in spec.split(','):
+        name, _, overs = part.partition(':')
+        start, _, end = overs.partition('-')
+        phases[name.strip()] = (int(start), int(end))
+    return phases
+
+def phase_index(overs, phases=PHASES):
+    """Position in `phases` of every over, or -1 for overs outside every phase"""
+    bounds = sorted((start, end, i) for i, (start, end) in enumerate(phases.values()))
+    starts = np.array([start for start, _, _ in bounds])
+    ends = np.array([end for _, end, _ in bounds])
+    order = np.array([i for _, _, i in bounds])
+    if np.any(starts[1:] < ends[:-1]):
+        raise ValueError("Phases must not overlap")
+
+    slot = np.searchsorted(starts, overs, side='right') - 1
+    inside = (slot >= 0) & (overs < ends[np.maximum(slot, 0)])
+    return np.where(inside, order[np.maximum(slot, 0)], -1)
+
+def load_deliveries(store_dir=STORE_DIR):
+    """
+    Every delivery of the first two innings of each match, from the delivery store (see DELIVERY_COLUMNS).
+
+    Teams are given by franchise code, and matches involving a defunct
+    franchise are left out. Rows stay in match file order.
+    """
+    store = load_delivery_store(store_dir)
+    matches, innings, deliveries = store['matches'], store['innings'], store['deliveries']
+
+    excluded = np.array([is_excluded_match([str(m.team1), str(m.team2)]) for m in matches.itertuples(index=False)], dtype=bool)
+    keep = (deliveries['innings'].to_numpy() <= 2) & ~deliveries['match_id'].isin(matches['match_id'][excluded]).to_numpy()
+    deliveries = deliveries[keep]
+
+    # Innings teams as franchise codes, attached to every delivery of the innings
+    innings = innings.assign(innings_key=np.arange(len(innings)),
+                             batting_team=innings['batting_team'].astype(str).map(team_code),
+                             bowling_team=innings['bowling_team'].astype(str).map(team_code))
+    teams = deliveries[['match_id', 'innings']].merge(innings, on=['match_id', 'innings'], how='left')
+
+    columns = {
+        'innings_key': teams['innings_key'].to_numpy(),
+        'over': deliveries['over'].to_numpy(),
+        'batting_team': pd.Categorical(teams['batting_team']),
+        'bowling_team': pd.Categorical(teams['bowling_team']),
+        # Only the players who appear here, in name order
+        'batter': deliveries['batter'].cat.remove_unused_categories(),
+        'bowler': deliveries['bowler'].cat.remove_unused_categories(),
+        'runs_batter': deliveries['runs_batter'].to_numpy(),
+        'runs_total': deliveries['runs_total'].to_numpy(),
+        'wicket': deliveries['wickets'].to_numpy().astype(np.int16),
+        'bowler_wicket': deliveries['bowler_wickets'].to_numpy().astype(np.int16)
+    }
+    for name in ('batter', 'bowler'):
+        columns[name] = columns[name].cat.set_categories(sorted(columns[name].cat.categories)).array
+    return pd.DataFrame(columns)[DELIVERY_COLUMNS]
+
+def _grouped(deliveries, key, metrics, phases):
+    """
+    Sum metrics over (key, phase) and spread them into one row per key.
+
+    metrics maps an output name to a per-delivery column. Also counts balls
+    and the innings in which the key appeared in each phase.
+    """
+    frame = pd.DataFrame({name: values for name, values in metrics.items()})
+    frame[key] = deliveries[key].to_numpy()
+    frame['phase'] = deliveries['phase'].to_numpy()
+    frame['balls'] = 1
+    grouped = frame.groupby([key, 'phase'], observed=True)
+    sums = grouped.sum()
+    sums['innings'] = deliveries.groupby([key, 'phase'], observed=True)['innings_key'].nunique()
+
+    wide = sums.unstack('phase', fill_value=0)
+    names = list(phases)
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([sums.columns, range(len(names))]), fill_value=0)
+    wide.columns = [f"{names[phase]}_{metric}" for metric, phase in wide.columns]
+    return wide
+
+def _rate(numerator, denominator, scale=1):
+    """numerator / denominator * scale, 0 where the denominator is 0"""
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.where(denominator > 0, np.asarray(numerator) * scale / np.where(denominator > 0, denominator, 1), 0).round(2)
+
+def team_phase_stats(deliveries, phases=PHASES):
+    """Per-team, per-phase batting and bowling aggregates (one row per team code)"""
+    runs_total = deliveries['runs_total'].to_numpy()
+    runs_batter = deliveries['runs_batter'].to_numpy()
+    batting = _grouped(deliveries, 'batting_team', {
+        'runs': runs_total, 'wickets_lost': deliveries['wicket'].to_numpy(),
+        'dots': runs_total == 0, 'fours': runs_batter == 4, 'sixes': runs_batter == 6
+    }, phases)
+    bowling = _grouped(deliveries, 'bowling_team', {
+        'runs_conceded': runs_total, 'wickets_taken': deliveries['wicket'].to_numpy(), 'dots_bowled': runs_total == 0
+    }, phases)
+
+    teams = batting.index.union(bowling.index)
+    batting = batting.reindex(teams, fill_value=0)
+    bowling = bowling.reindex(teams, fill_value=0)
+
+    rows = []
+    for phase in phases:
+        rows.append(pd.DataFrame({
+            f"{phase}_runs_per_innings": _rate(batting[f"{phase}_runs"], batting[f"{phase}_innings"]),
+            f"{phase}_run_rate": _rate(batting[f"{phase}_runs"], batting[f"{phase}_balls"], 6),
+            f"{phase}_wickets_lost_per_innings": _rate(batting[f"{phase}_wickets_lost"], batting[f"{phase}_innings"]),
+            f"{phase}_dot_ball_pct": _rate(batting[f"{phase}_dots"], batting[f"{phase}_balls"], 100),
+            f"{phase}_boundary_pct": _rate(batting[f"{phase}_fours"] + batting[f"{phase}_sixes"], batting[f"{phase}_balls"], 100),
+            f"{phase}_economy": _rate(bowling[f"{phase}_runs_conceded"], bowling[f"{phase}_balls"], 6),
+            f"{phase}_wickets_taken_per_innings": _rate(bowling[f"{phase}_wickets_taken"], bowling[f"{phase}_innings"]),
+            f"{phase}_dot_balls_bowled_pct": _rate(bowling[f"{phase}_dots_bowled"], bowling[f"{phase}_balls"], 100)
+        }, index=teams))
+
+    stats = pd.concat(rows, axis=1)
+    stats.index = stats.index.astype(str)
+    return stats.rename_axis('team_name').reset_index()
+
+def player_phase_stats(deliveries, phases=PHASES):
+    """Per-player, per-phase batting and bowling aggregates (one row per player)"""
+    runs_total = deliveries['runs_total'].to_numpy()
+    runs_batter = deliveries['runs_batter'].to_numpy()
+    batting = _grouped(deliveries, 'batter', {
+        'runs': runs_batter, 'dots': runs_batter == 0, 'fours': runs_batter == 4, 'sixes': runs_batter == 6
+    }, phases)
+    bowling = _grouped(deliveries, 'bowler', {
+        'runs_conceded': runs_total, 'wickets': deliveries['bowler_wicket'].to_numpy(), 'dots_bowled': runs_total == 0
+    }, phases)
+
+    players = batting.index.union(bowling.index)
+    batting = batting.reindex(players, fill_value=0)
+    bowling = bowling.reindex(players, fill_value=0)
+
+    rows = []
+    for phase in phases:
+        rows.append(pd.DataFrame({
+            f"{phase}_runs": batting[f"{phase}_runs"],
+            f"{phase}_balls_faced": batting[f"{phase}_balls"],
+            f"{phase}_strike_rate": _rate(batting[f"{phase}_runs"], batting[f"{phase}_balls"], 100),
+            f"{phase}_dot_ball_pct": _rate(batting[f"{phase}_dots"], batting[f"{phase}_balls"], 100),
+            f"{phase}_fours": batting[f"{phase}_fours"],
+            f"{phase}_sixes": batting[f"{phase}_sixes"],
+            f"{phase}_balls_bowled": bowling[f"{phase}_balls"],
+            f"{phase}_economy": _rate(bowling[f"{phase}_runs_conceded"], bowling[f"{phase}_balls"], 6),
+            f"{phase}_wickets": bowling[f"{phase}_wickets"],
+            f"{phase}_dot_balls_bowled_pct": _rate(bowling[f"{phase}_dots_bowled"], bowling[f"{phase}_balls"], 100)
+        }, index=players))
+
+    stats = pd.concat(rows, axis=1)
+    stats.index = stats.index.astype(str)
+    return stats.rename_axis('player_name').reset_index()
+
+@stage('build_phase_stats')
+def build_phase_stats(store_dir=STORE_DIR, phases=PHASES, output_dir=OUTPUT_DIR):
+    """Write the team and player phase tables from the delivery store"""
+    if not os.path.exists(os.path.join(store_dir, 'strings.json')):
+        print(f"No delivery store found in {store_dir}. Please run deliveries_store.py first.")
+        return
+
+    deliveries = load_deliveries(store_dir)
+    print(f"Processing {len(deliveries)} deliveries...")
+    deliveries['phase'] = phase_index(deliveries['over'].to_numpy(), phases)
+    deliveries = deliveries[deliveries['phase'] >= 0]
+
+    teams = team_phase_stats(deliveries, phases)
+    players = player_phase_stats(deliveries, phases)
+    write_table(teams, os.path.join(output_dir, TEAM_PHASE_TABLE))
+    write_table(players, os.path.join(output_dir, PLAYER_PHASE_TABLE))
+    print(f"Saved phase stats for {len(teams)} teams and {len(players)} players to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-phase (powerplay/middle/death) team and player aggregates")
+    parser.add_argument('--phases', default=','.join(f"{name}:{start}-{end}" for name, (start, end) in PHASES.items()),
+                        help="phase boundaries as name:first_over-end_over, 0-based, end exclusive (default: %(default)s)")
+    parser.add_argument('--store-dir', default=STORE_DIR, help="delivery store to read (default: %(default)s)")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help="where the tables are written (default: %(default)s)")
+    args = parser.parse_args()
+
+    build_phase_stats(store_dir=args.store_dir, phases=parse_phases(args.phases), output_dir=args.output_dir)
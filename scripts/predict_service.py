@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from table_io import read_table, table_exists
+from teams import team_code
+from venues import REGISTRY as VENUES
+from weather_features import DERIVED_FEATURES, SNAPSHOT_OFFSETS, WEATHER_FEATURES, snapshot_label
+
+# ----------------------
+#  predict_service.py
+# ----------------------
+# Scores upcoming fixtures with the model trained by
+# notebooks/prediction_model.py. The model and the latest features are loaded
+# once: every team's current feature vector, and a weather climatology per
+# venue (resolved through venues.py) and day/night, the mean of its past
+# match_weather rows, used when no forecast is given. A fixture is then
+# assembled by indexing into those arrays in the model's column order, so
+# single predictions need no pandas and fixture lists are scored as one
+# matrix.
+#
+# Available as a function (PredictionService), a JSON-over-HTTP server and a
+# CLI for single fixtures and fixture CSVs.
+
+MODEL_PATH = os.path.join('data', 'processed', 'model', 'match_winner.json')
+FEATURE_PATH = os.path.join('data', 'processed', 'match_feature_set')
+MATCH_WEATHER_PATH = os.path.join('data', 'processed', 'match_weather')
+TEAM_SNAPSHOTS_PATH = os.path.join('data', 'processed', 'snapshots', 'team_snapshots')
+TEAMS_PATH = os.path.join('data', 'raw', 'teams', 'team_performance')
+
+# Features built from pairs of model columns, shared with the training script:
+# name -> (left column, right column, operation)
+ENGINEERED_FEATURES = {
+    'momentum_diff': ('team1_momentum_score', 'team2_momentum_score', np.subtract),
+    'batting_vs_bowling': ('team1_avg_batting_score_last_7', 'team2_bowling_economy_death_last_7', np.subtract)
+}
+
+def is_night_fixture(day_night):
+    """True for a night fixture; day_night is 'Day'/'Night' or a bool"""
+    if isinstance(day_night, str):
+        return day_night.strip().lower() == 'night'
+    return bool(day_night)
+
+def latest_team_features(snapshots_path=TEAM_SNAPSHOTS_PATH, teams_path=TEAMS_PATH):
+    """Every team's current features, indexed by team code: the final snapshot rows, else team_performance"""
+    if table_exists(snapshots_path):
+        snapshots = read_table(snapshots_path)
+        latest = snapshots[snapshots['match_id'].isna()].drop(columns=['date', 'match_id'])
+    else:
+        latest = read_table(teams_path)
+    latest = latest.assign(team_name=latest['team_name'].astype(str))
+    return latest.set_index('team_name')
+
+def _positions(pairs):
+    """Split (model position, source index) pairs into two index arrays"""
+    positions = np.array([pos for pos, _ in pairs], dtype=np.intp)
+    sources = np.array([src for _, src in pairs], dtype=np.intp)
+    return positions, sources
+
+class PredictionService:
+    """
+    In-memory match-winner model with precomputed feature arrays.
+
+    predict() scores one fixture, predict_batch() a list of fixtures or a
+    DataFrame with columns team1, team2 and optionally venue, day_night and
+    weather. Probabilities are for team1 winning. A forecast is a dict keyed
+    by weather column ('humidity_t90') or base feature ('humidity'), whose
+    value is one number for every snapshot or a list with one per snapshot;
+    features it leaves out come from the venue climatology.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, team_features=None, weather=None, matches=None):
+        self.booster = xgb.Booster()
+        self.booster.load_model(model_path)
+        self.columns = list(self.booster.feature_names)
+        position = {name: i for i, name in enumerate(self.columns)}
+
+        if team_features is None:
+            team_features = latest_team_features()
+        if weather is None:
+            weather = read_table(MATCH_WEATHER_PATH)
+        if matches is None:
+            matches = read_table(FEATURE_PATH, columns=['match_id', 'match_venue', 'is_night_match'])
+
+        # Team features: one row per team, one column per team feature the model uses
+        team_columns = {name: name[len('team1_'):] for name in self.columns
+                        if name.startswith(('team1_', 'team2_')) and name not in ENGINEERED_FEATURES}
+        missing = sorted(set(team_columns.values()) - set(team_features.columns))
+        if missing:
+            raise ValueError(f"Team features missing for model columns: {', '.join(missing)}")
+        self.team_features = sorted(set(team_columns.values()))
+        self.team_index = {team: i for i, team in enumerate(team_features.index)}
+        self.team_matrix = team_features[self.team_features].to_numpy(dtype=np.float64)
+        feature_index = {name: i for i, name in enumerate(self.team_features)}
+        self.team1_pos, self.team1_src = _positions([(position[name], feature_index[feature])
+                                                     for name, feature in team_columns.items() if name.startswith('team1_')])
+        self.team2_pos, self.team2_src = _positions([(position[name], feature_index[feature])
+                                                     for name, feature in team_columns.items() if name.startswith('team2_')])
+
+        self.engineered = [(position[name], position[left], position[right], operation)
+                           for name, (left, right, operation) in ENGINEERED_FEATURES.items() if name in position]
+
+        # Weather: everything else, with climatology vectors per (venue, night) and per night flag
+        self.weather_columns = [name for name in self.columns if name not in team_columns and name not in ENGINEERED_FEATURES]
+        unknown = sorted(set(self.weather_columns) - set(weather.columns))
+        if unknown:
+            raise ValueError(f"Model columns not found in the feature tables: {', '.join(unknown)}")
+        self.weather_pos = np.array([position[name] for name in self.weather_columns], dtype=np.intp)
+        self.weather_index = {name: i for i, name in enumerate(self.weather_columns)}
+
+        history = weather.merge(matches, on='match_id', how='inner')
+        history['night'] = history['is_night_match'].astype(str).eq('Night')
+        values = history[self.weather_columns].astype(np.float64)
+        # Gaps in a venue's history fall back to all venues, then to all matches
+        defaults = {night: values[history['night'] == night].mean().fillna(values.mean()) for night in (False, True)}
+        # Keyed by venue ID, so every spelling of a ground shares one climatology
+        venue_ids = history['match_venue'].astype(object).map(VENUES.venue_id, na_action='ignore')
+        groups = values.groupby([venue_ids, history['night']]).mean()
+        self.climate = {(int(venue), bool(night)): self._climate_vector(means.fillna(defaults[bool(night)]), night)
+                        for (venue, night), means in groups.iterrows()}
+        self.default_climate = {night: self._climate_vector(means, night) for night, means in defaults.items()}
+
+    def _climate_vector(self, means, night):
+        """Read-only weather vector from mean feature values, with is_night set"""
+        vector = means.to_numpy(dtype=np.float64, copy=True)
+        if 'is_night' in self.weather_index:
+            vector[self.weather_index['is_night']] = int(night)
+        vector.flags.writeable = False
+        return vector
+
+    def team_row(self, team):
+        """Row of the team matrix for a team given by name or code"""
+        code = team_code(team)
+        if code not in self.team_index:
+            raise ValueError(f"Unknown team: {team}")
+        return self.team_index[code]
+
+    def weather_vector(self, venue=None, day_night='Night', forecast=None):
+        """Weather feature values in model order: the venue climatology, overridden by any forecast"""
+        # Missing or malformed cells fall back to the defaults
+        if not isinstance(venue, str):
+            venue = None
+        if not isinstance(day_night, (str, bool)):
+            day_night = 'Night'
+        night = is_night_fixture(day_night)
+        climate = self.climate.get((VENUES.find(venue), night), self.default_climate[night])
+        if not forecast:
+            return climate
+
+        vector = climate.copy()
+        for name, value in forecast.items():
+            if name in self.weather_index:
+                vector[self.weather_index[name]] = value
+            elif name in WEATHER_FEATURES:
+                values = value if isinstance(value, (list, tuple)) else [value] * len(SNAPSHOT_OFFSETS)
+                for offset, v in zip(SNAPSHOT_OFFSETS, values):
+                    column = f"{name}_{snapshot_label(offset)}"
+                    if column in self.weather_index:
+                        vector[self.weather_index[column]] = v
+            else:
+                raise ValueError(f"Unknown weather feature: {name}")
+
+        for name, (left, right, operation) in DERIVED_FEATURES.items():
+            for offset in SNAPSHOT_OFFSETS:
+                label = snapshot_label(offset)
+                columns = (f"{name}_{label}", f"{left}_{label}", f"{right}_{label}")
+                if all(column in self.weather_index for column in columns):
+                    target, l, r = (self.weather_index[column] for column in columns)
+                    vector[target] = operation(vector[l], vector[r])
+        return vector
+
+    def features(self, team1, team2, venue=None, day_night='Night', weather=None):
+        """Model input row (1 x n_features) for one fixture"""
+        x = np.empty((1, len(self.columns)))
+        x[0, self.team1_pos] = self.team_matrix[self.team_row(team1), self.team1_src]
+        x[0, self.team2_pos] = self.team_matrix[self.team_row(team2), self.team2_src]
+        x[0, self.weather_pos] = self.weather_vector(venue, day_night, weather)
+        for pos, left, right, operation in self.engineered:
+            x[0, pos] = operation(x[0, left], x[0, right])
+        return x
+
+    def predict(self, team1, team2, venue=None, day_night='Night', weather=None):
+        """Probability that team1 beats team2"""
+        return float(self.booster.inplace_predict(self.features(team1, team2, venue, day_night, weather))[0])
+
+    def feature_matrix(self, fixtures):
+        """Model input matrix for a list of fixture dicts or a DataFrame of fixtures"""
+        if isinstance(fixtures, pd.DataFrame):
+            fixtures = fixture_records(fixtures)
+        X = np.empty((len(fixtures), len(self.columns)))
+        team1 = np.array([self.team_row(f['team1']) for f in fixtures], dtype=np.intp)
+        team2 = np.array([self.team_row(f['team2']) for f in fixtures], dtype=np.intp)
+        X[:, self.team1_pos] = self.team_matrix[team1[:, None], self.team1_src]
+        X[:, self.team2_pos] = self.team_matrix[team2[:, None], self.team2_src]
+        if fixtures:
+            X[:, self.weather_pos] = np.vstack([
+                self.weather_vector(f.get('venue'), f.get('day_night', 'Night'), f.get('weather')) for f in fixtures
+            ])
+        for pos, left, right, operation in self.engineered:
+            X[:, pos] = operation(X[:, left], X[:, right])
+        return X
+
+    def predict_batch(self, fixtures):
+        """team1 win probabilities for many fixtures, scored as one matrix"""
+        X = self.feature_matrix(fixtures)
+        return self.booster.inplace_predict(X) if len(X) else np.array([])
+
+def fixture_records(fixtures):
+    """Fixture dicts from a fixture table, with blank cells as None"""
+    return fixtures.astype(object).where(fixtures.notna(), None).to_dict('records')
+
+def _forecasts_from_columns(fixtures):
+    """Per-fixture forecast dicts from any weather columns of a fixture table (blank cells are skipped)"""
+    weather_columns = [c for c in fixtures.columns if c in WEATHER_FEATURES or c.rsplit('_t', 1)[0] in WEATHER_FEATURES]
+    if not weather_columns:
+        return None
+    return [{c: v for c, v in row.items() if pd.notna(v)} or None for row in fixtures[weather_columns].to_dict('records')]
+
+def make_handler(service):
+    """HTTP handler class answering POST /predict, POST /predict/batch and GET /health with JSON"""
+
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._reply(200, {'status': 'ok', 'teams': sorted(service.team_index)})
+            else:
+                self._reply(404, {'error': f"Unknown path: {self.path}"})
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if self.path == '/predict':
+                    probability = service.predict(request['team1'], request['team2'], request.get('venue'),
+                                                  request.get('day_night', 'Night'), request.get('weather'))
+                    self._reply(200, {'team1_win_probability': probability})
+                elif self.path == '/predict/batch':
+                    probabilities = service.predict_batch(request['fixtures'])
+                    self._reply(200, {'team1_win_probability': [float(p) for p in probabilities]})
+                else:
+                    self._reply(404, {'error': f"Unknown path: {self.path}"})
+            except (KeyError, ValueError, TypeError) as e:
+                self._reply(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return PredictionHandler
+
+def serve(service, host='127.0.0.1', port=8000):
+    """Answer prediction requests over HTTP until interrupted"""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving predictions on http://{host}:{port} (POST /predict, POST /predict/batch, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score fixtures with the trained match-winner model")
+    parser.add_argument('--model', default=MODEL_PATH, help="trained model written by prediction_model.py (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="run the JSON prediction server")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+
+    predict_parser = commands.add_parser('predict', help="score one fixture")
+    predict_parser.add_argument('team1')
+    predict_parser.add_argument('team2')
+    predict_parser.add_argument('--venue')
+    predict_parser.add_argument('--day-night', default='Night', choices=['Day', 'Night'])
+    predict_parser.add_argument('--weather', help="forecast as JSON, e.g. '{\"humidity\": 80, \"dew_point\": 22}'")
+
+    batch_parser = commands.add_parser('batch', help="score a fixture CSV (team1, team2[, venue, day_night, weather columns])")
+    batch_parser.add_argument('fixtures')
+    batch_parser.add_argument('--output', help="CSV to write with a team1_win_probability column (default: print)")
+    args = parser.parse_args()
+
+    service = PredictionService(args.model)
+    if args.command == 'serve':
+        serve(service, args.host, args.port)
+    elif args.command == 'predict':
+        weather = json.loads(args.weather) if args.weather else None
+        probability = service.predict(args.team1, args.team2, args.venue, args.day_night, weather)
+        print(f"{args.team1} win probability vs {args.team2}: {probability:.3f}")
+    else:
+        fixtures = pd.read_csv(args.fixtures)
+        forecasts = _forecasts_from_columns(fixtures)
+        records = fixture_records(fixtures)
+        if forecasts is not None:
+            for record, forecast in zip(records, forecasts):
+                record['weather'] = forecast
+        fixtures['team1_win_probability'] = service.predict_batch(records)
+        if args.output:
+            fixtures.to_csv(args.output, index=False)
+            print(f"Scored {len(fixtures)} fixtures to {args.output}")
+        else:
+            print(fixtures.to_string(index=False))
@@ -1,89 +1,363 @@
-import pandas as pd
+import argparse
+import json
 import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from instrument import count, stage
+from lineups import LINEUP_DIR, LINEUP_TABLE, lineup_features, snapshot_columns
+from table_io import read_table, table_columns, table_exists, write_table
+from teams import REGISTRY as TEAMS
+from weather_features import WEATHER_FEATURES, build_weather_features, weather_feature_matrix
 
 # ----------------------
 #  process_pipeline.py
 # ----------------------
-# Combines match metadata, team performance, player performance (future),
-# and weather data into a unified match-level feature set for ML modeling.
+# Combines match metadata, team performance and lineup-level player features
+# into a match-level feature set for ML modeling, one row per match. Weather
+# is written as a separate per-match table (match_weather) and joined on
+# match_id at model-build time, so neither table grows with the number of
+# hourly weather snapshots. Tables are read and written through table_io
+# (typed Parquet by default, CSV on request).
+#
+# With --partition-by season (calendar year) or match_id (ranges of
+# --partition-size IDs), matches are processed one partition at a time and
+# each partition is written to its own directory, e.g.
+# data/processed/partitions/season=2019/match_feature_set.parquet, so memory
+# is bounded by the largest partition rather than the whole history. Every
+# input is read with a range filter on the partition's column. The weather
+# CSV is streamed once in chunks and split into one file per partition. The
+# player snapshots are swept once from the latest partition back, keeping
+# only each player's next row after the current partition. So every input
+# row is read about once and run time grows linearly with the data.
+# --partitions rebuilds only the given partitions and leaves the rest as
+# they are; a manifest records what each partition holds.
 
-# 1. Define file paths
+# 1. Define table paths (without extension, see table_io.py)
 RAW_DIR = os.path.join('data', 'raw')
-MATCH_PATH = os.path.join(RAW_DIR, 'matches', 'match_metadata.csv')
-TEAMS_PATH = os.path.join(RAW_DIR, 'teams', 'team_performance.csv')
-# Placeholder for player data integration
-# PLAYERS_PATH = os.path.join(RAW_DIR, 'players', 'players_performance.csv')
+MATCH_PATH = os.path.join(RAW_DIR, 'matches', 'match_metadata')
+TEAMS_PATH = os.path.join(RAW_DIR, 'teams', 'team_performance')
 WEATHER_PATH = os.path.join(RAW_DIR, 'weather', 'weather_by_match.csv')
+# Point-in-time team features written by feature_snapshots.py
+TEAM_SNAPSHOTS_PATH = os.path.join('data', 'processed', 'snapshots', 'team_snapshots')
+# Point-in-time player features, aggregated over each playing XI (see lineups.py)
+PLAYER_SNAPSHOTS_PATH = os.path.join('data', 'processed', 'snapshots', 'player_snapshots')
+LINEUPS_PATH = os.path.join(LINEUP_DIR, LINEUP_TABLE)
 OUTPUT_DIR = os.path.join('data', 'processed')
-OUTPUT_PATH = os.path.join(OUTPUT_DIR, 'match_feature_set.csv')
-
-# Ensure output directory exists
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# 2. Load source data
-matches_df = pd.read_csv(MATCH_PATH)
-teams_df = pd.read_csv(TEAMS_PATH)
-weather_df = pd.read_csv(WEATHER_PATH)
-
-# 3. Standardize team names to codes for merging with teams_df
-team_codes = {
-    'Mumbai Indians': 'MI', 'Chennai Super Kings': 'CSK',
-    'Royal Challengers Bangalore': 'RCB', 'Royal Challengers Bengaluru': 'RCB',
-    'Kolkata Knight Riders': 'KKR', 'Delhi Capitals': 'DC',
-    'Delhi Daredevils': 'DC', 'Punjab Kings': 'PBKS',
-    'Kings XI Punjab': 'PBKS', 'Rajasthan Royals': 'RR',
-    'Sunrisers Hyderabad': 'SRH', 'Lucknow Super Giants': 'LSG',
-    'Gujarat Titans': 'GT'
-}
-
-def to_code(name):
-    return team_codes.get(name, name)
-
-# Apply mapping
-matches_df['team1_code'] = matches_df['team1'].map(to_code)
-matches_df['team2_code'] = matches_df['team2'].map(to_code)
-
-# 4. Merge team performance for team1 and team2
-# Prefix team1 features
-team1_feats = teams_df.add_prefix('team1_').rename(columns={'team1_team_name': 'team1_code'})
-# Prefix team2 features
-team2_feats = teams_df.add_prefix('team2_').rename(columns={'team2_team_name': 'team2_code'})
-
-# Merge into matches
-df = matches_df.merge(team1_feats, on='team1_code', how='left')
-df = df.merge(team2_feats, on='team2_code', how='left')
-
-# 5. Merge weather data (hourly) - keeps long format for time-aware models
-# Ensure consistent types
-df['match_id'] = df['match_id'].astype(str)
-weather_df['match_id'] = weather_df['match_id'].astype(str)
-
-# Merge
-df = df.merge(weather_df, on='match_id', how='left', suffixes=('', '_w'))
-
-# 6. Cleanup duplicate metadata columns from weather merge
-for suffix in ['_w']:
-    for col in ['date', 'venue', 'city', 'day_night']:
-        dup_col = col + suffix
-        if dup_col in df.columns:
-            df.drop(columns=dup_col, inplace=True)
-
-# Rename original metadata columns for clarity (if desired)
-df.rename(columns={
-    'date': 'match_date',
-    'venue': 'match_venue',
-    'city': 'match_city',
-    'day_night': 'is_night_match'
-}, inplace=True)
-
-# 7. (Optional) Player-level integration placeholder
-# players_df = pd.read_csv(PLAYERS_PATH)
-# ... compute lineup-based aggregates, e.g. team1_avg_consistency, team2_avg_consistency
-
-# 8. Save the final feature set
-print(f"Final dataset shape: {df.shape}")
-print("Columns in final dataset:")
-print(df.columns.tolist())
-
-df.to_csv(OUTPUT_PATH, index=False)
-print(f"Saved match feature set to {OUTPUT_PATH}")
+FEATURE_TABLE = 'match_feature_set'
+WEATHER_TABLE = 'match_weather'
+OUTPUT_PATH = os.path.join(OUTPUT_DIR, FEATURE_TABLE)
+WEATHER_OUTPUT_PATH = os.path.join(OUTPUT_DIR, WEATHER_TABLE)
+
+# Partitioned output: one directory per partition, named <scheme>=<value>
+PARTITION_DIR = os.path.join(OUTPUT_DIR, 'partitions')
+PARTITION_MANIFEST = 'manifest.json'
+PARTITION_SCHEMES = ('season', 'match_id')
+WEATHER_COLUMNS = ['match_id', 'day_night', 'timestamp_ist', *WEATHER_FEATURES]
+# Weather CSV rows held at a time while it is split into partitions
+WEATHER_CHUNK_ROWS = 500_000
+
+def team_features(features, prefix):
+    """Team feature table keyed by {prefix}_id, with every other column prefixed"""
+    keyed = features.drop(columns='team_name').add_prefix(f'{prefix}_').rename(columns={f'{prefix}_match_id': 'match_id'})
+    keyed[f'{prefix}_id'] = TEAMS.ids(features['team_name'])
+    return keyed
+
+def join(matches_df, right, on, name):
+    """
+    right's columns aligned to the rows of matches_df on the key columns `on`, timed as stage `name`.
+
+    Same result as a left merge on unique keys, but only the new columns are
+    built: every block is added to matches_df with one concat at the end, so
+    the growing feature set is never copied once per join.
+    """
+    with stage(name):
+        keys = matches_df[on].astype(right[on].dtypes.to_dict())
+        block = right.set_index(on).reindex(pd.MultiIndex.from_frame(keys) if len(on) > 1 else pd.Index(keys[on[0]]))
+        block.index = matches_df.index
+        count('rows_joined', len(block))
+        count('columns_added', len(block.columns))
+    return block
+
+def load_team_snapshots(filters=None):
+    """As-of team features of the matches (see feature_snapshots.py), or None if there are no team snapshots"""
+    if not table_exists(TEAM_SNAPSHOTS_PATH):
+        print(f"{TEAM_SNAPSHOTS_PATH} not found, joining end-of-history team stats (run feature_snapshots.py to avoid leakage)")
+        return None
+    with stage('load_team_snapshots'):
+        snapshots = read_table(TEAM_SNAPSHOTS_PATH, columns=[col for col in table_columns(TEAM_SNAPSHOTS_PATH) if col != 'date'],
+                               filters=filters)
+        return snapshots[snapshots['match_id'].notna()]
+
+def lineups_available():
+    """True if the lineup and player snapshot tables exist; says which step to run if not"""
+    if table_exists(LINEUPS_PATH) and table_exists(PLAYER_SNAPSHOTS_PATH):
+        return True
+    print(f"{LINEUPS_PATH} or {PLAYER_SNAPSHOTS_PATH} not found, skipping lineup features (run lineups.py and feature_snapshots.py)")
+    return False
+
+def xi_features(lineups, player_snapshots):
+    """Lineup aggregates of every XI (see lineups.py), keyed by match_id and team_id"""
+    with stage('lineup_features'):
+        xi = lineup_features(lineups, player_snapshots)
+        xi['team_id'] = TEAMS.ids(xi['team'])
+        return xi.drop(columns='team')
+
+def match_features(matches_df, team_snapshots=None, teams_df=None, xi=None):
+    """
+    The match feature set: match metadata with both teams' features and lineup aggregates.
+
+    team_snapshots are the as-of team features from load_team_snapshots();
+    without them, teams_df (the end-of-history team_performance table) is
+    joined instead. xi comes from xi_features(), or is None to leave out the
+    lineup aggregates.
+    """
+    # 3. Resolve teams to integer team IDs (see teams.py); joins run on these instead of strings
+    team1_id = TEAMS.ids(matches_df['team1'])
+    team2_id = TEAMS.ids(matches_df['team2'])
+    matches_df = matches_df.assign(team1_id=team1_id, team2_id=team2_id,
+                                   team1_code=TEAMS.codes_of(team1_id), team2_code=TEAMS.codes_of(team2_id))
+    blocks = []
+
+    # 4. Join team performance for team1 and team2
+    if team_snapshots is not None:
+        # Each match gets both teams' features as they stood before its date, so
+        # no match sees statistics built from itself or later matches
+        blocks.append(join(matches_df, team_features(team_snapshots, 'team1'), ['match_id', 'team1_id'], 'merge_team1_snapshots'))
+        blocks.append(join(matches_df, team_features(team_snapshots, 'team2'), ['match_id', 'team2_id'], 'merge_team2_snapshots'))
+    else:
+        blocks.append(join(matches_df, team_features(teams_df, 'team1'), ['team1_id'], 'merge_team1_performance'))
+        blocks.append(join(matches_df, team_features(teams_df, 'team2'), ['team2_id'], 'merge_team2_performance'))
+
+    # 5. Rename original metadata columns for clarity
+    matches_df = matches_df.rename(columns={
+        'date': 'match_date',
+        'venue': 'match_venue',
+        'city': 'match_city',
+        'day_night': 'is_night_match'
+    })
+
+    # 6. Lineup aggregates: each XI's player features as they stood before the match,
+    # e.g. team1_xi_avg_consistency_score, team2_xi_max_strike_rate_overall
+    if xi is not None:
+        for prefix in ('team1', 'team2'):
+            keyed = xi.add_prefix(f'{prefix}_').rename(columns={f'{prefix}_match_id': 'match_id', f'{prefix}_team_id': f'{prefix}_id'})
+            blocks.append(join(matches_df, keyed, ['match_id', f'{prefix}_id'], f'merge_{prefix}_lineups'))
+
+    # The IDs are only meaningful within this run, so they are not saved
+    return pd.concat([matches_df.drop(columns=['team1_id', 'team2_id'])] + blocks, axis=1)
+
+def process_all():
+    """Build the feature set and weather table of every match in one pass and save them"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # 2. Load source data
+    with stage('load'):
+        matches_df = read_table(MATCH_PATH)
+    team_snapshots = load_team_snapshots()
+    teams_df = read_table(TEAMS_PATH) if team_snapshots is None else None
+
+    # Per-match weather table, one row per match (joined on match_id at model-build time)
+    with stage('weather_features'):
+        weather_df = build_weather_features(WEATHER_PATH)
+
+    xi = None
+    if lineups_available():
+        player_columns = snapshot_columns(table_columns(PLAYER_SNAPSHOTS_PATH))
+        xi = xi_features(read_table(LINEUPS_PATH), read_table(PLAYER_SNAPSHOTS_PATH, columns=player_columns))
+    df = match_features(matches_df, team_snapshots, teams_df, xi)
+    del team_snapshots, xi
+
+    # 7. Save the final feature set
+    print(f"Final dataset shape: {df.shape}")
+    print("Columns in final dataset:")
+    print(df.columns.tolist())
+
+    with stage('save'):
+        print(f"Saved match feature set to {write_table(df, OUTPUT_PATH)}")
+        print(f"Saved weather features for {len(weather_df)} matches to {write_table(weather_df, WEATHER_OUTPUT_PATH)}")
+
+def plan_partitions(scheme, size=1000):
+    """
+    Partitions of the matches in match_metadata, in order.
+
+    Returns ({key: partition}, partition key of every match_id as a Series).
+    A partition is a dict with the half-open range [low, high) of `column`
+    it covers, its number of matches and its first and last match dates.
+    """
+    if scheme not in PARTITION_SCHEMES:
+        raise ValueError(f"Unknown partition scheme {scheme!r} (expected one of {', '.join(PARTITION_SCHEMES)})")
+    matches = read_table(MATCH_PATH, columns=['match_id', 'date'])
+    if scheme == 'season':
+        values = matches['date'].dt.year.astype(int)
+        bounds = {value: ('date', pd.Timestamp(value, 1, 1), pd.Timestamp(value + 1, 1, 1)) for value in map(int, values.unique())}
+    else:
+        values = matches['match_id'].astype(int) // size * size
+        bounds = {value: ('match_id', value, value + size) for value in map(int, values.unique())}
+    names = {value: f"{scheme}={value}" if scheme == 'season' else f"{scheme}={value}-{value + size - 1}" for value in bounds}
+
+    plan = {}
+    for value, dates in matches['date'].groupby(values.to_numpy(), sort=True):
+        column, low, high = bounds[value]
+        plan[names[value]] = {'column': column, 'low': low, 'high': high, 'matches': len(dates),
+                              'first': dates.min(), 'last': dates.max()}
+    return plan, pd.Series(values.map(names).to_numpy(), index=matches['match_id'].to_numpy())
+
+def _range_filters(partition):
+    return [(partition['column'], '>=', partition['low']), (partition['column'], '<', partition['high'])]
+
+def split_weather(partition_of, keys, spill_dir, weather_path=WEATHER_PATH, chunk_rows=WEATHER_CHUNK_ROWS):
+    """
+    Stream the long-format weather CSV into one CSV per partition in spill_dir.
+
+    partition_of maps match_id to partition key; rows of matches outside
+    keys are dropped. Only chunk_rows rows are held at once. Returns {key:
+    path} for the partitions that have weather rows.
+    """
+    paths = {}
+    with stage('split_weather'):
+        for chunk in pd.read_csv(weather_path, usecols=WEATHER_COLUMNS, chunksize=chunk_rows):
+            for key, rows in chunk.groupby(chunk['match_id'].map(partition_of), sort=False):
+                if key not in keys:
+                    continue
+                path = paths.setdefault(key, os.path.join(spill_dir, f"{key}.csv"))
+                rows.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+                count('weather_rows', len(rows))
+    return paths
+
+def _first_rows(snapshots):
+    """Each player's earliest snapshot row (the first in table order among rows on the same date)"""
+    return snapshots.sort_values('date', kind='stable').drop_duplicates('player_name', keep='first')
+
+def player_snapshot_windows(plan, keys):
+    """
+    Yield (key, player snapshot rows) for the given partitions, latest first.
+
+    A lineup slot dated d uses the player's first snapshot dated d or later
+    (see lineups.snapshot_rows). That row lies in the partition's window of
+    dates or is the player's first row after it. So a partition gets its
+    window's rows plus one row per player from after the window. Those later
+    rows are carried from partition to partition as the sweep moves back in
+    time, and each slice of the table is read only once.
+    """
+    columns = snapshot_columns(table_columns(PLAYER_SNAPSHOTS_PATH))
+    carry = None
+    covered = None
+    for key in sorted(keys, key=lambda key: plan[key]['last'], reverse=True):
+        first, last = plan[key]['first'], plan[key]['last']
+        with stage('load_player_snapshots'):
+            if covered is None or last < covered:
+                filters = [('date', '>', last)] + ([('date', '<=', covered)] if covered is not None else [])
+                later = read_table(PLAYER_SNAPSHOTS_PATH, columns=columns, filters=filters)
+                carry = _first_rows(later if carry is None else pd.concat([later, carry], ignore_index=True))
+                covered = last
+            window = read_table(PLAYER_SNAPSHOTS_PATH, columns=columns, filters=[('date', '>=', first), ('date', '<=', last)])
+            rows = pd.concat([window, carry], ignore_index=True)
+        yield key, rows
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, PARTITION_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _save_manifest(manifest, output_dir):
+    path = os.path.join(output_dir, PARTITION_MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def _replace_dir(source, target):
+    """Move a finished partition directory into place, replacing the old one"""
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(source, target)
+
+def process_partitions(scheme, size=1000, partitions=None, output_dir=PARTITION_DIR):
+    """
+    Build the feature set and weather table one partition at a time, each written to output_dir/<key>/.
+
+    partitions lists the keys to rebuild (e.g. ['season=2019'] or ['2019']);
+    by default every partition is rebuilt and partitions that no longer have
+    any matches are removed. Rebuilding a subset needs the existing
+    partitions to use the same scheme and size.
+    """
+    plan, partition_of = plan_partitions(scheme, size)
+    manifest = _load_manifest(output_dir)
+    layout = {'scheme': scheme, 'size': size if scheme == 'match_id' else None}
+
+    if partitions is None:
+        keys = list(plan)
+    else:
+        keys = [key if '=' in key else f"{scheme}={key}" for key in partitions]
+        unknown = [key for key in keys if key not in plan]
+        if unknown:
+            raise ValueError(f"No matches in partitions {', '.join(unknown)} (available: {', '.join(plan)})")
+        if manifest is not None and {name: manifest.get(name) for name in layout} != layout:
+            raise ValueError(f"{output_dir} holds partitions by {manifest.get('scheme')}; rebuild them all to change the scheme or size")
+    if manifest is None or partitions is None:
+        manifest = {**layout, 'partitions': {}}
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"{len(plan)} partitions by {scheme}, rebuilding {len(keys)}")
+    has_team_snapshots = table_exists(TEAM_SNAPSHOTS_PATH)
+    teams_df = None if has_team_snapshots else read_table(TEAMS_PATH)
+    windows = player_snapshot_windows(plan, keys) if lineups_available() else ((key, None) for key in keys)
+
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix='.build-') as work_dir:
+        weather_paths = split_weather(partition_of, set(keys), work_dir)
+        for key, player_snapshots in windows:
+            partition = plan[key]
+            filters = _range_filters(partition)
+            with stage('partition'):
+                with stage('load'):
+                    matches_df = read_table(MATCH_PATH, filters=filters)
+                team_snapshots = load_team_snapshots(filters) if has_team_snapshots else None
+                xi = None
+                if player_snapshots is not None:
+                    xi = xi_features(read_table(LINEUPS_PATH, filters=filters), player_snapshots)
+                df = match_features(matches_df, team_snapshots, teams_df, xi)
+                del team_snapshots, xi, player_snapshots
+                with stage('weather_features'):
+                    weather_df = weather_feature_matrix(pd.read_csv(weather_paths[key])) if key in weather_paths else None
+                count('matches', len(df))
+
+                with stage('save'):
+                    build_dir = os.path.join(work_dir, key)
+                    write_table(df, os.path.join(build_dir, FEATURE_TABLE))
+                    if weather_df is not None:
+                        write_table(weather_df, os.path.join(build_dir, WEATHER_TABLE))
+                    _replace_dir(build_dir, os.path.join(output_dir, key))
+
+            weather_matches = 0 if weather_df is None else len(weather_df)
+            manifest['partitions'][key] = {'column': partition['column'], 'low': str(partition['low']), 'high': str(partition['high']),
+                                           'matches': len(df), 'weather_matches': weather_matches}
+            _save_manifest(manifest, output_dir)
+            print(f"{key}: {len(df)} matches, {weather_matches} with weather")
+
+    if partitions is None:
+        for stale in sorted(set(os.listdir(output_dir)) - set(plan) - {PARTITION_MANIFEST}):
+            if '=' in stale and os.path.isdir(os.path.join(output_dir, stale)):
+                shutil.rmtree(os.path.join(output_dir, stale))
+                print(f"Removed {stale}, which no longer has any matches")
+    print(f"Saved {len(keys)} partitions of {FEATURE_TABLE} and {WEATHER_TABLE} to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the match-level feature set and the per-match weather table")
+    parser.add_argument('--partition-by', choices=PARTITION_SCHEMES,
+                        help="process and write the matches one partition at a time: by season (calendar year) or match_id range")
+    parser.add_argument('--partition-size', type=int, default=1000, help="match IDs per partition with --partition-by match_id (default: %(default)s)")
+    parser.add_argument('--partitions', help="comma-separated partitions to rebuild, e.g. 2019,2020 (default: all)")
+    parser.add_argument('--output-dir', default=PARTITION_DIR, help="where partitions are written (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.partition_by is None:
+        if args.partitions:
+            parser.error("--partitions needs --partition-by")
+        process_all()
+    else:
+        process_partitions(args.partition_by, args.partition_size,
+                           args.partitions.split(',') if args.partitions else None, args.output_dir)
@@ -0,0 +1,340 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from form_engine import add_form_arguments
+from hashing import content_hash
+from instrument import emit
+from table_io import find_table
+
+# ----------------------
+#  run_pipeline.py
+# ----------------------
+# Dependency-aware runner for the pipeline stages. Every stage declares the
+# files, directories and tables it reads and writes; a stage depends on the
+# stages producing its inputs, and independent stages (the ingest, the
+# snapshots, the delivery store) run concurrently. The match, player and team
+# tables come from a single ingest stage, incremental.py, which parses each
+# match file once for all three and only parses files that are new since its
+# last run.
+#
+# A stage's key is the hash of its inputs, its command line and the code it
+# runs (the script plus every local module it imports). A stage is skipped
+# when its key matches the last successful run and its outputs are still as
+# that run left them. Keys are computed once a stage's dependencies have
+# finished, so a stage that reruns but writes identical outputs does not
+# force its dependents to rerun. Run from the directory holding ipl_data/ and
+# data/ (normally the repository root); stage scripts are found relative to
+# the repository.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPTS_DIR)
+# Shared with incremental.py; the runner only adds its own state file and logs
+STATE_DIR = os.path.join('data', 'processed', 'state')
+STATE_FILE = 'pipeline_state.json'
+LOG_DIR = os.path.join(STATE_DIR, 'logs')
+
+# Bump when the key computation changes so every stage reruns once
+RUNNER_VERSION = 1
+
+MATCH_DIR = 'ipl_data'
+WEATHER_CSV = os.path.join('data', 'raw', 'weather', 'weather_by_match.csv')
+MATCH_TABLE = os.path.join('data', 'raw', 'matches', 'match_metadata')
+PLAYERS_TABLE = os.path.join('data', 'raw', 'players', 'players_performance')
+TEAMS_TABLE = os.path.join('data', 'raw', 'teams', 'team_performance')
+TEAM_SNAPSHOTS_TABLE = os.path.join('data', 'processed', 'snapshots', 'team_snapshots')
+PLAYER_SNAPSHOTS_TABLE = os.path.join('data', 'processed', 'snapshots', 'player_snapshots')
+FEATURE_TABLE = os.path.join('data', 'processed', 'match_feature_set')
+MATCH_WEATHER_TABLE = os.path.join('data', 'processed', 'match_weather')
+MODEL_DIR = os.path.join('data', 'processed', 'model')
+DELIVERY_STORE = os.path.join('data', 'processed', 'deliveries')
+TEAM_PHASE_TABLE = os.path.join('data', 'processed', 'phases', 'team_phase_stats')
+PLAYER_PHASE_TABLE = os.path.join('data', 'processed', 'phases', 'player_phase_stats')
+LINEUP_TABLE = os.path.join('data', 'processed', 'lineups', 'match_lineups')
+VENUE_TABLES = [os.path.join('data', 'processed', 'venues', name)
+                for name in ('venue_stats', 'team_venue_stats', 'team_venue_type_stats')]
+
+class Stage:
+    """
+    One pipeline step: a script (relative to the repository root) run as `python <script> <args>`.
+
+    inputs and outputs are paths of files, directories or tables (given
+    without an extension, see table_io.py). Stages with workers=True are
+    passed --workers; forms=True passes the --form-windows/--half-lives options.
+    """
+    __slots__ = ('name', 'script', 'inputs', 'outputs', 'workers', 'forms')
+
+    def __init__(self, name, script, inputs, outputs=(), workers=False, forms=False):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.workers = workers
+        self.forms = forms
+
+    def command(self, options):
+        """Command-line arguments after the script that change the stage's output"""
+        args = []
+        if self.forms:
+            args += ['--form-windows', options.form_windows, '--half-lives', options.half_lives]
+        return args
+
+STAGES = [
+    Stage('ingest', 'scripts/incremental.py', [MATCH_DIR], [MATCH_TABLE, PLAYERS_TABLE, TEAMS_TABLE], workers=True, forms=True),
+    Stage('feature_snapshots', 'scripts/feature_snapshots.py', [MATCH_DIR],
+          [TEAM_SNAPSHOTS_TABLE, PLAYER_SNAPSHOTS_TABLE], workers=True, forms=True),
+    Stage('deliveries_store', 'scripts/deliveries_store.py', [MATCH_DIR], [DELIVERY_STORE]),
+    Stage('phase_stats', 'scripts/phase_stats.py', [DELIVERY_STORE], [TEAM_PHASE_TABLE, PLAYER_PHASE_TABLE]),
+    Stage('venue_stats', 'scripts/venue_stats.py', [MATCH_TABLE], VENUE_TABLES),
+    Stage('lineups', 'scripts/lineups.py', [MATCH_DIR], [LINEUP_TABLE], workers=True),
+    Stage('process_pipeline', 'scripts/process_pipeline.py',
+          [MATCH_TABLE, TEAMS_TABLE, TEAM_SNAPSHOTS_TABLE, PLAYER_SNAPSHOTS_TABLE, LINEUP_TABLE, WEATHER_CSV],
+          [FEATURE_TABLE, MATCH_WEATHER_TABLE]),
+    Stage('train_model', 'notebooks/prediction_model.py', [FEATURE_TABLE, MATCH_WEATHER_TABLE], [MODEL_DIR]),
+]
+
+def stage_dependencies(stages):
+    """Map each stage name to the names of the stages producing its inputs"""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {stage.name: sorted({producers[i] for i in stage.inputs if i in producers}) for stage in stages}
+
+def select_stages(stages, targets):
+    """The target stages plus everything they depend on, in declaration order (all stages if targets is empty)"""
+    if not targets:
+        return list(stages)
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [t for t in targets if t not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)} (choose from {', '.join(by_name)})")
+
+    dependencies = stage_dependencies(stages)
+    needed = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(dependencies[name])
+    return [stage for stage in stages if stage.name in needed]
+
+def local_modules(script):
+    """The script plus every module under scripts/ it imports, directly or indirectly, sorted"""
+    seen = set()
+    pending = [os.path.abspath(script)]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(path, 'r') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module_path = os.path.join(SCRIPTS_DIR, name.split('.')[0] + '.py')
+                if os.path.exists(module_path):
+                    pending.append(module_path)
+    return sorted(seen)
+
+class FileHasher:
+    """
+    Content hashes of input and output files.
+
+    As in incremental.py, a file whose mtime and size match its last recorded
+    fingerprint is trusted without being read again.
+    """
+
+    def __init__(self, fingerprints=None):
+        self.fingerprints = dict(fingerprints or {})
+
+    def file_hash(self, file_path):
+        stat = os.stat(file_path)
+        previous = self.fingerprints.get(file_path)
+        if previous and previous['mtime'] == stat.st_mtime_ns and previous['size'] == stat.st_size:
+            return previous['sha256']
+        sha = content_hash(file_path)
+        self.fingerprints[file_path] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha}
+        return sha
+
+    def path_hash(self, path):
+        """Hash of a file, a directory (every file in it) or a table; None if it does not exist"""
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    digest.update(f"{os.path.relpath(file_path, path)}:{self.file_hash(file_path)}\n".encode())
+            return digest.hexdigest()
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        table_file = find_table(path)
+        if table_file is not None:
+            return f"{os.path.basename(table_file)}:{self.file_hash(table_file)}"
+        return None
+
+def stage_key(stage, options, hasher):
+    """Hash of everything that determines a stage's output"""
+    digest = hashlib.sha256()
+    digest.update(f"{RUNNER_VERSION}:{stage.script}:{stage.command(options)}\n".encode())
+    for module in local_modules(os.path.join(REPO_DIR, stage.script)):
+        digest.update(f"{os.path.relpath(module, REPO_DIR)}:{hasher.file_hash(module)}\n".encode())
+    for path in stage.inputs:
+        digest.update(f"{path}:{hasher.path_hash(path)}\n".encode())
+    return digest.hexdigest()
+
+def load_runner_state(state_dir=STATE_DIR):
+    """Load the saved {'stages': ..., 'files': ...} state, empty if there is none"""
+    state_path = os.path.join(state_dir, STATE_FILE)
+    if not os.path.exists(state_path):
+        return {'stages': {}, 'files': {}}
+    with open(state_path, 'r') as f:
+        state = json.load(f)
+    if state.get('version') != RUNNER_VERSION:
+        return {'stages': {}, 'files': {}}
+    return state
+
+def save_runner_state(stages, hasher, state_dir=STATE_DIR):
+    """Persist the per-stage keys and the file fingerprints, replacing the old file atomically"""
+    os.makedirs(state_dir, exist_ok=True)
+    state_path = os.path.join(state_dir, STATE_FILE)
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump({'version': RUNNER_VERSION, 'stages': stages, 'files': hasher.fingerprints}, f, indent=1, sort_keys=True)
+    os.replace(state_path + '.tmp', state_path)
+
+def is_up_to_date(stage, key, saved, hasher):
+    """True if the stage last succeeded with this key and its outputs are unchanged since"""
+    if saved is None or saved['key'] != key:
+        return False
+    return all(hasher.path_hash(path) == saved['outputs'].get(path) for path in stage.outputs)
+
+def run_stage(stage, options, log_dir=LOG_DIR):
+    """
+    Run a stage in its own process, logging its output to log_dir/<stage>.log.
+
+    Returns (exit code, wall seconds, peak RSS in MB). Peak memory is the
+    largest resident set of the stage's process or any worker it started.
+    """
+    cmd = [sys.executable, os.path.join(REPO_DIR, stage.script)] + stage.command(options)
+    if stage.workers:
+        cmd += ['--workers', str(options.workers)]
+
+    # Metrics and profiles of the stage's own timers (see instrument.py)
+    env = dict(os.environ)
+    if options.metrics:
+        env['OVERCAST_METRICS'] = os.path.abspath(options.metrics)
+    if options.profile:
+        env['OVERCAST_PROFILE'] = os.path.abspath(options.profile)
+
+    os.makedirs(log_dir, exist_ok=True)
+    with open(os.path.join(log_dir, f"{stage.name}.log"), 'w') as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        # wait4 gives this child's own resource usage, so concurrent stages are measured separately
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return proc.returncode, round(seconds, 2), round(peak_mb, 1)
+
+def run_pipeline(options, targets=(), force=(), stages=STAGES, state_dir=STATE_DIR):
+    """
+    Run the selected stages in dependency order, skipping those that are up to date.
+
+    Up to options.jobs stages run at once. force names stages to rerun
+    regardless ('all' reruns everything). A failed stage blocks its dependents;
+    the other stages still run. Returns the per-stage report rows.
+    """
+    stages = select_stages(stages, targets)
+    dependencies = stage_dependencies(stages)
+    selected = {stage.name for stage in stages}
+    state = load_runner_state(state_dir)
+    hasher = FileHasher(state['files'])
+    saved = state['stages']
+
+    report = {}
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=options.jobs) as pool:
+        while pending or running:
+            for stage in list(pending):
+                deps = [d for d in dependencies[stage.name] if d in selected]
+                if any(report.get(d, {}).get('status') in ('failed', 'blocked') for d in deps):
+                    report[stage.name] = {'stage': stage.name, 'status': 'blocked'}
+                    pending.remove(stage)
+                elif all(d in report for d in deps) and len(running) < options.jobs:
+                    key = stage_key(stage, options, hasher)
+                    pending.remove(stage)
+                    if stage.name not in force and 'all' not in force and is_up_to_date(stage, key, saved.get(stage.name), hasher):
+                        report[stage.name] = {'stage': stage.name, 'status': 'skipped'}
+                        print(f"[{stage.name}] up to date, skipped")
+                    else:
+                        print(f"[{stage.name}] running")
+                        running[pool.submit(run_stage, stage, options)] = (stage, key)
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Stages with circular dependencies: {', '.join(s.name for s in pending)}")
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, key = running.pop(future)
+                code, seconds, peak_mb = future.result()
+                row = {'stage': stage.name, 'seconds': seconds, 'peak_rss_mb': peak_mb}
+                if code == 0:
+                    row['status'] = 'ran'
+                    saved[stage.name] = {'key': key, 'outputs': {path: hasher.path_hash(path) for path in stage.outputs}}
+                else:
+                    row['status'] = 'failed'
+                    saved.pop(stage.name, None)
+                    print(f"[{stage.name}] failed with exit code {code}, see {os.path.join(LOG_DIR, stage.name + '.log')}")
+                report[stage.name] = row
+                print(f"[{stage.name}] {row['status']} in {seconds:.2f}s, peak {peak_mb:.1f} MB")
+                if options.metrics:
+                    emit(row, os.path.abspath(options.metrics))
+                save_runner_state(saved, hasher, state_dir)
+
+    save_runner_state(saved, hasher, state_dir)
+    return [report[stage.name] for stage in stages]
+
+def print_report(rows):
+    """Print the per-stage status, wall time and peak memory as a table"""
+    print(f"\n{'stage':<20}{'status':<10}{'seconds':>10}{'peak MB':>10}")
+    for row in rows:
+        seconds = f"{row['seconds']:.2f}" if 'seconds' in row else '-'
+        peak = f"{row['peak_rss_mb']:.1f}" if 'peak_rss_mb' in row else '-'
+        print(f"{row['stage']:<20}{row['status']:<10}{seconds:>10}{peak:>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline stages whose inputs changed, in dependency order")
+    parser.add_argument('targets', nargs='*', help="stages to bring up to date, with their dependencies (default: all)")
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE', help="rerun these stages even if up to date ('all' for every stage)")
+    parser.add_argument('--jobs', type=int, default=2, help="number of stages run at once (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1, help="--workers passed to the match-parsing stages (default: %(default)s)")
+    parser.add_argument('--report', help="also write the per-stage report as JSON to this file")
+    parser.add_argument('--metrics', help="append the stages' timers and counters as JSON lines to this file (see instrument.py)")
+    parser.add_argument('--profile', metavar='DIR', help="write a cProfile dump of every instrumented stage to this directory")
+    add_form_arguments(parser)
+    args = parser.parse_args()
+
+    rows = run_pipeline(args, args.targets, args.force)
+    print_report(rows)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(rows, f, indent=2)
+    sys.exit(1 if any(row['status'] in ('failed', 'blocked') for row in rows) else 0)
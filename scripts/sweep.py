@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from backtest import ENGINEERED_FEATURES, LINEUP_PREFIXES, MODEL_PARAMS, TEAM_COLUMNS, score, training_frame
+from hashing import content_hash
+from instrument import count, stage
+from predict_service import FEATURE_PATH, MATCH_WEATHER_PATH
+from table_io import find_table, read_table, table_exists, write_table
+
+# ----------------------
+#  sweep.py
+# ----------------------
+# Hyperparameter and feature-set sweep for the match-winner model. The
+# design matrix (every candidate feature of every match, sorted by date) is
+# built once and saved as .npy files in the cache directory. They are keyed
+# on the contents of match_feature_set and match_weather, so later sweeps on
+# the same data skip the feature build entirely. Worker processes open the
+# matrix memory-mapped and read-only, and build one DMatrix per feature set,
+# which every candidate using that set shares.
+#
+# Each candidate trains on the earlier matches and is scored on the latest
+# ones (--valid-fraction), stopping once the validation log-loss has not
+# improved for --early-stopping rounds. Scores and gain importances are
+# appended to the sweep_results and sweep_importances tables, one run_id per
+# sweep.
+
+CACHE_DIR = os.path.join('data', 'processed', 'cache')
+OUTPUT_DIR = os.path.join('data', 'processed', 'sweeps')
+RESULTS_TABLE = 'sweep_results'
+IMPORTANCES_TABLE = 'sweep_importances'
+
+# Bump when training_frame() changes so cached design matrices are not reused
+CACHE_VERSION = 1
+
+# Feature groups a feature set is built from, joined with '+' (e.g. 'team+weather')
+FEATURE_GROUPS = ('team', 'lineup', 'weather', 'engineered')
+FEATURE_SETS = ('team+weather+engineered', 'team+engineered', 'team+lineup+weather+engineered')
+
+# Hyperparameter grid: name -> values; every combination is tried with every feature set
+PARAM_GRID = {'max_depth': [3, 4, 6], 'eta': [0.05, 0.1], 'subsample': [1.0], 'min_child_weight': [1]}
+
+def feature_group(name):
+    """The FEATURE_GROUPS entry a design matrix column belongs to"""
+    if name in ENGINEERED_FEATURES:
+        return 'engineered'
+    if name.startswith(LINEUP_PREFIXES):
+        return 'lineup'
+    if name.startswith(('team1_', 'team2_')):
+        return 'team'
+    return 'weather'
+
+def feature_columns(features, feature_set):
+    """Positions in features of the columns of a feature set such as 'team+weather'"""
+    groups = feature_set.split('+')
+    unknown = sorted(set(groups) - set(FEATURE_GROUPS))
+    if unknown:
+        raise ValueError(f"Unknown feature groups: {', '.join(unknown)} (expected {', '.join(FEATURE_GROUPS)})")
+    return [i for i, name in enumerate(features) if feature_group(name) in groups]
+
+def _cache_key(feature_path, weather_path):
+    """Key of a cached design matrix: the input tables' content hashes plus the frame configuration"""
+    config = repr((CACHE_VERSION, TEAM_COLUMNS, sorted(ENGINEERED_FEATURES)))
+    hashes = ':'.join(content_hash(find_table(path)) for path in (feature_path, weather_path))
+    return hashlib.sha256(f"{hashes}:{config}".encode()).hexdigest()[:16]
+
+@stage('design_matrix')
+def design_matrix(feature_path=FEATURE_PATH, weather_path=MATCH_WEATHER_PATH, cache_dir=CACHE_DIR):
+    """
+    Paths and columns of the cached design matrix, building it if the inputs changed.
+
+    Returns (matrix path, labels path, feature names). Rows are matches with
+    complete team and weather features, sorted by date; the matrix is float32
+    with lineup features missing as NaN.
+    """
+    base = os.path.join(cache_dir, f"design_{_cache_key(feature_path, weather_path)}")
+    paths = (base + '.npy', base + '_labels.npy', base + '.json')
+    if all(os.path.exists(path) for path in paths):
+        with open(paths[2]) as f:
+            return paths[0], paths[1], json.load(f)['features']
+
+    frame, features = training_frame(lineup=True, feature_path=feature_path, weather_path=weather_path)
+    frame = frame.sort_values('match_date', kind='stable')
+    os.makedirs(cache_dir, exist_ok=True)
+    for path, values in ((paths[0], frame[features].to_numpy(dtype=np.float32)), (paths[1], frame['label'].to_numpy(dtype=np.float32))):
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, np.ascontiguousarray(values))
+        os.replace(path + '.tmp', path)
+    with open(paths[2] + '.tmp', 'w') as f:
+        json.dump({'features': features, 'matches': len(frame)}, f)
+    os.replace(paths[2] + '.tmp', paths[2])
+    return paths[0], paths[1], features
+
+def candidates(feature_sets=FEATURE_SETS, grid=PARAM_GRID):
+    """Every (feature set, parameters) combination of the feature sets and the hyperparameter grid"""
+    names = list(grid)
+    return [(feature_set, dict(zip(names, values)))
+            for feature_set in feature_sets for values in itertools.product(*(grid[name] for name in names))]
+
+# Per-worker state: the memory-mapped matrix, labels, feature names, the
+# first validation row and DMatrix pairs cached per feature set
+_DESIGN = {}
+
+def _init_worker(matrix_path, labels_path, features, valid_start):
+    _DESIGN.update(matrix=np.load(matrix_path, mmap_mode='r'), labels=np.load(labels_path, mmap_mode='r'),
+                   features=features, valid_start=valid_start, dmatrices={})
+
+def _dmatrices(feature_set):
+    """(train, valid) DMatrix pair of a feature set, built once per worker"""
+    if feature_set not in _DESIGN['dmatrices']:
+        columns = feature_columns(_DESIGN['features'], feature_set)
+        names = [_DESIGN['features'][i] for i in columns]
+        matrix, labels, start = _DESIGN['matrix'], _DESIGN['labels'], _DESIGN['valid_start']
+        _DESIGN['dmatrices'][feature_set] = (
+            xgb.DMatrix(matrix[:start, columns], label=labels[:start], feature_names=names),
+            xgb.DMatrix(matrix[start:, columns], label=labels[start:], feature_names=names)
+        )
+    return _DESIGN['dmatrices'][feature_set]
+
+def _train_candidate(feature_set, params, max_rounds, early_stopping, nthread):
+    """Train one candidate with early stopping; returns its validation scores and gain importances"""
+    started = time.perf_counter()
+    train, valid = _dmatrices(feature_set)
+    booster = xgb.train({**MODEL_PARAMS, **params, 'nthread': nthread}, train, num_boost_round=max_rounds,
+                        evals=[(valid, 'valid')], early_stopping_rounds=early_stopping, verbose_eval=False)
+    rounds = booster.best_iteration + 1
+    probability = booster.predict(valid, iteration_range=(0, rounds))
+    scores = score(valid.get_label(), probability)
+    result = {'rounds': rounds, 'features': train.num_col(), 'train_rows': train.num_row(), 'valid_rows': scores.pop('matches'),
+              **scores, 'seconds': round(time.perf_counter() - started, 3)}
+    return result, booster.get_score(importance_type='gain')
+
+def _append(df, path):
+    """Append rows to a table, creating it if needed"""
+    if table_exists(path):
+        df = pd.concat([read_table(path), df], ignore_index=True)
+    return write_table(df, path)
+
+@stage('run_sweep')
+def run_sweep(feature_sets=FEATURE_SETS, grid=PARAM_GRID, max_rounds=1000, early_stopping=30, valid_fraction=0.2,
+              workers=1, cache_dir=CACHE_DIR, output_dir=OUTPUT_DIR):
+    """Train every candidate against the cached design matrix and append the results to output_dir"""
+    started = time.perf_counter()
+    matrix_path, labels_path, features = design_matrix(cache_dir=cache_dir)
+    rows = len(np.load(labels_path, mmap_mode='r'))
+    valid_start = int(round(rows * (1 - valid_fraction)))
+    if not 0 < valid_start < rows:
+        print(f"Not enough matches to sweep ({rows} with complete features)")
+        return
+    for feature_set in feature_sets:
+        feature_columns(features, feature_set)
+    print(f"Design matrix: {rows} matches x {len(features)} features, ready in {time.perf_counter() - started:.2f}s")
+
+    jobs = candidates(feature_sets, grid)
+    count('candidates', len(jobs))
+    args = [(feature_set, params, max_rounds, early_stopping, 1 if workers > 1 else 0) for feature_set, params in jobs]
+    initargs = (matrix_path, labels_path, features, valid_start)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            outcomes = list(executor.map(_train_candidate, *zip(*args)))
+    else:
+        _init_worker(*initargs)
+        outcomes = [_train_candidate(*arg) for arg in args]
+
+    run_id = time.strftime('%Y%m%d-%H%M%S')
+    results = pd.DataFrame([{'run_id': run_id, 'candidate': i, 'feature_set': feature_set, **params, **result}
+                            for i, ((feature_set, params), (result, _)) in enumerate(zip(jobs, outcomes))])
+    importances = pd.DataFrame([{'run_id': run_id, 'candidate': i, 'feature': feature, 'gain': round(gain, 4)}
+                                for i, (_, gains) in enumerate(outcomes) for feature, gain in gains.items()])
+    _append(results, os.path.join(output_dir, RESULTS_TABLE))
+    _append(importances, os.path.join(output_dir, IMPORTANCES_TABLE))
+
+    columns = ['candidate', 'feature_set', *grid, 'rounds', 'accuracy', 'log_loss', 'brier']
+    print(results.sort_values('log_loss')[columns].head(10).round(4).to_string(index=False))
+    print(f"Saved {len(results)} candidates of run {run_id} to {output_dir} in {time.perf_counter() - started:.2f}s")
+
+def _values(spec, cast):
+    return [cast(value) for value in spec.split(',')]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter and feature-set sweep over a cached design matrix")
+    parser.add_argument('--feature-sets', default=','.join(FEATURE_SETS),
+                        help=f"comma-separated feature sets, each groups joined by '+' from {', '.join(FEATURE_GROUPS)} (default: %(default)s)")
+    parser.add_argument('--max-depth', default=','.join(map(str, PARAM_GRID['max_depth'])), help="values to try (default: %(default)s)")
+    parser.add_argument('--learning-rate', default=','.join(map(str, PARAM_GRID['eta'])), help="values to try (default: %(default)s)")
+    parser.add_argument('--subsample', default=','.join(map(str, PARAM_GRID['subsample'])), help="values to try (default: %(default)s)")
+    parser.add_argument('--min-child-weight', default=','.join(map(str, PARAM_GRID['min_child_weight'])),
+                        help="values to try (default: %(default)s)")
+    parser.add_argument('--max-rounds', type=int, default=1000, help="boosting round limit (default: %(default)s)")
+    parser.add_argument('--early-stopping', type=int, default=30,
+                        help="stop after this many rounds without a better validation log-loss (default: %(default)s)")
+    parser.add_argument('--valid-fraction', type=float, default=0.2, help="latest share of matches used for validation (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes training candidates (default: 1)")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help="where the results tables are written (default: %(default)s)")
+    args = parser.parse_args()
+
+    grid = {'max_depth': _values(args.max_depth, int), 'eta': _values(args.learning_rate, float),
+            'subsample': _values(args.subsample, float), 'min_child_weight': _values(args.min_child_weight, float)}
+    run_sweep(feature_sets=args.feature_sets.split(','), grid=grid, max_rounds=args.max_rounds,
+              early_stopping=args.early_stopping, valid_fraction=args.valid_fraction, workers=args.workers,
+              output_dir=args.output_dir)
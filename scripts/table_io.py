@@ -0,0 +1,266 @@
+import argparse
+import operator
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import instrument
+
+# Parquet and Feather need pyarrow; without it every table is read and written as CSV
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# ----------------------
+#  table_io.py
+# ----------------------
+# Output layer for the tables passed between pipeline stages. A table is
+# addressed by its path without an extension (e.g. data/raw/teams/
+# team_performance) and stored as Parquet, Feather or CSV. Binary formats are
+# written with the explicit column types in SCHEMAS, and CSV files are typed
+# the same way when read, so every stage sees int32 match IDs, categorical
+# team/venue columns and float32 metrics whatever the file format.
+#
+# The format comes from the OVERCAST_TABLE_FORMAT environment variable and
+# defaults to Parquet when pyarrow is installed. CSV stays available as an
+# export format, and `python table_io.py` converts existing tables.
+#
+# read_table can select rows with (column, op, value) filters. Parquet pushes
+# them down to the reader, so row groups outside the range are skipped (tables
+# built in date or match order are clustered on those columns); CSV
+# files are read in chunks of CSV_CHUNK_ROWS and filtered as they are read,
+# so only the selected rows are ever held.
+
+# Comparison operators accepted in read_table filters
+FILTER_OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+CSV_CHUNK_ROWS = 500_000
+# Rows per Parquet row group; filtered reads skip whole row groups by their min/max statistics
+PARQUET_ROW_GROUP_ROWS = 65_536
+
+EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+TABLE_FORMAT = os.environ.get('OVERCAST_TABLE_FORMAT') or ('parquet' if pyarrow is not None else 'csv')
+
+# Column types per table, keyed by file name. 'team' columns of a table share
+# one categorical dtype so they compare directly (e.g. winner == team1).
+# Unlisted columns follow the defaults in apply_schema.
+MATCH_COLUMNS = {
+    'match_id': 'int32', 'date': 'datetime',
+    'team1': 'team', 'team2': 'team', 'toss_winner': 'team', 'winner': 'team',
+    'toss_decision': 'category', 'venue': 'category', 'city': 'category', 'match_type': 'category',
+    'win_by': 'category', 'day_night': 'category', 'dl_applied': 'bool',
+    'win_margin': 'int16', 'innings1_runs': 'int16', 'innings2_runs': 'int16',
+    'innings1_wickets': 'int16', 'innings2_wickets': 'int16'
+}
+SCHEMAS = {
+    'match_metadata': MATCH_COLUMNS,
+    'players_performance': {'player_name': 'string', 'role': 'category'},
+    'team_performance': {'team_name': 'category'},
+    'match_feature_set': {
+        **MATCH_COLUMNS,
+        'match_date': 'datetime', 'match_venue': 'category', 'match_city': 'category', 'is_night_match': 'category',
+        'team1_code': 'category', 'team2_code': 'category'
+    },
+    'match_weather': {'match_id': 'int32', 'is_night': 'int8'},
+    'team_snapshots': {'team_name': 'category', 'date': 'datetime', 'match_id': 'int32'},
+    'player_snapshots': {'player_name': 'category', 'date': 'datetime', 'match_id': 'int32', 'role': 'category'},
+    'match_lineups': {'match_id': 'int32', 'date': 'datetime', 'team': 'category', 'player_name': 'category'},
+    'outcome_profiles': {'kind': 'category', 'name': 'string'},
+    'venue_stats': {'venue': 'category', 'city': 'category', 'home_teams': 'category'},
+    'team_venue_stats': {'team_name': 'category', 'venue': 'category'},
+    'team_venue_type_stats': {'team_name': 'category', 'venue_type': 'category'},
+    'backtest_predictions': {'match_id': 'int32', 'date': 'datetime', 'season': 'int16', 'label': 'int8'},
+    'backtest_seasons': {'season': 'string'},
+    'sweep_results': {'run_id': 'category', 'feature_set': 'category'},
+    'sweep_importances': {'run_id': 'category', 'feature': 'category'}
+}
+
+def table_path(path, fmt=None):
+    """File path of a table in the given format (default: TABLE_FORMAT)"""
+    return path + EXTENSIONS[fmt or TABLE_FORMAT]
+
+def find_table(path, fmt=None):
+    """Existing file for a table, preferring the given format, or None"""
+    preferred = fmt or TABLE_FORMAT
+    for candidate in [preferred] + [f for f in EXTENSIONS if f != preferred]:
+        if candidate != 'csv' and pyarrow is None:
+            continue
+        file_path = table_path(path, candidate)
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+def _drop_empty(values):
+    """A column with empty strings as missing values"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Already typed (e.g. read back from Parquet): only the categories need checking
+        return values.cat.remove_categories(['']) if '' in values.cat.categories else values
+    return values.astype('object').replace('', None)
+
+def apply_schema(df, name, copy=True):
+    """
+    Cast a table's columns to the types in SCHEMAS[name].
+
+    Unlisted columns are narrowed: float64 to float32 and int64 to int32.
+    Integer columns with missing values (e.g. the match_id of a final snapshot)
+    become nullable Int32/Int16. Empty strings in team and category columns
+    become missing, as they do when a CSV is read back. copy=False casts df in
+    place, for frames nothing else refers to (read_table's); columns that
+    already have their type are never copied.
+    """
+    schema = SCHEMAS.get(name, {})
+    if copy:
+        df = df.copy()
+
+    for col, kind in schema.items():
+        if kind in ('team', 'category') and col in df.columns:
+            df[col] = _drop_empty(df[col])
+
+    team_columns = [col for col, kind in schema.items() if kind == 'team' and col in df.columns]
+    if team_columns:
+        teams = pd.unique(pd.concat([df[col].astype('object') for col in team_columns]).dropna())
+        team_dtype = pd.CategoricalDtype(sorted(teams))
+        for col in team_columns:
+            df[col] = df[col].astype('object').astype(team_dtype)
+
+    for col in df.columns:
+        kind = schema.get(col)
+        if kind == 'team':
+            continue
+        if kind in ('int32', 'int16', 'int8'):
+            values = pd.to_numeric(df[col])
+            df[col] = values.astype(kind.capitalize() if values.hasnans else kind)
+        elif kind == 'datetime':
+            df[col] = pd.to_datetime(df[col])
+        elif kind == 'category':
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        elif kind is not None:
+            df[col] = df[col].astype(kind)
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype('float32')
+        elif pd.api.types.is_integer_dtype(df[col]) and not pd.api.types.is_extension_array_dtype(df[col]):
+            df[col] = df[col].astype('int32')
+    return df
+
+def write_table(df, path, fmt=None):
+    """
+    Write a table to path + the format's extension and return the file path.
+
+    Parquet and Feather are written with the table's schema; CSV is written
+    exactly as given, so CSV exports are unchanged from earlier releases.
+    """
+    fmt = fmt or TABLE_FORMAT
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    file_path = table_path(path, fmt)
+
+    if fmt == 'csv':
+        df.to_csv(file_path, index=False)
+    else:
+        typed = apply_schema(df, os.path.basename(path)).reset_index(drop=True)
+        if fmt == 'parquet':
+            typed.to_parquet(file_path, index=False, row_group_size=PARQUET_ROW_GROUP_ROWS)
+        else:
+            typed.to_feather(file_path)
+
+    if instrument.ENABLED:
+        instrument.count('rows_written', len(df))
+        instrument.count('bytes_written', os.path.getsize(file_path))
+    return file_path
+
+def _filter_mask(df, filters):
+    """Boolean mask of the rows of an untyped (e.g. CSV) frame matching every (column, op, value) filter"""
+    mask = np.ones(len(df), dtype=bool)
+    for col, op, value in filters:
+        values = df[col]
+        if isinstance(value, date):
+            values = pd.to_datetime(values)
+        elif isinstance(value, (int, float, np.number)) and not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values)
+        mask &= FILTER_OPERATORS[op](values, value).to_numpy(dtype=bool, na_value=False)
+    return mask
+
+def _read_csv(file_path, columns, filters):
+    if not filters:
+        return pd.read_csv(file_path, usecols=columns)
+    usecols = None if columns is None else list(dict.fromkeys([*columns, *(col for col, _, _ in filters)]))
+    chunks = [chunk[_filter_mask(chunk, filters)] for chunk in pd.read_csv(file_path, usecols=usecols, chunksize=CSV_CHUNK_ROWS)]
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.read_csv(file_path, usecols=usecols, nrows=0)
+    return df if columns is None else df[list(columns)]
+
+def read_table(path, fmt=None, columns=None, filters=None):
+    """
+    Read a table from whichever format exists (preferring fmt) and return it with its schema applied.
+
+    filters is a list of (column, op, value) conditions, all of which a row
+    must meet, with op one of FILTER_OPERATORS (e.g. [('date', '>=',
+    pd.Timestamp('2019-01-01'))]). Filter columns need not be among columns.
+    """
+    file_path = find_table(path, fmt)
+    if file_path is None:
+        raise FileNotFoundError(f"No table found at {path} ({', '.join(EXTENSIONS.values())})")
+    for _, op, _ in filters or []:
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator {op!r} (expected one of {', '.join(FILTER_OPERATORS)})")
+
+    if file_path.endswith('.parquet'):
+        # Arrow buffers are released column by column as they are converted, so
+        # a large table is not held twice at once
+        table = pyarrow.parquet.read_table(file_path, columns=columns, filters=filters or None)
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+    elif file_path.endswith('.feather'):
+        df = pd.read_feather(file_path)
+        if filters:
+            df = df[_filter_mask(df, filters)].reset_index(drop=True)
+        if columns is not None:
+            df = df[list(columns)]
+    else:
+        df = _read_csv(file_path, columns, filters)
+
+    if instrument.ENABLED:
+        instrument.count('rows_read', len(df))
+        instrument.count('bytes_read', os.path.getsize(file_path))
+    return apply_schema(df, os.path.basename(path), copy=False)
+
+def table_columns(path, fmt=None):
+    """Column names of a table, read from its schema or header without loading any rows"""
+    file_path = find_table(path, fmt)
+    if file_path is None:
+        raise FileNotFoundError(f"No table found at {path} ({', '.join(EXTENSIONS.values())})")
+    if file_path.endswith('.parquet'):
+        return pyarrow.parquet.read_schema(file_path).names
+    if file_path.endswith('.feather'):
+        return pyarrow.ipc.open_file(file_path).schema.names
+    return pd.read_csv(file_path, nrows=0).columns.tolist()
+
+def table_exists(path):
+    """True if the table exists in any readable format"""
+    return find_table(path) is not None
+
+def read_partitions(root, name, columns=None, filters=None):
+    """
+    Read a table written once per partition, as root/<partition>/<name>, into one frame.
+
+    Partitions are read in directory name order (see process_pipeline.py
+    --partition-by). Raises FileNotFoundError if no partition has the table.
+    """
+    parts = sorted(os.listdir(root)) if os.path.isdir(root) else []
+    paths = [os.path.join(root, part, name) for part in parts if table_exists(os.path.join(root, part, name))]
+    if not paths:
+        raise FileNotFoundError(f"No partitions of {name} found in {root}")
+    frames = [read_table(path, columns=columns, filters=filters) for path in paths]
+    # Categories differ between partitions, so the concatenated columns are typed again
+    return apply_schema(pd.concat(frames, ignore_index=True), name, copy=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pipeline tables between Parquet, Feather and CSV")
+    parser.add_argument('tables', nargs='+', help="table paths without extension, e.g. data/processed/match_feature_set")
+    parser.add_argument('--to', choices=sorted(EXTENSIONS), default='csv', help="output format (default: %(default)s)")
+    args = parser.parse_args()
+
+    for path in args.tables:
+        print(f"Wrote {write_table(read_table(path), path, args.to)}")
@@ -0,0 +1,144 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# ----------------------
+#  teams.py
+# ----------------------
+# Team-name normalization shared by every script. Each raw Cricsheet team
+# string (current names, earlier names such as "Kings XI Punjab", and team
+# codes) is resolved through one precomputed dict to a small integer team ID,
+# and from there to the franchise's current name and code, so renamed
+# franchises are counted as one team everywhere.
+#
+# Matches involving a defunct franchise (DEFUNCT_TEAMS) are left out of every
+# match, team and player table; is_excluded_match is the one test for that.
+#
+# IDs of the teams listed here are stable. Teams not listed keep their raw
+# name as name and code and are given the next free ID the first time
+# team_id() sees them, so those IDs are only meaningful within one process.
+
+# Franchise code -> (current name, earlier names)
+TEAMS = {
+    'MI': ('Mumbai Indians', []),
+    'CSK': ('Chennai Super Kings', []),
+    'RCB': ('Royal Challengers Bengaluru', ['Royal Challengers Bangalore']),
+    'KKR': ('Kolkata Knight Riders', []),
+    'DC': ('Delhi Capitals', ['Delhi Daredevils']),
+    'PBKS': ('Punjab Kings', ['Kings XI Punjab']),
+    'RR': ('Rajasthan Royals', []),
+    'SRH': ('Sunrisers Hyderabad', []),
+    'LSG': ('Lucknow Super Giants', []),
+    'GT': ('Gujarat Titans', [])
+}
+
+# Historical/defunct franchises, same layout as TEAMS
+DEFUNCT_TEAMS = {
+    'DCH': ('Deccan Chargers', []),
+    'KTK': ('Kochi Tuskers Kerala', []),
+    'PWI': ('Pune Warriors', []),
+    'RPS': ('Rising Pune Supergiant', ['Rising Pune Supergiants']),
+    'GL': ('Gujarat Lions', [])
+}
+
+class TeamRegistry:
+    """
+    Interned teams: raw team string -> team ID, and per-ID current name, code and defunct flag.
+
+    names, codes and defunct are lists indexed by team ID.
+    """
+
+    def __init__(self, teams=TEAMS, defunct_teams=DEFUNCT_TEAMS):
+        self.names = []
+        self.codes = []
+        self.defunct = []
+        self._ids = {}
+        for franchises, defunct in ((teams, False), (defunct_teams, True)):
+            for code, (name, earlier_names) in franchises.items():
+                team = self._add(name, code, defunct)
+                for raw in [code] + earlier_names:
+                    self._ids[raw] = team
+
+    def __len__(self):
+        return len(self.names)
+
+    def _add(self, name, code, defunct=False):
+        team = len(self.names)
+        self.names.append(name)
+        self.codes.append(code)
+        self.defunct.append(defunct)
+        self._ids[name] = team
+        return team
+
+    def find(self, team):
+        """Team ID of a raw team string, or None if it is empty or not registered"""
+        return self._ids.get(team) if team else None
+
+    def team_id(self, team):
+        """Team ID of a raw team string, registering teams not seen before (None for an empty string)"""
+        found = self.find(team)
+        if found is None and team:
+            found = self._add(team, team)
+        return found
+
+    def name(self, team):
+        """Current franchise name of a raw team string; unknown or empty strings are returned unchanged"""
+        found = self.find(team)
+        return team if found is None else self.names[found]
+
+    def code(self, team):
+        """Franchise code of a raw team string; unknown or empty strings are returned unchanged"""
+        found = self.find(team)
+        return team if found is None else self.codes[found]
+
+    def is_defunct(self, team):
+        found = self.find(team)
+        return found is not None and self.defunct[found]
+
+    def ids(self, values):
+        """
+        Team IDs of a column of raw team strings as an int16 array, -1 where missing.
+
+        Each distinct string is resolved once, so this costs one lookup per
+        distinct team rather than per row.
+        """
+        values = pd.Categorical(values)
+        found = [self.team_id(str(team)) for team in values.categories]
+        lookup = np.array([-1 if team is None else team for team in found] + [-1], dtype=np.int16)
+        return lookup[values.codes]
+
+    def codes_of(self, ids):
+        """Franchise codes of an array of team IDs, None where the ID is -1"""
+        return np.array(self.codes + [None], dtype=object)[np.asarray(ids)]
+
+REGISTRY = TeamRegistry()
+
+def team_id(team):
+    """Team ID of a raw team string in the shared registry"""
+    return REGISTRY.team_id(team)
+
+def team_name(team):
+    """Current franchise name of a raw team string (e.g. 'Kings XI Punjab' -> 'Punjab Kings')"""
+    return REGISTRY.name(team)
+
+def team_code(team):
+    """Franchise code of a raw team name or code (e.g. 'Kings XI Punjab' -> 'PBKS')"""
+    return REGISTRY.code(team)
+
+def is_excluded_match(teams):
+    """True if any of the match's teams is a historical/defunct franchise"""
+    return any(REGISTRY.is_defunct(team) for team in teams)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve team strings to their franchise")
+    parser.add_argument('teams', nargs='+', help="team names or codes as they appear in the match data")
+    args = parser.parse_args()
+
+    for raw in args.teams:
+        found = REGISTRY.find(raw)
+        if found is None:
+            print(f"{raw!r}: not registered")
+        else:
+            status = ' (defunct)' if REGISTRY.defunct[found] else ''
+            print(f"{raw!r}: {found} {REGISTRY.codes[found]} {REGISTRY.names[found]}{status}")
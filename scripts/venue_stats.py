@@ -0,0 +1,143 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrument import stage
+from table_io import read_table, write_table
+from teams import REGISTRY as TEAMS
+from venues import REGISTRY as VENUES
+
+# ----------------------
+#  venue_stats.py
+# ----------------------
+# Per-venue and per-team x venue aggregates from the match_metadata table.
+# Venue strings are resolved once per distinct string to registry IDs (see
+# venues.py), so every spelling of a ground is counted together and the
+# home/away/neutral split is a set lookup per row, not a string match.
+#
+# Three tables are written:
+#   venue_stats            one row per venue: scoring and bat-first/toss results
+#   team_venue_stats       one row per team and venue
+#   team_venue_type_stats  one row per team and venue type (home/away/neutral)
+
+MATCH_PATH = os.path.join('data', 'raw', 'matches', 'match_metadata')
+OUTPUT_DIR = os.path.join('data', 'processed', 'venues')
+VENUE_TABLE = 'venue_stats'
+TEAM_VENUE_TABLE = 'team_venue_stats'
+TEAM_VENUE_TYPE_TABLE = 'team_venue_type_stats'
+
+def _pct(numerator, denominator):
+    """numerator / denominator * 100, 0 where the denominator is 0"""
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.where(denominator > 0, np.asarray(numerator) * 100 / np.where(denominator > 0, denominator, 1), 0).round(2)
+
+def match_venues(matches):
+    """match_metadata rows with a venue, plus venue_id and batting_first team columns"""
+    matches = matches[matches['venue'].notna()].copy()
+    matches['venue_id'] = [VENUES.venue_id(venue, city) for venue, city in
+                           zip(matches['venue'].astype(str), matches['city'].astype(object).fillna('').astype(str))]
+    team1 = matches['team1'].astype(object)
+    team2 = matches['team2'].astype(object)
+    toss_winner = matches['toss_winner'].astype(object)
+    toss_loser = team2.where(toss_winner == team1, team1)
+    matches['batting_first'] = toss_winner.where(matches['toss_decision'].astype(object) == 'bat', toss_loser)
+    return matches
+
+def team_rows(matches):
+    """Two rows per match, one per team (by team ID), with the team's result, runs and venue type"""
+    ids = {col: TEAMS.ids(matches[col].astype(object)) for col in ('team1', 'team2', 'winner', 'batting_first')}
+    innings1 = matches['innings1_runs'].to_numpy()
+    innings2 = matches['innings2_runs'].to_numpy()
+    sides = []
+    for team_col, opponent_col in (('team1', 'team2'), ('team2', 'team1')):
+        team = ids[team_col]
+        batted_first = team == ids['batting_first']
+        sides.append(pd.DataFrame({
+            'team': team,
+            'opponent': ids[opponent_col],
+            'venue_id': matches['venue_id'].to_numpy(),
+            'won': team == ids['winner'],
+            'decided': ids['winner'] >= 0,
+            'runs_scored': np.where(batted_first, innings1, innings2),
+            'runs_conceded': np.where(batted_first, innings2, innings1)
+        }))
+    rows = pd.concat(sides, ignore_index=True)
+    rows['venue_type'] = [VENUES.venue_type(team, opponent, venue)
+                          for team, opponent, venue in zip(rows['team'], rows['opponent'], rows['venue_id'])]
+    return rows
+
+def _team_summary(rows, keys):
+    """Matches, wins and average runs per group of team rows"""
+    grouped = rows.groupby(keys, observed=True)
+    stats = grouped.agg(matches=('won', 'size'), wins=('won', 'sum'), decided=('decided', 'sum'),
+                        avg_runs_scored=('runs_scored', 'mean'), avg_runs_conceded=('runs_conceded', 'mean'))
+    stats['win_pct'] = _pct(stats['wins'], stats['decided'])
+    stats['avg_runs_scored'] = stats['avg_runs_scored'].round(2)
+    stats['avg_runs_conceded'] = stats['avg_runs_conceded'].round(2)
+    return stats[['matches', 'wins', 'win_pct', 'avg_runs_scored', 'avg_runs_conceded']].reset_index()
+
+def venue_stats(matches):
+    """One row per venue: matches, average innings totals, bat-first and toss-winner win rates"""
+    winner = matches['winner'].astype(object)
+    decided = winner.notna()
+    frame = pd.DataFrame({
+        'venue_id': matches['venue_id'],
+        'innings1_runs': matches['innings1_runs'].astype(np.float64),
+        'innings2_runs': matches['innings2_runs'].astype(np.float64).where(matches['innings2_runs'] > 0),
+        'decided': decided,
+        'bat_first_won': decided & (winner == matches['batting_first']),
+        'toss_winner_won': decided & (winner == matches['toss_winner'].astype(object))
+    })
+    grouped = frame.groupby('venue_id')
+    stats = grouped.agg(matches=('decided', 'size'), decided=('decided', 'sum'),
+                        avg_first_innings_runs=('innings1_runs', 'mean'), avg_second_innings_runs=('innings2_runs', 'mean'),
+                        bat_first_won=('bat_first_won', 'sum'), toss_winner_won=('toss_winner_won', 'sum'))
+    stats['bat_first_win_pct'] = _pct(stats['bat_first_won'], stats['decided'])
+    stats['toss_winner_win_pct'] = _pct(stats['toss_winner_won'], stats['decided'])
+
+    ids = stats.index.to_numpy()
+    stats.insert(0, 'venue', [VENUES.names[i] for i in ids])
+    stats.insert(1, 'city', [VENUES.cities[i] for i in ids])
+    stats.insert(2, 'home_teams', ['/'.join(sorted(TEAMS.codes[team] for team in VENUES.home_teams[i])) for i in ids])
+    stats['avg_first_innings_runs'] = stats['avg_first_innings_runs'].round(2)
+    stats['avg_second_innings_runs'] = stats['avg_second_innings_runs'].round(2)
+    columns = ['venue', 'city', 'home_teams', 'matches', 'avg_first_innings_runs', 'avg_second_innings_runs',
+               'bat_first_win_pct', 'toss_winner_win_pct']
+    return stats[columns].reset_index()
+
+def team_venue_stats(rows):
+    """One row per team and venue, with is_home for the team's home grounds"""
+    stats = _team_summary(rows, ['team', 'venue_id'])
+    stats.insert(1, 'venue', [VENUES.names[i] for i in stats['venue_id']])
+    stats.insert(3, 'is_home', [team in VENUES.home_teams[i] for team, i in zip(stats['team'], stats['venue_id'])])
+    stats['team'] = TEAMS.codes_of(stats['team'])
+    return stats.rename(columns={'team': 'team_name'})
+
+def team_venue_type_stats(rows):
+    """One row per team and venue type (home, away, neutral)"""
+    stats = _team_summary(rows, ['team', 'venue_type'])
+    stats['team'] = TEAMS.codes_of(stats['team'])
+    return stats.rename(columns={'team': 'team_name'})
+
+@stage('build_venue_stats')
+def build_venue_stats(matches=None, output_dir=OUTPUT_DIR):
+    """Compute the three venue tables from match_metadata and write them to output_dir"""
+    if matches is None:
+        matches = read_table(MATCH_PATH)
+    matches = match_venues(matches)
+    rows = team_rows(matches)
+
+    venues = venue_stats(matches)
+    write_table(venues, os.path.join(output_dir, VENUE_TABLE))
+    write_table(team_venue_stats(rows), os.path.join(output_dir, TEAM_VENUE_TABLE))
+    write_table(team_venue_type_stats(rows), os.path.join(output_dir, TEAM_VENUE_TYPE_TABLE))
+    print(f"Saved venue stats for {len(venues)} venues from {len(matches)} matches to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-venue and team x venue (home/away/neutral) aggregates")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help="where the tables are written (default: %(default)s)")
+    args = parser.parse_args()
+
+    build_venue_stats(output_dir=args.output_dir)
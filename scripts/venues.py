@@ -0,0 +1,153 @@
+import argparse
+
+from teams import REGISTRY as TEAMS
+
+# ----------------------
+#  venues.py
+# ----------------------
+# Canonical venue registry shared by every script. Cricsheet spells the same
+# ground several ways ("M Chinnaswamy Stadium", "M.Chinnaswamy Stadium",
+# "M Chinnaswamy Stadium, Bengaluru") and some grounds were renamed (Feroz
+# Shah Kotla -> Arun Jaitley Stadium), so raw venue strings are resolved once
+# to an integer venue ID. Each distinct raw string is normalized only the
+# first time it is seen; after that a lookup is a single dict access, and
+# home grounds are stored per venue ID, so hot loops never compare strings.
+#
+# IDs of the venues listed in VENUES are stable. Venues not listed are given
+# the next free ID the first time they are seen, so those IDs are only
+# meaningful within one process: pass raw venue strings between processes.
+
+# Canonical name -> (city, other names the ground has been listed under)
+VENUES = {
+    'Wankhede Stadium': ('Mumbai', []),
+    'Brabourne Stadium': ('Mumbai', []),
+    'Dr DY Patil Sports Academy': ('Mumbai', []),
+    'MA Chidambaram Stadium': ('Chennai', []),
+    'M Chinnaswamy Stadium': ('Bengaluru', []),
+    'Eden Gardens': ('Kolkata', []),
+    'Arun Jaitley Stadium': ('Delhi', ['Feroz Shah Kotla', 'Feroz Shah Kotla Ground']),
+    'IS Bindra Stadium': ('Mohali', ['Punjab Cricket Association Stadium', 'Punjab Cricket Association IS Bindra Stadium']),
+    'Maharaja Yadavindra Singh International Cricket Stadium': ('Mullanpur', []),
+    'Himachal Pradesh Cricket Association Stadium': ('Dharamsala', []),
+    'Sawai Mansingh Stadium': ('Jaipur', []),
+    'Barsapara Cricket Stadium': ('Guwahati', []),
+    'Rajiv Gandhi International Stadium': ('Hyderabad', []),
+    'Bharat Ratna Shri Atal Bihari Vajpayee Ekana Cricket Stadium': ('Lucknow', ['Ekana Cricket Stadium']),
+    'Narendra Modi Stadium': ('Ahmedabad', ['Sardar Patel Stadium']),
+    'Maharashtra Cricket Association Stadium': ('Pune', ['Subrata Roy Sahara Stadium']),
+    'Dr YS Rajasekhara Reddy ACA-VDCA Cricket Stadium': ('Visakhapatnam', []),
+    'Holkar Cricket Stadium': ('Indore', []),
+    'Dubai International Cricket Stadium': ('Dubai', []),
+    'Sharjah Cricket Stadium': ('Sharjah', []),
+    'Sheikh Zayed Stadium': ('Abu Dhabi', ['Zayed Cricket Stadium'])
+}
+
+# Team code -> canonical names of its home grounds
+HOME_VENUES = {
+    'MI': ['Wankhede Stadium'],
+    'CSK': ['MA Chidambaram Stadium'],
+    'RCB': ['M Chinnaswamy Stadium'],
+    'KKR': ['Eden Gardens'],
+    'DC': ['Arun Jaitley Stadium'],
+    'PBKS': ['IS Bindra Stadium', 'Himachal Pradesh Cricket Association Stadium'],
+    'RR': ['Sawai Mansingh Stadium'],
+    'SRH': ['Rajiv Gandhi International Stadium'],
+    'LSG': ['Bharat Ratna Shri Atal Bihari Vajpayee Ekana Cricket Stadium'],
+    'GT': ['Narendra Modi Stadium']
+}
+
+def venue_key(venue):
+    """Normalized form of a venue string: the name before the first comma, lowercase letters and digits only"""
+    name = venue.split(',', 1)[0]
+    return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+class VenueRegistry:
+    """
+    Interned venues: raw venue string -> venue ID, and per-ID name, city and home teams.
+
+    names, cities and home_teams are lists indexed by venue ID; home_teams
+    holds sets of team IDs (see teams.py).
+    """
+
+    def __init__(self, venues=VENUES, homes=HOME_VENUES):
+        self.names = []
+        self.cities = []
+        self.home_teams = []
+        self._keys = {}
+        self._ids = {}
+        for name, (city, aliases) in venues.items():
+            venue = self._add(name, city)
+            for alias in aliases:
+                self._keys[venue_key(alias)] = venue
+        for team, grounds in homes.items():
+            for ground in grounds:
+                self.home_teams[self._keys[venue_key(ground)]].add(TEAMS.team_id(team))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _add(self, name, city):
+        venue = len(self.names)
+        self.names.append(name)
+        self.cities.append(city)
+        self.home_teams.append(set())
+        self._keys[venue_key(name)] = venue
+        return venue
+
+    def find(self, venue):
+        """Venue ID of a raw venue string, or None if it is empty, not a string or not registered"""
+        if not venue or not isinstance(venue, str):
+            return None
+        venue_id = self._ids.get(venue)
+        if venue_id is None:
+            venue_id = self._keys.get(venue_key(venue))
+            if venue_id is not None:
+                self._ids[venue] = venue_id
+        return venue_id
+
+    def venue_id(self, venue, city=''):
+        """Venue ID of a raw venue string, registering venues not seen before (None for an empty string)"""
+        venue_id = self.find(venue)
+        if venue_id is None and venue:
+            name = venue.split(',', 1)[0].strip()
+            venue_id = self._add(name, city or venue.partition(',')[2].strip())
+            self._ids[venue] = venue_id
+        return venue_id
+
+    def venue_type(self, team, opponent, venue_id):
+        """
+        'home' if the venue is one of team's home grounds, 'away' if it is the opponent's, else 'neutral'.
+
+        team and opponent are team IDs (opponent may be None).
+        """
+        if venue_id is None:
+            return 'neutral'
+        home_teams = self.home_teams[venue_id]
+        if team in home_teams:
+            return 'home'
+        if opponent in home_teams:
+            return 'away'
+        return 'neutral'
+
+REGISTRY = VenueRegistry()
+
+def venue_id(venue, city=''):
+    """Venue ID of a raw venue string in the shared registry"""
+    return REGISTRY.venue_id(venue, city)
+
+def venue_name(venue_id):
+    """Canonical name of a venue ID in the shared registry"""
+    return REGISTRY.names[venue_id]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve venue strings to their canonical venue")
+    parser.add_argument('venues', nargs='+', help="venue names as they appear in the match data")
+    args = parser.parse_args()
+
+    for raw in args.venues:
+        found = REGISTRY.find(raw)
+        if found is None:
+            print(f"{raw!r}: not registered")
+        else:
+            homes = ', '.join(sorted(TEAMS.codes[team] for team in REGISTRY.home_teams[found])) or 'none'
+            print(f"{raw!r}: {found} {REGISTRY.names[found]} ({REGISTRY.cities[found]}), home of {homes}")
@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from hashing import content_hash
+
+# ----------------------
+#  weather_features.py
+# ----------------------
+# Turns the long-format weather_by_match.csv (one row per match and
+# timestamp) into a wide per-match feature matrix in one vectorized pass.
+# Snapshots are taken at fixed offsets from the scheduled start (15:30 for
+# day games, 19:30 for night games), so day and night matches share the same
+# columns. Each snapshot takes the observation closest to it, within a
+# tolerance, since recorded timestamps are not always on the half hour.
+# Results are cached on disk keyed on the input file's content hash and the
+# feature configuration.
+
+WEATHER_PATH = os.path.join('data', 'raw', 'weather', 'weather_by_match.csv')
+CACHE_DIR = os.path.join('data', 'processed', 'cache')
+
+# Scheduled start times, in minutes after midnight IST
+DAY_START = 15 * 60 + 30
+NIGHT_START = 19 * 60 + 30
+
+# Snapshot offsets in minutes after the start, and how far an observation may be from one
+SNAPSHOT_OFFSETS = (0, 30, 60, 90, 120, 150, 180, 210)
+SNAPSHOT_TOLERANCE = 15
+
+WEATHER_FEATURES = ('temperature', 'dew_point', 'humidity', 'wind_speed')
+
+# Derived per-snapshot features: name -> (left column, right column, operation)
+DERIVED_FEATURES = {
+    'dew_spread': ('temperature', 'dew_point', np.subtract),
+    'humidity_x_dew': ('humidity', 'dew_point', np.multiply)
+}
+
+# Bump when the feature logic changes so cached matrices are not reused
+CACHE_VERSION = 1
+
+def snapshot_label(offset):
+    """Column suffix for a snapshot offset, e.g. 't0', 't90'"""
+    return f"t{offset}"
+
+def weather_feature_matrix(weather, snapshot_offsets=SNAPSHOT_OFFSETS, features=WEATHER_FEATURES,
+                           tolerance=SNAPSHOT_TOLERANCE):
+    """
+    Build the per-match weather feature matrix from long-format weather rows.
+
+    Returns one row per match_id with is_night, then `{feature}_t{offset}` for
+    every feature and snapshot, then the derived features per snapshot.
+    Snapshots with no observation within `tolerance` minutes are NaN.
+    """
+    offsets = np.array(sorted(snapshot_offsets))
+    features = list(features)
+
+    # Minutes after the scheduled start for every observation
+    is_night = weather['day_night'].eq('Night').to_numpy()
+    clock = pd.to_timedelta(weather['timestamp_ist']).dt.total_seconds().to_numpy() / 60
+    minutes = clock - np.where(is_night, NIGHT_START, DAY_START)
+
+    # Nearest snapshot for every observation
+    upper = np.clip(np.searchsorted(offsets, minutes), 0, len(offsets) - 1)
+    lower = np.clip(upper - 1, 0, len(offsets) - 1)
+    nearest = np.where(np.abs(minutes - offsets[lower]) <= np.abs(minutes - offsets[upper]), lower, upper)
+    distance = np.abs(minutes - offsets[nearest])
+    keep = distance <= tolerance
+
+    # Closest observation per (match, snapshot), spread into one column per snapshot
+    observations = weather.loc[keep, ['match_id'] + features].assign(slot=nearest[keep], distance=distance[keep])
+    observations = observations.sort_values('distance', kind='stable').drop_duplicates(['match_id', 'slot'])
+    wide = observations.set_index(['match_id', 'slot'])[features].unstack('slot')
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([features, range(len(offsets))]))
+    wide.columns = [f"{feature}_{snapshot_label(offsets[slot])}" for feature, slot in wide.columns]
+
+    # Every match with weather rows gets a row, even if no snapshot matched
+    night_by_match = pd.Series(is_night, index=weather['match_id']).groupby(level=0).first()
+    wide = wide.reindex(night_by_match.index)
+
+    derived = {}
+    for name, (left, right, operation) in DERIVED_FEATURES.items():
+        if left in features and right in features:
+            for offset in offsets:
+                label = snapshot_label(offset)
+                derived[f"{name}_{label}"] = operation(wide[f"{left}_{label}"], wide[f"{right}_{label}"])
+
+    wide = pd.concat([night_by_match.astype(int).rename('is_night'), wide, pd.DataFrame(derived, index=wide.index)], axis=1)
+    wide.index.name = 'match_id'
+    return wide.reset_index()
+
+def _cache_key(weather_path, snapshot_offsets, features, tolerance):
+    """Key of a cached matrix: the input file's content hash plus the feature configuration"""
+    config = repr((CACHE_VERSION, sorted(snapshot_offsets), list(features), tolerance,
+                   DAY_START, NIGHT_START, sorted(DERIVED_FEATURES)))
+    return hashlib.sha256(f"{content_hash(weather_path)}:{config}".encode()).hexdigest()[:16]
+
+def build_weather_features(weather_path=WEATHER_PATH, snapshot_offsets=SNAPSHOT_OFFSETS, features=WEATHER_FEATURES,
+                           tolerance=SNAPSHOT_TOLERANCE, cache_dir=CACHE_DIR):
+    """
+    Load the per-match weather feature matrix, building and caching it if needed.
+
+    The cache is keyed on the weather file's contents and the configuration,
+    so edits to the file or the snapshot settings invalidate it. Pass
+    cache_dir=None to skip the cache.
+    """
+    cache_path = None
+    if cache_dir is not None:
+        key = _cache_key(weather_path, snapshot_offsets, features, tolerance)
+        cache_path = os.path.join(cache_dir, f"weather_features_{key}.pkl")
+        if os.path.exists(cache_path):
+            return pd.read_pickle(cache_path)
+
+    weather = pd.read_csv(weather_path, usecols=['match_id', 'day_night', 'timestamp_ist', *features])
+    matrix = weather_feature_matrix(weather, snapshot_offsets, features, tolerance)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        matrix.to_pickle(cache_path + '.tmp')
+        os.replace(cache_path + '.tmp', cache_path)
+    return matrix
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-match weather feature matrix")
+    parser.add_argument('--weather', default=WEATHER_PATH, help="long-format weather CSV (default: %(default)s)")
+    parser.add_argument('--snapshots', default=','.join(map(str, SNAPSHOT_OFFSETS)),
+                        help="comma-separated snapshot offsets in minutes after the start (default: %(default)s)")
+    parser.add_argument('--tolerance', type=int, default=SNAPSHOT_TOLERANCE,
+                        help="max minutes between a snapshot and the observation used for it (default: %(default)s)")
+    parser.add_argument('--output', default=os.path.join('data', 'processed', 'weather_features.csv'),
+                        help="where to write the matrix (default: %(default)s)")
+    args = parser.parse_args()
+
+    matrix = build_weather_features(args.weather, [int(o) for o in args.snapshots.split(',')], tolerance=args.tolerance)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    matrix.to_csv(args.output, index=False)
+    print(f"Saved weather features for {len(matrix)} matches to {args.output}")